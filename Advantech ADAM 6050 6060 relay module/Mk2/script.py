@@ -1,6 +1,11 @@
 '''Lightweight modbus control.'''
 
 # REVISION HISTORY
+# 18-Oct-2026
+#   Pipelined transactions (several in flight, matched by TID, each with its own timeout) instead of 'request_queue'
+#   Reads of adjacent banks of the same kind are merged into single range reads
+#   Receive buffer is the shared bytearray framer (framing.py, from ingredients) instead of a list of characters
+#
 # 21-Jan-2018 
 #   Support for read-only unsigned 16-bit MODBUS registers (use Custom)
 #
@@ -50,6 +55,14 @@ param_registerBanks = Parameter({ 'title': 'Custom register banks', 'order': nex
           'readOnly': {'type': 'boolean', 'title': '(RESERVED) Read-only? (only read-only for now)', 'order': next_seq()}
     } } } })
 
+DEFAULT_MAX_IN_FLIGHT = 4
+
+param_maxInFlight = Parameter({'title': 'Max. transactions in flight', 'order': next_seq(), 'schema': {'type': 'integer', 'hint': DEFAULT_MAX_IN_FLIGHT},
+                               'desc': 'How many MODBUS requests can be outstanding at once (1 for strictly one at a time)'})
+
+param_mergeGap = Parameter({'title': 'Merge reads across gaps of (addresses)', 'order': next_seq(), 'schema': {'type': 'integer', 'hint': '0 (only adjacent banks)'},
+                            'desc': 'Banks of the same kind this close together are polled with one read (addresses in the gap must be readable)'})
+
 local_event_SyncErrors = LocalEvent({'title': 'Sync errors', 'group': 'Status', 'schema': {'type': 'object', 'title': 'Details', 'properties': {
         'count': {'type': 'integer', 'title': 'Count', 'order': 1},
 		'last': {'type': 'string', 'title': 'Last occurrence', 'order': 2}
@@ -60,6 +73,9 @@ local_event_ShowLog = LocalEvent({'title': 'Show log', 'order': 9998, 'group': '
 # hold the list of poller functions
 pollers = list()
 
+# banks to be polled i.e. (modbus_func, startAddr, count, pollGap, onValues), merged into pollers by 'initPollers'
+readBanks = list()
+
 def main(arg = None):
   tcp.setDest('%s:%s'% (param_ipAddress, TCP_PORT))
   
@@ -80,6 +96,8 @@ def main(arg = None):
     
     for info in param_registerBanks or []:
       bindRegisterBank(info)
+      
+  initPollers()
     
 def bindCoilBank(info):
   startAddr = info['startAddr']
@@ -95,23 +113,12 @@ def bindCoilBank(info):
     
   pollGap = 0.08 if readOnly else 2.0
 
-  def onBankResponse(seqNum, values):
+  def onBankValues(values):
     for (es, v) in zip(coilEvents, values):
       invert = safeGet(es[1].getArg(), 'invert', False)
       es[0].emitIfDifferent(v if not invert else not v)
     
-    call_safe(lambda: readBank(seqNum), pollGap)
-    
-  def readBank(seqNum):
-    # chain next call (instead of locked timer)
-    if seqNum != sequence[0]:
-      # stop this chain
-      print '(connection %s ended)' % seqNum
-      return
-    
-    modbus_readCoils(startAddr, count, lambda values: onBankResponse(seqNum, values))
-    
-  pollers.append(readBank)
+  readBanks.append((READ_COILS, startAddr, count, pollGap, onBankValues))
   
 def bindCoil(prefix, index, addr, readOnly):
   event = Event('%s %s State' % (prefix, index), {'group': '"%s" coils\' states' % prefix, 'order': next_seq(), 'schema': {'type': 'boolean'}})
@@ -176,22 +183,11 @@ def bindRegisterBank(info):
     
   pollGap = 0.08 if readOnly else 2.0
 
-  def onRegisterResponse(seqNum, values):
+  def onRegisterValues(values):
     for (es, v) in zip(registerEvents, values):
       es[0].emitIfDifferent(v)
     
-    call_safe(lambda: readRegister(seqNum), pollGap)
-    
-  def readRegister(seqNum):
-    # chain next call (instead of locked timer)
-    if seqNum != sequence[0]:
-      # stop this chain
-      print '(connection %s ended)' % seqNum
-      return
-    
-    modbus_readRegisters(startAddr, count, lambda values: onRegisterResponse(seqNum, values))
-    
-  pollers.append(readRegister)
+  readBanks.append((READ_REGISTERS, startAddr, count, pollGap, onRegisterValues))
 
 def bindRegister(prefix, index, addr, readOnly):
   # 'readOnly' not used yet
@@ -208,6 +204,51 @@ def bindRegister(prefix, index, addr, readOnly):
   
   return (event, configEvent)
 
+def initPollers():
+  mergeGap = max(param_mergeGap or 0, 0)
+  
+  # merge banks of the same kind that are close enough into one range read, i.e. 
+  # [modbus_func, startAddr, count, pollGap, [(offset, count, onValues), ...]]
+  merged = list()
+  
+  for (func, startAddr, count, pollGap, onValues) in sorted(readBanks, key=lambda bank: (bank[0], bank[1])):
+    last = merged[-1] if len(merged) > 0 else None
+    
+    if last != None and last[0] == func and startAddr <= last[1] + last[2] + mergeGap and \
+                         max(last[2], startAddr + count - last[1]) <= MAX_READ_COUNT[func]:
+      last[2] = max(last[2], startAddr + count - last[1])
+      last[3] = min(last[3], pollGap) # (polled as often as the most frequent)
+      last[4].append((startAddr - last[1], count, onValues))
+      
+    else:
+      merged.append([func, startAddr, count, pollGap, [(0, count, onValues)]])
+      
+  for (func, startAddr, count, pollGap, banks) in merged:
+    bindPoller(func, startAddr, count, pollGap, banks)
+    
+  if len(merged) < len(readBanks):
+    console.info('(%s banks polled with %s reads)' % (len(readBanks), len(merged)))
+    
+def bindPoller(func, startAddr, count, pollGap, banks):
+  read = modbus_readCoils if func == READ_COILS else modbus_readRegisters
+  
+  def onResponse(seqNum, values):
+    for (offset, bankCount, onValues) in banks:
+      onValues(values[offset:offset+bankCount])
+    
+    call_safe(lambda: poll(seqNum), pollGap)
+    
+  def poll(seqNum):
+    # chain next call (instead of locked timer)
+    if seqNum != sequence[0]:
+      # stop this chain
+      print '(connection %s ended)' % seqNum
+      return
+    
+    read(startAddr, count, lambda values: onResponse(seqNum, values))
+    
+  pollers.append(poll)
+
 sequence = [0]
 
 def connected():
@@ -216,7 +257,7 @@ def connected():
   # don't let commands rush through
 
   tcp.clearQueue()
-  queue.clearQueue()
+  clearTransactions()
   
   # start all the poller
   seqNum = sequence[0]
@@ -232,13 +273,10 @@ def received(data):
   if local_event_ShowLog.getArg():
     print 'RECV: [%s]' % data.encode('hex')
     
-  # ensure buffer doesn't blow out i.e. greater than a reasonable sized "massive" value
-  if len(recvBuffer) > 4096:
+  # extend the recv buffer, ensuring it doesn't blow out i.e. greater than a reasonable sized "massive" value
+  if not recvBuffer.feed(data):
     console.warn('The incoming buffer is too large which might indicate protocol corruption; dropping it')
-    del recvBuffer[:]
-
-  # extend the recv buffer
-  recvBuffer.extend(data)
+    return
 
   processBuffer()    
   
@@ -251,7 +289,7 @@ def disconnected():
   
   # reset sequence (which will stop pollers)
   tcp.clearQueue()
-  queue.clearQueue()
+  clearTransactions()
   
   newSeq = sequence[0] + 1
   sequence[0] = newSeq
@@ -271,51 +309,97 @@ tcp = TCP(connected=connected,
 def protocolTimeout():
   console.log('MODBUS timeout; flushing buffers and dropping TCP connection for good measure')
   tcp.drop()
-  queue.clearQueue()
-  del recvBuffer[:]
+  clearTransactions()
+  recvBuffer.clear()
 
-# MODBUS using no delimeters within its binary protocol so must use a 
-# custom request queue
-queue = request_queue(timeout=protocolTimeout)
+# transactions ----
 
-# the full receive buffer
-recvBuffer = list()
+# MODBUS TCP tags each request and response with a transaction ID (TID) so several can be in flight
+# at once instead of one round trip after another
 
-# example response packet:
-# 00:93            00:00                00:05                 01:01:02:fd:0f
-# TID (2 bytes)    Protocol (2 bytes)   Length, n (2 bytes)   n bytes...
-def processBuffer():
-  while True:
-    bufferLen = len(recvBuffer)
-    if bufferLen < 6:
-      # not big enough yet, let it grow
-      return
+from collections import deque
+
+TRANSACTION_TIMEOUT = 5 # secs
+
+# transactions not sent yet i.e. (tid, req, onResp)
+waitingTransactions = deque()
+
+# transactions in flight by TID i.e. { tid: (deadline, onResp) }
+pendingTransactions = {}
+
+def nextTID():
+  tid = next_seq() % 65536
+  while tid in pendingTransactions:
+    tid = next_seq() % 65536
+  return tid
+
+def transact(tid, req, onResp):
+  waitingTransactions.append((tid, req, onResp))
   
-    # got at least 6 bytes (fifth and sixth hold the length)
-    messageLen = toInt16(recvBuffer, 4)
+  sendTransactions()
   
-    # work out expected length (incl. header)
-    fullLen = 2 + 2 + 2 + messageLen
+def sendTransactions():
+  maxInFlight = max(param_maxInFlight or DEFAULT_MAX_IN_FLIGHT, 1)
   
-    # check if we've got at least one full packet
-    if bufferLen >= fullLen:
-      # grab that packet from the buffer
-      message = ''.join(recvBuffer[:fullLen])
-      del recvBuffer[:fullLen]
-      
-      # and 'push' it back through the request queue handler
-      queue.handle(message)
-      
-      # might be more, so continue...
-      
-    else:
+  while len(waitingTransactions) > 0 and len(pendingTransactions) < maxInFlight:
+    (tid, req, onResp) = waitingTransactions.popleft()
+    pendingTransactions[tid] = (system_clock() + TRANSACTION_TIMEOUT*1000, onResp)
+    tcp.send(req)
+    
+def handleTransaction(resp):
+  tid = toInt16(resp, 0)
+  
+  transaction = pendingTransactions.pop(tid, None)
+  if transaction == None:
+    handleTIDMismatch(tid, sorted(pendingTransactions))
+    return
+  
+  try:
+    transaction[1](resp)
+    
+  finally:
+    # room for the next one
+    sendTransactions()
+    
+def checkTransactionTimeouts():
+  now = system_clock()
+  
+  for tid, (deadline, onResp) in pendingTransactions.items():
+    if now > deadline:
+      console.warn('(no response to transaction %s)' % tid)
+      protocolTimeout()
       return
+    
+def clearTransactions():
+  waitingTransactions.clear()
+  pendingTransactions.clear()
+  
+transactionTimer = Timer(checkTransactionTimeouts, 0.5)
+
+from framing import Framer, lengthPrefixed
+
+# example response packet:
+# 00:93            00:00                00:05                 01:01:02:fd:0f
+# TID (2 bytes)    Protocol (2 bytes)   Length, n (2 bytes)   n bytes...
+#
+# i.e. the fifth and sixth bytes hold the length, excl. the 6 byte header
+
+# the full receive buffer
+recvBuffer = Framer(lengthPrefixed(4, 2, 6), capacity=8192)
+
+def processBuffer():
+  for frame in recvBuffer.frames():
+    # match each packet up with its transaction
+    handleTransaction(frame.tobytes())
 
 # modbus ----
 READ_COILS = 1
 READ_REGISTERS = 3
 FORCE_COIL = 5
 
+# the most that can be read at once (MODBUS limits)
+MAX_READ_COUNT = { READ_COILS: 2000, READ_REGISTERS: 125 }
+
 def handleModbusResponse(resp, expTid, count=0, onFuncResp=None):
   # Response example
   # (raw buffer): 0093 0000 0005 01 01 02 fd0f
@@ -380,12 +464,12 @@ def modbus_readCoils(startAddr=0, count=12, onFuncResp=None):
   # Request example:
   #      \x00\x93  \x00\x00  \x00\x06  \x01  \x01         \x00\x00     \x00\x0c                                      
   #      tID2      protID2   length2   unit  modbus_func  start_addr2  count
-  (tid, protID, length, unitID, modbus_func) = (next_seq() % 65536, 0, 6, 1, READ_COILS)
+  (tid, protID, length, unitID, modbus_func) = (nextTID(), 0, 6, 1, READ_COILS)
   
   req = '%s%s%s%s%s%s%s' % (formatInt16(tid), formatInt16(protID), formatInt16(length),
                             chr(unitID), chr(modbus_func), formatInt16(startAddr), formatInt16(count))
   
-  queue.request(lambda: tcp.send(req), lambda resp: handleModbusResponse(resp, tid, count, onFuncResp=onFuncResp))
+  transact(tid, req, lambda resp: handleModbusResponse(resp, tid, count, onFuncResp=onFuncResp))
   
 Action('ReadCoils', lambda arg: modbus_readCoils(arg['startAddr'], arg['count']), 
        metadata={'group': 'Modbus', 'order': next_seq()+9000, 'schema': {'type': 'object', 'title': 'Params', 'properties': {
@@ -397,12 +481,12 @@ def modbus_readRegisters(startAddr=0, count=12, onFuncResp=None):
   # Request example (read 3 registers, from address 00:6B)
   #      \x00\x93  \x00\x00  \x00\x06  \x01  \x03         \x00\x6b     \x00\x03
   #      tID2      protID2   length2   unit  modbus_func  start_addr2  count
-  (tid, protID, length, unitID, modbus_func) = (next_seq() % 65536, 0, 6, 1, READ_REGISTERS)
+  (tid, protID, length, unitID, modbus_func) = (nextTID(), 0, 6, 1, READ_REGISTERS)
   
   req = '%s%s%s%s%s%s%s' % (formatInt16(tid), formatInt16(protID), formatInt16(length),
                             chr(unitID), chr(modbus_func), formatInt16(startAddr), formatInt16(count))
   
-  queue.request(lambda: tcp.send(req), lambda resp: handleModbusResponse(resp, tid, count, onFuncResp=onFuncResp))
+  transact(tid, req, lambda resp: handleModbusResponse(resp, tid, count, onFuncResp=onFuncResp))
 
 Action('ReadRegisters', lambda arg: modbus_readRegisters(arg['startAddr'], arg['count']), 
        metadata={'group': 'Modbus', 'order': next_seq()+9000, 'schema': {'type': 'object', 'title': 'Params', 'properties': {
@@ -412,7 +496,7 @@ Action('ReadRegisters', lambda arg: modbus_readRegisters(arg['startAddr'], arg['
 def modbus_writeCoil(addr, state, onFuncResp=None):
   # e.g 00 01     00 00     00 06     01    05           00 10     ff 00
   #     tID2      protID2   length2   unit  modbus_func  addr      state
-  (tid, protID, length, unitID, modbus_func) = (next_seq() % 65536, 0, 6, 1, FORCE_COIL)
+  (tid, protID, length, unitID, modbus_func) = (nextTID(), 0, 6, 1, FORCE_COIL)
   
   if state == True:
     value = '\xff\x00'
@@ -422,7 +506,7 @@ def modbus_writeCoil(addr, state, onFuncResp=None):
   req = '%s%s%s%s%s%s%s' % (formatInt16(tid), formatInt16(protID), formatInt16(length),
                             chr(unitID), chr(modbus_func), formatInt16(addr), value)
   
-  queue.request(lambda: tcp.send(req), lambda resp: handleModbusResponse(resp, tid, onFuncResp=onFuncResp))
+  transact(tid, req, lambda resp: handleModbusResponse(resp, tid, onFuncResp=onFuncResp))
 
 Action('WriteCoil', lambda arg: modbus_writeCoil(arg['addr'], arg['state']), 
        metadata={'group': 'Modbus', 'order': next_seq()+9000, 'schema': {'type': 'object', 'title': 'Params', 'properties': {
@@ -63,7 +63,10 @@ class ReadBitsResponseBase(ModbusResponse):
 
         :returns: The encoded packet message
         '''
-        result = pack_bitstring(self.bits)
+        packed = getattr(self.bits, 'packed', None)
+        if packed is not None:
+            result = str(packed)    # already packed by the datastore
+        else: result = pack_bitstring(self.bits)
         packet = struct.pack(">B", len(result)) + result
         return packet
 
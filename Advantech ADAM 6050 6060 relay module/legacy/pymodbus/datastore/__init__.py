@@ -1,5 +1,7 @@
 from pymodbus.datastore.store import ModbusSequentialDataBlock
 from pymodbus.datastore.store import ModbusSparseDataBlock
+from pymodbus.datastore.store import ModbusBitDataBlock
+from pymodbus.datastore.store import ModbusRegisterDataBlock
 from pymodbus.datastore.context import ModbusSlaveContext
 from pymodbus.datastore.context import ModbusServerContext
 
@@ -8,5 +10,6 @@ from pymodbus.datastore.context import ModbusServerContext
 #---------------------------------------------------------------------------# 
 __all__ = [
     "ModbusSequentialDataBlock", "ModbusSparseDataBlock",
+    "ModbusBitDataBlock", "ModbusRegisterDataBlock",
     "ModbusSlaveContext", "ModbusServerContext",
 ]
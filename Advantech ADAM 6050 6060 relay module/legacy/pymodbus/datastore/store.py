@@ -45,7 +45,20 @@ or a range read to fail.
 
 I have both methods implemented, and leave it up to the user to change
 based on their preference.
+
+For large sequential stores there are also compact blocks that keep
+their values the way they are sent on the wire::
+
+    coils     = ModbusBitDataBlock(0, [False] * 10000)    # packed bits
+    registers = ModbusRegisterDataBlock(0, [0] * 10000)   # 16-bit words
+
+Reads from these return a packed snapshot (PackedBits, PackedRegisters)
+that behaves like a list but which the response messages encode without
+converting value by value.
 """
+import struct
+from binascii import hexlify, unhexlify
+from bisect import bisect_right
 from pymodbus.exceptions import NotImplementedException, ParameterException
 
 #---------------------------------------------------------------------------#
@@ -201,8 +214,25 @@ class ModbusSparseDataBlock(BaseModbusDataBlock):
         :returns: True if the request in within range, False otherwise
         '''
         if count == 0: return False
-        handle = set(range(address, address + count))
-        return handle.issubset(set(self.values.iterkeys()))
+        if self.__indexed != len(self.values):
+            self.__index()
+        run = bisect_right(self.__starts, address) - 1
+        return run >= 0 and (address + count) <= self.__ends[run]
+
+    __indexed = None
+
+    def __index(self):
+        ''' Rebuilds the index of contiguous address ranges that
+        validate uses (whenever addresses have been added)
+        '''
+        self.__starts, self.__ends = [], []
+        for address in sorted(self.values.iterkeys()):
+            if self.__ends and self.__ends[-1] == address:
+                self.__ends[-1] = address + 1
+            else:
+                self.__starts.append(address)
+                self.__ends.append(address + 1)
+        self.__indexed = len(self.values)
 
     def getValues(self, address, count=1):
         ''' Returns the requested values of the datastore
@@ -228,3 +258,285 @@ class ModbusSparseDataBlock(BaseModbusDataBlock):
             for idx,val in enumerate(values):
                 self.values[address + idx] = val
 
+#---------------------------------------------------------------------------#
+# Packed Datablock Storage
+#---------------------------------------------------------------------------#
+class PackedBits(object):
+    '''
+    A snapshot of bit values packed eight to a byte, least significant
+    bit first (as coils and discrete inputs are sent on the wire)
+    '''
+
+    def __init__(self, packed, count):
+        ''' Initializes a new instance
+
+        :param packed: The packed bits (a bytearray that is kept)
+        :param count: The number of bits
+        '''
+        self.packed = packed
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0: index += self.count
+        if not (0 <= index < self.count): raise IndexError(index)
+        return (self.packed[index >> 3] >> (index & 7)) & 1 == 1
+
+    def __setitem__(self, index, value):
+        if index < 0: index += self.count
+        if not (0 <= index < self.count): raise IndexError(index)
+        if value: self.packed[index >> 3] |= 1 << (index & 7)
+        else: self.packed[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+    def __iter__(self):
+        packed = self.packed
+        for index in xrange(self.count):
+            yield (packed[index >> 3] >> (index & 7)) & 1 == 1
+
+    def __eq__(self, other):
+        if not hasattr(other, '__iter__'): return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return repr(list(self))
+
+class PackedRegisters(object):
+    '''
+    A snapshot of register values packed as big-endian 16-bit words
+    (as registers are sent on the wire)
+    '''
+
+    def __init__(self, packed):
+        ''' Initializes a new instance
+
+        :param packed: The packed words (a bytearray that is kept)
+        '''
+        self.packed = packed
+
+    def __len__(self):
+        return len(self.packed) >> 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0: index += len(self)
+        if not (0 <= index < len(self)): raise IndexError(index)
+        return (self.packed[2 * index] << 8) | self.packed[2 * index + 1]
+
+    def __setitem__(self, index, value):
+        if index < 0: index += len(self)
+        if not (0 <= index < len(self)): raise IndexError(index)
+        self.packed[2 * index:2 * index + 2] = struct.pack('>H', value)
+
+    def __iter__(self):
+        packed = self.packed
+        for offset in xrange(0, len(packed), 2):
+            yield (packed[offset] << 8) | packed[offset + 1]
+
+    def __eq__(self, other):
+        if not hasattr(other, '__iter__'): return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return repr(list(self))
+
+class ModbusBitDataBlock(BaseModbusDataBlock):
+    '''
+    Creates a sequential modbus datastore for coils or discrete inputs
+    with the bits packed eight to a byte
+    '''
+
+    def __init__(self, address, values):
+        ''' Initializes the datastore
+
+        :param address: The starting address of the datastore
+        :param values: Either a list of values or a single value
+        '''
+        if not hasattr(values, '__iter__'):
+            values = [values]
+        self.address = address
+        self.default_value = False
+        self.count = 0
+        self.packed = bytearray()
+        self.default(len(values))
+        self.setValues(address, list(values))
+
+    @property
+    def values(self):
+        return list(PackedBits(self.packed, self.count))
+
+    def default(self, count, value=False):
+        ''' Used to initialize a store to one value
+
+        :param count: The number of fields to set
+        :param value: The default value to set to the fields
+        '''
+        self.default_value = bool(value)
+        self.count = count
+        self.packed = bytearray(((count + 7) >> 3) * ('\xff' if value else '\x00'))
+        if value and count & 7:
+            self.packed[-1] = (1 << (count & 7)) - 1
+
+    def reset(self):
+        ''' Resets the datastore to the initialized default value '''
+        self.default(self.count, self.default_value)
+
+    def validate(self, address, count=1):
+        ''' Checks to see if the request is in range
+
+        :param address: The starting address
+        :param count: The number of values to test for
+        :returns: True if the request in within range, False otherwise
+        '''
+        return self.address <= address and address + count <= self.address + self.count
+
+    def getValues(self, address, count=1):
+        ''' Returns the requested values of the datastore
+
+        :param address: The starting address
+        :param count: The number of values to retrieve
+        :returns: The requested values from a:a+c (as PackedBits)
+        '''
+        start = address - self.address
+        count = max(min(count, self.count - start), 0)
+        size = (count + 7) >> 3
+        first, shift = start >> 3, start & 7
+        if shift == 0:
+            packed = self.packed[first:first + size]
+        elif count:
+            # shift the (little-endian) run of bytes down into place
+            run = self.packed[first:(start + count + 7) >> 3]
+            run.reverse()
+            value = (int(hexlify(run), 16) >> shift) & ((1 << count) - 1)
+            packed = bytearray(unhexlify('%0*x' % (2 * size, value)))
+            packed.reverse()
+        else: packed = bytearray()
+        if count & 7:
+            packed[-1] &= (1 << (count & 7)) - 1
+        return PackedBits(packed, count)
+
+    def setValues(self, address, values):
+        ''' Sets the requested values of the datastore
+
+        :param address: The starting address
+        :param values: The new values to be set
+        '''
+        if not isinstance(values, (list, PackedBits)):
+            values = [values]
+        packed = self.packed
+        index = address - self.address
+        for value in values:
+            if value: packed[index >> 3] |= 1 << (index & 7)
+            else: packed[index >> 3] &= ~(1 << (index & 7)) & 0xff
+            index += 1
+
+    def __str__(self):
+        ''' Build a representation of the datastore
+
+        :returns: A string representation of the datastore
+        '''
+        return "BitDataStore(%d, %d)" % (self.count, self.default_value)
+
+    def __iter__(self):
+        ''' Iterater over the data block data
+
+        :returns: An iterator of the data block data
+        '''
+        return enumerate(PackedBits(self.packed, self.count))
+
+class ModbusRegisterDataBlock(BaseModbusDataBlock):
+    '''
+    Creates a sequential modbus datastore for holding or input registers
+    kept as big-endian 16-bit words
+    '''
+
+    def __init__(self, address, values):
+        ''' Initializes the datastore
+
+        :param address: The starting address of the datastore
+        :param values: Either a list of values or a single value
+        '''
+        if not hasattr(values, '__iter__'):
+            values = [values]
+        self.address = address
+        self.default_value = 0
+        self.packed = bytearray()
+        self.default(len(values))
+        self.setValues(address, list(values))
+
+    @property
+    def values(self):
+        return list(PackedRegisters(self.packed))
+
+    def default(self, count, value=0):
+        ''' Used to initialize a store to one value
+
+        :param count: The number of fields to set
+        :param value: The default value to set to the fields
+        '''
+        self.default_value = value
+        self.packed = bytearray(struct.pack('>H', value) * count)
+
+    def reset(self):
+        ''' Resets the datastore to the initialized default value '''
+        self.default(len(self.packed) >> 1, self.default_value)
+
+    def validate(self, address, count=1):
+        ''' Checks to see if the request is in range
+
+        :param address: The starting address
+        :param count: The number of values to test for
+        :returns: True if the request in within range, False otherwise
+        '''
+        return self.address <= address and address + count <= self.address + (len(self.packed) >> 1)
+
+    def getValues(self, address, count=1):
+        ''' Returns the requested values of the datastore
+
+        :param address: The starting address
+        :param count: The number of values to retrieve
+        :returns: The requested values from a:a+c (as PackedRegisters)
+        '''
+        start = 2 * (address - self.address)
+        return PackedRegisters(self.packed[start:start + 2 * count])
+
+    def setValues(self, address, values):
+        ''' Sets the requested values of the datastore
+
+        :param address: The starting address
+        :param values: The new values to be set
+        '''
+        if isinstance(values, PackedRegisters):
+            packed = values.packed
+        else:
+            if not isinstance(values, list):
+                values = [values]
+            packed = struct.pack('>%dH' % len(values), *values)
+        start = 2 * (address - self.address)
+        self.packed[start:start + len(packed)] = packed
+
+    def __str__(self):
+        ''' Build a representation of the datastore
+
+        :returns: A string representation of the datastore
+        '''
+        return "RegisterDataStore(%d, %d)" % (len(self.packed) >> 1, self.default_value)
+
+    def __iter__(self):
+        ''' Iterater over the data block data
+
+        :returns: An iterator of the data block data
+        '''
+        return enumerate(PackedRegisters(self.packed))
@@ -64,6 +64,9 @@ class ReadRegistersResponseBase(ModbusResponse):
 
         :returns: The encoded packet
         '''
+        packed = getattr(self.registers, 'packed', None)
+        if packed is not None:      # already packed by the datastore
+            return chr(len(packed)) + str(packed)
         result = chr(len(self.registers) * 2)
         for register in self.registers:
             result += struct.pack('>H', register)
@@ -308,6 +311,9 @@ class ReadWriteMultipleRegistersResponse(ModbusResponse):
 
         :returns: The encoded packet
         '''
+        packed = getattr(self.registers, 'packed', None)
+        if packed is not None:      # already packed by the datastore
+            return chr(len(packed)) + str(packed)
         result = chr(len(self.registers)*2)
         for register in self.registers:
             result += struct.pack('>H', register)
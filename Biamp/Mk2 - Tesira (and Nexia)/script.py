@@ -4,10 +4,13 @@ u'''
 
 Make sure TELNET is turned on.
 
-`rev 10.20240319`
+`rev 13.20261018`
 
 _changelog_
  
+   * r13: one poll scheduler (spread evenly, few polls in flight) so commands no longer wait behind queued polls
+   * r12: meters and Level/Mute block values can be subscribed to instead of polled
+   * r11: received data is parsed a chunk at a time instead of byte by byte
    * r10: added Logic Meter
    * r9: general faults raise warning and automatic connection drop
    * r8: activeFaults
@@ -39,11 +42,13 @@ param_InputBlocks = Parameter({'title': 'Input blocks', 'schema': {'type': 'arra
 
 param_LevelBlocks = Parameter({'title': 'Level blocks', 'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
           'instance': {'type': 'string', 'desc': 'Instance ID or tag', 'order': 1},
-          'names': {'type': 'string', 'desc': 'Comma separated list of simple labels starting at #1; use "ignore" to ignore', 'order': 2}}}}})
+          'names': {'type': 'string', 'desc': 'Comma separated list of simple labels starting at #1; use "ignore" to ignore', 'order': 2},
+          'rate': {'title': 'Subscription rate', 'type': 'integer', 'hint': '(ms, default 500)', 'desc': 'Minimum interval between pushed values (Subscriptions feedback mode only)', 'order': 3}}}}})
 
 param_MuteBlocks = Parameter({'title': 'Mute blocks', 'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
           'instance': {'type': 'string', 'desc': 'Instance ID or tag', 'order': 1},
-          'names': {'type': 'string', 'desc': 'Comma separated list of simple labels starting at #1; use "ignore" to ignore', 'order': 2}}}}})
+          'names': {'type': 'string', 'desc': 'Comma separated list of simple labels starting at #1; use "ignore" to ignore', 'order': 2},
+          'rate': {'title': 'Subscription rate', 'type': 'integer', 'hint': '(ms, default 500)', 'desc': 'Minimum interval between pushed values (Subscriptions feedback mode only)', 'order': 3}}}}})
 
 param_LogicSelectorBlocks = Parameter({'title': 'Logic Selector blocks', 'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
           'instance': {'type': 'string', 'desc': 'Instance ID or tag', 'order': 1},
@@ -57,7 +62,8 @@ param_SourceSelectBlocks = Parameter({'title': 'Source-Select blocks', 'schema':
 param_MeterBlocks = Parameter({'title': 'Meter blocks', 'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
           'type': {'type': 'string', 'enum': ['Peak', 'RMS', 'Presence', 'Logic'], 'order': 1},
           'instance': {'type': 'string', 'desc': 'Instance ID or tag', 'order': 2},
-          'names': {'type': 'string', 'desc': 'Comma separated list of simple labels starting at #1; use "ignore" to ignore', 'order': 3}}}}})
+          'names': {'type': 'string', 'desc': 'Comma separated list of simple labels starting at #1; use "ignore" to ignore', 'order': 3},
+          'rate': {'title': 'Subscription rate', 'type': 'integer', 'hint': '(ms, default 500)', 'desc': 'Minimum interval between pushed values (Subscriptions feedback mode only)', 'order': 4}}}}})
 
 param_MatrixMixerBlocks = Parameter({'title': 'Matrix Mixer blocks', 'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
           'label': {'type': 'string', 'order': 1},
@@ -89,10 +95,13 @@ param_Routers = Parameter({'title': 'Router blocks', 'schema': {'type': 'array',
           'inputNames': {'type': 'string', 'desc': 'Comma separated list of simple labels', 'order': 5},
           'outputNames': {'type': 'string', 'desc': 'Comma separated list of simple labels', 'order': 6}}}}})
 
+FEEDBACK_MODES = ['Polling', 'Subscriptions']
+
+param_FeedbackMode = Parameter({'title': 'Feedback mode', 'desc': 'Meters and Level/Mute block values can be subscribed to (pushed by the device) instead of polled',
+                                'schema': {'type': 'string', 'enum': FEEDBACK_MODES, 'hint': FEEDBACK_MODES[0]}})
+
 # <main ---
 
-_pollers = list()
-  
 def main():
   if param_Disabled:
     console.warn('Disabled! nothing to do')
@@ -109,6 +118,143 @@ def main():
 
 # --- main>
 
+# <!-- poll scheduler
+
+# All periodic reads are owned by one scheduler instead of a timer each. Polls of the same interval are spread
+# evenly over it and their requests wait in a poll lane, with at most MAX_OUTSTANDING_POLLS in the request queue.
+# Anything else (e.g. set commands) goes straight into the request queue, i.e. ahead of waiting polls.
+
+import heapq
+from collections import deque
+
+MAX_OUTSTANDING_POLLS = 2
+SCHEDULER_TICK = 0.1 # secs
+
+VALUE_POLL_INTERVAL = 135 # secs
+
+_polls = list()     # e.g. [ { 'fn': pollFirmware, 'interval': 300, 'firstDelay': 5, 'pending': False }, ... ]
+_pollHeap = list()  # e.g. [ (due, index into _polls), ... ] (while polling)
+_pollLane = deque() # waiting poll requests, e.g. [ (req, onResp, poll, queuedAt), ... ]
+_pollsOutstanding = 0
+_currentPoll = None # the poll being run (its requests go into the poll lane)
+
+_pollWaits = list()    # (millis) from request until response, since last metrics
+_commandWaits = list()
+
+local_event_PollQueueDepth = LocalEvent({'title': 'Poll queue depth', 'group': 'Scheduler', 'order': 9000+next_seq(), 'schema': {'type': 'integer'}})
+local_event_PollWait = LocalEvent({'title': 'Poll wait (ms)', 'desc': 'Average, from request until response', 'group': 'Scheduler', 'order': 9000+next_seq(), 'schema': {'type': 'integer'}})
+local_event_CommandWait = LocalEvent({'title': 'Command wait (ms)', 'desc': 'Average, from request until response', 'group': 'Scheduler', 'order': 9000+next_seq(), 'schema': {'type': 'integer'}})
+
+def schedulePoll(fn, interval, firstDelay):
+  _polls.append({'fn': fn, 'interval': interval, 'firstDelay': firstDelay, 'pending': False})
+  
+def startPolling():
+  now = system_clock()
+  
+  polls_byInterval = dict()
+  for index, poll in enumerate(_polls):
+    polls_byInterval.setdefault(poll['interval'], list()).append(index)
+  
+  del _pollHeap[:]
+  
+  for interval, indices in polls_byInterval.items():
+    for i, index in enumerate(indices):
+      # spread evenly over the interval
+      heapq.heappush(_pollHeap, (now + int((_polls[index]['firstDelay'] + float(interval) * i / len(indices)) * 1000), index))
+      
+  timer_scheduler.start()
+  
+def stopPolling():
+  timer_scheduler.stop()
+  del _pollHeap[:]
+  resetPollLane()
+  
+def resetPollLane():
+  # (after the request queue has been cleared)
+  global _pollsOutstanding
+  _pollLane.clear()
+  _pollsOutstanding = 0
+  
+  for poll in _polls:
+    poll['pending'] = False
+  
+def schedulerTick():
+  global _currentPoll
+  
+  now = system_clock()
+  
+  while len(_pollHeap) > 0 and _pollHeap[0][0] <= now:
+    due, index = heapq.heappop(_pollHeap)
+    poll = _polls[index]
+    
+    # next due (without catching up if running late)
+    intervalMillis = int(poll['interval'] * 1000)
+    heapq.heappush(_pollHeap, (max(due + intervalMillis, now + intervalMillis / 2), index))
+    
+    if poll['pending']:
+      # previous read still waiting or in flight
+      continue
+    
+    _currentPoll = poll
+    try:
+      poll['fn']()
+      
+    except Exception, exc:
+      console.warn('poll failed (%s)' % exc)
+      
+    finally:
+      _currentPoll = None
+      
+timer_scheduler = Timer(schedulerTick, SCHEDULER_TICK, SCHEDULER_TICK, stopped=True)
+
+def queuePoll(req, onResp, poll):
+  poll['pending'] = True
+  _pollLane.append((req, onResp, poll, system_clock()))
+  pumpPolls()
+
+def pumpPolls():
+  global _pollsOutstanding
+  
+  while _pollsOutstanding < MAX_OUTSTANDING_POLLS and len(_pollLane) > 0:
+    _pollsOutstanding += 1
+    requestPoll(*_pollLane.popleft())
+    
+def requestPoll(req, onResp, poll, queuedAt):
+  def handleResp(resp):
+    global _pollsOutstanding
+    _pollsOutstanding -= 1
+    poll['pending'] = False
+    _pollWaits.append(system_clock() - queuedAt)
+    
+    try:
+      onResp(resp)
+      
+    finally:
+      pumpPolls()
+  
+  queue.request(lambda: tcp.send(req), handleResp)
+  
+def requestCommand(req, onResp):
+  queuedAt = system_clock()
+  
+  def handleResp(resp):
+    _commandWaits.append(system_clock() - queuedAt)
+    onResp(resp)
+    
+  queue.request(lambda: tcp.send(req), handleResp)
+  
+def emitSchedulerMetrics():
+  local_event_PollQueueDepth.emit(len(_pollLane) + _pollsOutstanding)
+  
+  for waits, signal in [ (_pollWaits, local_event_PollWait), (_commandWaits, local_event_CommandWait) ]:
+    if len(waits) > 0:
+      signal.emit(sum(waits) / len(waits))
+      del waits[:]
+      
+timer_schedulerMetrics = Timer(emitSchedulerMetrics, 15, 15)
+
+# -->
+
 # <protocol ---
 
 def parseResp(rawResp, onSuccess):
@@ -202,7 +348,7 @@ def pollActiveFaults():
   # see https://support.biamp.com/Tesira/Control/Tesira_TTP_Fault_Responses for full listing
   tcp_request("DEVICE get activeFaultList\n", lambda resp: parseResp(resp, parse_activeFaults))
   
-_pollers.append(Timer(pollActiveFaults, 60, 10, stopped=True)) # every minute, first after 10
+schedulePoll(pollActiveFaults, 60, 10) # every minute, first after 10
 
 # -->
 
@@ -214,7 +360,7 @@ local_event_Firmware = LocalEvent({ "schema": { "type": "string" }})
 def pollFirmware():
   tcp_request("DEVICE get version\n", lambda resp: parseResp(resp, lambda arg: local_event_Firmware.emit(arg)))
   
-_pollers.append(Timer(pollFirmware, 300, 5, stopped=True)) # every 5 mins, first after 5
+schedulePoll(pollFirmware, 300, 5) # every 5 mins, first after 5
 
 # -->
 
@@ -234,22 +380,24 @@ def bindInputs():
 def bindLevels():
   for info in param_LevelBlocks or []:
     levelInstance = info['instance']
+    rate = subscriptionRate(info)
     for num, name in enumerate(info['names'].split(',')):
-      initNumberValue('Level', 'level', name, levelInstance, num+1, group=levelInstance)
-      initBoolValue('Level Muting', 'mute', name, levelInstance, num+1, group=levelInstance)
+      initNumberValue('Level', 'level', name, levelInstance, num+1, group=levelInstance, rate=rate)
+      initBoolValue('Level Muting', 'mute', name, levelInstance, num+1, group=levelInstance, rate=rate)
       
 @after_main
 def bindMutes():
   for info in param_MuteBlocks or []:
     instance = info['instance']
+    rate = subscriptionRate(info)
     
     names = (info['names'] or '').strip()
     if len(names) > 0:
       for num, name in enumerate([x.strip() for x in names.split(',')]):
-        initBoolValue('Mute', 'mute', name, instance, num+1)
+        initBoolValue('Mute', 'mute', name, instance, num+1, rate=rate)
         
     else:
-      initBoolValue('Mute', 'mute', 'All', instance, 1)
+      initBoolValue('Mute', 'mute', 'All', instance, 1, rate=rate)
       
 @after_main
 def bindLogicSelectorBlocks():
@@ -382,7 +530,7 @@ def initRouterPoint(inst, oNum, oName, iNum, iName): # required to avoid variabl
   a = create_local_action(name, lambda ignore: lookup_local_action('%s %s Router' % (inst, oNum)).call(iNum), { 'title': '"%s"' % iName, 'group': 'Router %s' % inst, 'order': next_seq() })
         
 
-def initBoolValue(controlType, cmd, label, inst, index1, index2=None, group=None):
+def initBoolValue(controlType, cmd, label, inst, index1, index2=None, group=None, rate=None):
   if index2 == None:
     name = '%s %s %s' % (inst, index1, controlType)
   else:
@@ -405,9 +553,12 @@ def initBoolValue(controlType, cmd, label, inst, index1, index2=None, group=None
   index = index1 if index2 == None else '%s %s' % (index1, index2)
 
   # e.g. Mixer1 get crosspointLevelState 1 1
+  
+  def handleValue(arg):
+    signal.emit(arg == '1' or arg == 'true')
     
   getter = Action('Get ' + name, lambda arg: tcp_request('%s get %s %s\n' % (inst, cmd, index), 
-                          lambda resp: parseResp(resp, lambda arg: signal.emit(arg == '1' or arg == 'true'))),
+                          lambda resp: parseResp(resp, handleValue)),
                  {'title': 'Get', 'group': group, 'order': next_seq()})
   
   setter = Action(name, lambda arg: tcp_request('%s set %s %s %s\n' % (inst, cmd, index, '1' if arg == True else '0'), 
@@ -415,7 +566,10 @@ def initBoolValue(controlType, cmd, label, inst, index1, index2=None, group=None
                             lambda result: signal.emit(arg))), # NOTE: uses the original 'arg' here
                   {'title': title, 'group': group, 'order': next_seq(), 'schema': schema})
   
-  _pollers.append(Timer(lambda: getter.call(), random(120,150), random(5,10), stopped=True))
+  if rate != None:
+    initSubscription(inst, cmd, index, rate, handleValue)
+  else:
+    schedulePoll(lambda: getter.call(), VALUE_POLL_INTERVAL, 5)
   
   # and come conveniece derivatives
   
@@ -424,7 +578,7 @@ def initBoolValue(controlType, cmd, label, inst, index1, index2=None, group=None
   inverted = Event(name + " Inverted", {'title': '(inverted)', 'group': group, 'order': next_seq(), 'schema': schema})
   signal.addEmitHandler(lambda arg: inverted.emit(not arg))
 
-def initNumberValue(controlType, cmd, label, inst, index1, isInteger=False, index2=None, group=None):
+def initNumberValue(controlType, cmd, label, inst, index1, isInteger=False, index2=None, group=None, rate=None):
   if index2 == None:
     name = '%s %s %s' % (inst, index1, controlType)
   else:
@@ -445,9 +599,12 @@ def initNumberValue(controlType, cmd, label, inst, index1, isInteger=False, inde
   
   # some cmds take in index1 and index2
   index = index1 if index2 == None else '%s %s' % (index1, index2)
+  
+  def handleValue(arg):
+    signal.emit(int(float(arg)) if isInteger else float(arg))
     
   getter = Action('Get ' + name, lambda arg: tcp_request('%s get %s %s\n' % (inst, cmd, index), 
-                          lambda resp: parseResp(resp, lambda arg: signal.emit(int(float(arg)) if isInteger else float(arg)))),
+                          lambda resp: parseResp(resp, handleValue)),
                  {'title': 'Get', 'group': group, 'order': next_seq()})
   
   setter = Action(name, lambda arg: tcp_request('%s set %s %s %s\n' % (inst, cmd, index, arg), 
@@ -455,7 +612,10 @@ def initNumberValue(controlType, cmd, label, inst, index1, isInteger=False, inde
                             lambda result: signal.emit(arg))), # NOTE: uses the original 'arg' here
                   {'title': title, 'group': group, 'order': next_seq(), 'schema': schema})
   
-  _pollers.append(Timer(lambda: getter.call(), random(120,150), random(5,10), stopped=True))
+  if rate != None:
+    initSubscription(inst, cmd, index, rate, handleValue)
+  else:
+    schedulePoll(lambda: getter.call(), VALUE_POLL_INTERVAL, 5)
   
 @after_main
 def bindSourceSelects():
@@ -485,7 +645,7 @@ def initSourceSelect(inst, sourceCount, names):
   for i, label in zip(range(1, sourceCount+1), [x.strip() for x in names.split(',')]):
     bindSourceItem(inst, i, label, setter, signal)
   
-  _pollers.append(Timer(lambda: getter.call(), random(120,150), random(5,10), stopped=True))
+  schedulePoll(lambda: getter.call(), VALUE_POLL_INTERVAL, 5)
   
 def bindSourceItem(inst, i, label, setter, signal):
   name = '%s %s Selected' % (inst, i)
@@ -511,10 +671,11 @@ def bindMeterBlocks():
   for info in param_MeterBlocks or []:
     meterType = info['type']
     meterInstance = info['instance']
+    rate = subscriptionRate(info)
     for num, name in enumerate(info['names'].split(',')):
-      initMeters(meterType, name, meterInstance, num+1)
+      initMeters(meterType, name, meterInstance, num+1, rate=rate)
     
-def initMeters(meterType, label, inst, index):
+def initMeters(meterType, label, inst, index, rate=None):
   name = '%s %s' % (inst, index)
   title = '"%s"' % label
   
@@ -548,14 +709,91 @@ def initMeters(meterType, label, inst, index):
     tcp_request('%s get %s %s\n' % (inst, cmd, index), 
                 lambda resp: parseResp(resp, handleResult))
   
+  if rate != None:
+    initSubscription(inst, cmd, index, rate, handleResult)
+    return
+  
   # start meters much later to avoid being overwhelmed with feedback
-  _pollers.append(Timer(poll, 0.5, random(30,45), stopped=True))
+  schedulePoll(poll, 0.5, 30)
+
+# <!-- subscriptions
+
+# e.g. > Level1 subscribe level 1 S1 500
+#      < +OK
+#      < ! "publishToken":"S1" "value":-20.000000     (published on change, at most every 500 ms)
+
+DEFAULT_SUBSCRIPTION_RATE = 500 # ms
+
+_subscriptions = list()         # e.g. [ ('Level1', 'level', 1, 'S1', 500), ... ]
+_subscriptions_byToken = dict() # e.g. { 'S1': handleValue }
+
+def subscriptionRate(info):
+  # None if values are being polled
+  if param_FeedbackMode != FEEDBACK_MODES[1]:
+    return None
+  
+  return info.get('rate') or DEFAULT_SUBSCRIPTION_RATE
+
+def initSubscription(inst, attr, index, rate, handler):
+  token = 'S%s' % (len(_subscriptions) + 1)
+  
+  _subscriptions.append((inst, attr, index, token, rate))
+  _subscriptions_byToken[token] = handler
+  
+def subscribeAll():
+  # (subscriptions only last as long as the session so this is done on every connection)
+  for inst, attr, index, token, rate in _subscriptions:
+    tcp_request('%s subscribe %s %s %s %s\n' % (inst, attr, index, token, rate), lambda resp: parseResp(resp, lambda ignore: None))
+    
+def unsubscribeAll():
+  for inst, attr, index, token, rate in _subscriptions:
+    tcp_request('%s unsubscribe %s %s %s\n' % (inst, attr, index, token), lambda resp: parseResp(resp, lambda ignore: None))
+    
+@after_main
+def bindSubscriptions():
+  if param_FeedbackMode != FEEDBACK_MODES[1]:
+    return
+  
+  def handler(ignore):
+    console.info('Resubscribing %s subscriptions' % len(_subscriptions))
+    unsubscribeAll()
+    subscribeAll()
+  
+  Action('Resubscribe', handler, {'group': 'Subscriptions', 'order': next_seq()})
+  
+def handlePublish(msg):
+  # e.g. ! "publishToken":"S1" "value":-20.000000
+  global _lastReceive
+  _lastReceive = system_clock()
+  
+  tokenPos = msg.find('"publishToken":"')
+  tokenEnd = msg.find('"', tokenPos+16)
+  valuePos = msg.find('"value":', tokenEnd)
+  
+  handler = _subscriptions_byToken.get(msg[tokenPos+16:tokenEnd]) if tokenPos > 0 and tokenEnd > 0 else None
+  
+  if handler == None or valuePos < 0:
+    log(1, 'unexpected publish; was [%s]' % msg)
+    return
+  
+  try:
+    handler(msg[valuePos+8:])
+    
+  except Exception, exc:
+    global _errorCount
+    _errorCount += 1
+    console.warn('bad published value; was [%s] (%s)' % (msg, exc))
+
+# -->
 
 # only requests *if ready*
 def tcp_request(req, onResp):
     if receivedTelnetOptions:
       # tcp.request(req, onResp)
-      queue.request(lambda: tcp.send(req), onResp)
+      if _currentPoll != None:
+        queuePoll(req, onResp, _currentPoll) # (via the poll lane)
+      else:
+        requestCommand(req, onResp)
       
 # --- protocol>
 
@@ -586,7 +824,7 @@ def parseRow(objType, objLabel, objPartName, objTag):
     # AudioMeter24, AudioMeter, RMS Meter, LVL 25 Combining Space, 1,            1,    AudioMeter24
         
     console.log('import: RMS Meter "%s" - will only use first channel. Override if necessary' % objTag)
-    initMeters('RMS', 'main', objTag, 1)
+    initMeters('RMS', 'main', objTag, 1, rate=subscriptionRate({}))
         
   elif objType == 'Level':
     # Object Code, Type,  Label,  Partition Name,         Partition ID, Unit, Instance Tag
@@ -616,44 +854,88 @@ def tcp_received(data):
   # UNCOMMENT TO SHOW HEX TOO:
   # log(3, 'tcp_recv [%s] -- [%s]' % (data, data.encode('hex')))
   log(3, 'tcp_recv [%s]' % data)
-  for c in data:
-    handleByte(c)
+  handleChunk(data)
 
-telnetBuffer = list()
-recvBuffer = list()
-    
-def handleByte(c):
-  if len(telnetBuffer) > 0:
-    # goes into a TELNET frame
-    telnetBuffer.append(c)
-    
-    if len(telnetBuffer) == 3:
-      frame = ''.join(telnetBuffer)
-      del telnetBuffer[:]
-      telnet_frame_received(frame)
+import re
 
-    
-  elif c == '\xff':
-    # start of TELNET FRAME
-    telnetBuffer.append(c)
+MAX_MSG = 1024 # a NORMAL msg longer than this is dropped
+
+SPECIAL_CHARS = re.compile('[\r\n\xff]') # end of a NORMAL msg or start of a TELNET frame
+
+telnetBuffer = list() # a partial TELNET frame (3 bytes)
+recvBuffer = list()   # the parts of a partial NORMAL msg (across chunks)
+_recvLength = 0       # ...and their total length
+
+def handleChunk(data):
+  # scans for delimiters and TELNET frames, slicing whole msgs out of the chunk where possible
+  global _recvLength
+  
+  pos, end = 0, len(data)
+  
+  while pos < end:
+    if len(telnetBuffer) > 0:
+      # goes into a TELNET frame (can straddle chunks)
+      take = 3 - len(telnetBuffer)
+      telnetBuffer.append(data[pos:pos+take])
+      pos += take
       
-  elif c in ['\r', '\n']:
-    # end of a NORMAL msg
-    msg = ''.join(recvBuffer).strip()
-    del recvBuffer[:]
+      frame = ''.join(telnetBuffer)
+      if len(frame) == 3:
+        del telnetBuffer[:]
+        telnet_frame_received(frame)
+      continue
     
-    if len(msg) > 0:
-      queue.handle(msg)
+    match = SPECIAL_CHARS.search(data, pos)
+    nextPos = match.start() if match else end
     
-  else:
-    # put all other characters into NORMAL msg
-    recvBuffer.append(c)
+    if nextPos > pos:
+      # put all other characters into NORMAL msg
+      recvBuffer.append(data[pos:nextPos])
+      _recvLength += nextPos - pos
+      
+      if _recvLength > MAX_MSG:
+        dropOversized()
+        
+    if match == None:
+      break
     
-    if len(recvBuffer) > 1024:
-      console.warn('buffer too big; dropped; was "%s"' % ''.join(recvBuffer))
+    if data[nextPos] == '\xff':
+      # start of TELNET FRAME
+      telnetBuffer.append('\xff')
+      
+    else:
+      # end of a NORMAL msg
+      msg = (recvBuffer[0] if len(recvBuffer) == 1 else ''.join(recvBuffer)).strip()
       del recvBuffer[:]
-      global _errorCount
-      _errorCount += 1
+      _recvLength = 0
+      
+      if len(msg) == 0:
+        pass
+      
+      elif msg[0] == '!':
+        # published values go straight to their signals, not through the request queue
+        handlePublish(msg)
+        
+      else:
+        queue.handle(msg)
+      
+    pos = nextPos + 1
+    
+def dropOversized():
+  # drops every whole oversized msg, keeping any remainder
+  global _recvLength, _errorCount
+  
+  pending = ''.join(recvBuffer)
+  del recvBuffer[:]
+  
+  while len(pending) > MAX_MSG:
+    console.warn('buffer too big; dropped; was "%s"' % pending[:MAX_MSG+1])
+    pending = pending[MAX_MSG+1:]
+    _errorCount += 1
+    
+  if len(pending) > 0:
+    recvBuffer.append(pending)
+  _recvLength = len(pending)
     
 def telnet_frame_received(data):
   log(2, 'telnet_recv [%s]' % (data.encode('hex')))
@@ -676,7 +958,9 @@ def msg_received(data):
     global receivedTelnetOptions
     receivedTelnetOptions = True
     
-    [ p.start() for p in _pollers ]
+    startPolling()
+    
+    subscribeAll()
   
 def tcp_sent(data):
   log(3, 'tcp_sent [%s] -- [%s]' % (data, data.encode('hex')))
@@ -687,7 +971,7 @@ def tcp_disconnected():
   global receivedTelnetOptions
   receivedTelnetOptions = False
   
-  [ p.stop() for p in _pollers ]  
+  stopPolling()
   
 def tcp_timeout():
   console.warn('tcp_timeout; dropping (if connected)')
@@ -700,8 +984,12 @@ def tcp_timeout():
 def protocolTimeout():
   console.log('protocol timeout; flushing buffer; dropping connection (if connected)')
   queue.clearQueue()
+  resetPollLane()
   del recvBuffer[:]
   del telnetBuffer[:]
+  
+  global _recvLength
+  _recvLength = 0
 
   global receivedTelnetOptions
   receivedTelnetOptions = False
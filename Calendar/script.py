@@ -4,10 +4,14 @@
 '''
 A stateful multi-calendar / scheduling node that takes in event streams from sources (e.g. see *Microsoft Exchange Schedule Retriever* recipe).
 
-`rev 7`
+`rev 8`
 
 NOTE: by design, when this calendar (re)starts after config changes, it will automatically propagate remote actions. To avoid this behaviour, use the **Supress next propagation?** action.
 
+  * _rev 8_ "On transitions" evaluation mode, evaluates exactly when bookings start or end (and on feed changes) instead of every half-minute
+  * _rev 8_ agenda lines and day sections are cached and only re-rendered when their items or past/active/future status change
+  * _rev 8_ state trees persist between polls, only branches under changed items are re-traversed and propagated
+  * _rev 8_ source items are indexed (pre-parsed, interval tree) once per feed update instead of being re-parsed for every instant
   * _rev 7.241206_ "Suppress next propagation?" action
   * _rev 6_ bugfix: momentary events some times do not fire (interference with actual scheduler and agenda generation)
   * _rev 3_ support for "momentary" events (not stateful) when "start time" strictly equals "end time" e.g. `{ start: "... 02:45:00", end: "... 02:45:00", title: "{ Power: Off }" }`
@@ -35,6 +39,11 @@ param_signalTypes = Parameter({'title': 'Signal types', 'schema': {'type': 'arra
         'nonactiveState': {'type': 'string', 'order': 3}
     }}}})
 
+EVALUATION_MODES = ['Quantised polling', 'On transitions']
+
+param_evaluationMode = Parameter({'title': 'Evaluation mode', 'schema': {'type': 'string', 'enum': EVALUATION_MODES, 'hint': EVALUATION_MODES[0]},
+                                  'desc': '"Quantised polling" evaluates on every half-minute edge; "On transitions" evaluates exactly when a booking starts or ends and when a source feed changes.'})
+
 param_scheduleSources = Parameter({'title': 'Schedule sources', 'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
         'name': {'type': 'string', 'order': 1},
         'defaultMember': {'type': 'string', 'order': 2},
@@ -75,8 +84,14 @@ def SuppressNextPropagation():
 # signal types by name
 signalTypes = {}
 
-# last trees by signal name
-lastTrees = {}
+# (persistent) state trees by signal name
+stateTrees = {}
+
+# the (member, state, momentary) of the items last applied, by signal name
+lastItemKeys = {}
+
+# the names of each member and all members beneath it, by member name
+descendantsByMember = {}
 
 # members by member name
 members = {}
@@ -111,6 +126,9 @@ members = {}
 #
 # All keys in items must already be resolved and sanitised.
 # States with warnings will be skipped
+#
+# The trees persist between polls; only the members beneath items that were added, removed
+# or reordered since the last poll are re-locked, re-traversed and have their actions called.
 
 def applyStateList(states, force=False):
   # opt-ing out of next propagation?
@@ -118,48 +136,67 @@ def applyStateList(states, force=False):
   if suppressNextPropagation:
     # clear flag
     local_event_SuppressNextPropagation.emit(False)
-  
-  stateTrees = {}
-  
-  def lockAndTraverse(state, member, momentary, traverseOnly=False):
-    # set the state if not locked
-    if not member['locked']:
-      member['state'] = state
-      
-    # lock if not only traversing
-    if not traverseOnly:
-      member['locked'] = True
-      
-    member['momentary'] = momentary
-      
-    for subMember in member['members']:
-      # only traverse from here
-      lockAndTraverse(state, subMember, momentary, True)
-      
-  # create a tree for each signal type
+    
+  # the items for each signal type, in order
+  itemKeysBySignal = {}
   for signalType in param_signalTypes:
-    signalName = signalType['name']
-    stateTrees[signalName] = createNewTree()
+    itemKeysBySignal[signalType['name']] = list()
       
-  # for each state entry, traverse its branch (on its signal tree)
   for stateInfo in states:
     # skip those with warnings
     if not isBlank(stateInfo.get('warning')):
       continue
-
-    memberName = stateInfo['member']
-    signal = stateInfo['signal']
-    state = stateInfo['state']
-    momentary = stateInfo.get('momentary')
     
-    member = stateTrees[signal][memberName]
-      
-    lockAndTraverse(state, member, momentary)
+    itemKeysBySignal[stateInfo['signal']].append((stateInfo['member'], stateInfo['state'], bool(stateInfo.get('momentary'))))
     
   for signalType in param_signalTypes:
     signalName = signalType['name']
     
-    stateTree = stateTrees[signalName]
+    stateTree = stateTrees.get(signalName)
+    if stateTree == None:
+      # (no members are configured so 'main' never created the trees)
+      continue
+    
+    itemKeys = itemKeysBySignal[signalName]
+    
+    if force:
+      affected = stateTree.keys()
+    else:
+      affected = findAffectedMembers(lastItemKeys[signalName], itemKeys)
+      
+    lastItemKeys[signalName] = itemKeys
+    
+    if len(affected) == 0:
+      continue
+    
+    # unlock the affected members (remembering their last state)...
+    lastStates = {}
+    for name in affected:
+      member = stateTree[name]
+      lastStates[name] = member['state']
+      member['state'] = None
+      member['locked'] = False
+      member['momentary'] = False
+      
+    # ...and lock and traverse each item's branch, only as far as the affected members go
+    for memberName, state, momentary in itemKeys:
+      descendants = descendantsByMember[memberName]
+      
+      for name in affected:
+        if name not in descendants:
+          continue
+        
+        member = stateTree[name]
+        
+        # set the state if not locked
+        if not member['locked']:
+          member['state'] = state
+          
+        # only the item's own member gets locked
+        if name == memberName:
+          member['locked'] = True
+          
+        member['momentary'] = momentary
     
     # DEBUG: dump the all the trees
     dumpTree(stateTree)
@@ -167,7 +204,7 @@ def applyStateList(states, force=False):
     # state tree is ready, now go through all affected members and call the actions
     # taking into account what their previous state information was
   
-    for name in stateTree:
+    for name in affected:
       memberInfo = stateTree[name]
       state = memberInfo['state']
       
@@ -177,9 +214,7 @@ def applyStateList(states, force=False):
     
       reverting = False
       
-      lastState = lastTrees[signalName][name]['state']
-      
-      # wasMomentary = lastTrees[signalName][name]['momentary']
+      lastState = lastStates[name]
       
       if not force and state == lastState:
         continue
@@ -191,10 +226,6 @@ def applyStateList(states, force=False):
           continue
           
         else:
-          # if wasMomentary:
-          #   print ('Skipping "%s", was momentary' % name)
-          #   continue
-          
           state = signalType['nonactiveState']
           reverting = True
       
@@ -210,8 +241,33 @@ def applyStateList(states, force=False):
         lookup_remote_action(actionName).call(arg)
       
       lookup_local_event('%s %s' % (name, signalName)).emit(state)
+      
+def findAffectedMembers(lastKeys, keys):
+  '''The members beneath any items that differ between the two ordered lists (and any momentary ones)'''
+  # skip over the common head and tail
+  head = 0
+  while head < len(lastKeys) and head < len(keys) and lastKeys[head] == keys[head]:
+    head += 1
+    
+  tail = 0
+  while tail < len(lastKeys) - head and tail < len(keys) - head and lastKeys[-1-tail] == keys[-1-tail]:
+    tail += 1
     
-    lastTrees[signalName] = stateTree
+  roots = set()
+  
+  for key in lastKeys[head:len(lastKeys)-tail] + keys[head:len(keys)-tail]:
+    roots.add(key[0])
+    
+  # momentary items always need their members re-evaluated
+  for key in lastKeys + keys:
+    if key[2]:
+      roots.add(key[0])
+    
+  affected = set()
+  for root in roots:
+    affected.update(descendantsByMember[root])
+    
+  return list(affected)
       
 def dumpTree(tree):
   if local_event_Debug.getArg() > 0:
@@ -226,7 +282,8 @@ def createNewTree():
     name = memberInfo['name']
     
     if name not in stateTree:
-      member = { 'state': None,
+      member = { 'name': name,
+                 'state': None,
                  'locked': False,
                  'isEdge': False,
                  'momentary': False, # if a momentary event was last involved
@@ -251,6 +308,19 @@ def createNewTree():
     
   return stateTree
 
+def collectDescendants(member, name):
+  names = set([name])
+  
+  def traverse(member):
+    for subMember in member['members']:
+      if subMember['name'] not in names:
+        names.add(subMember['name'])
+        traverse(subMember)
+        
+  traverse(member)
+  
+  return names
+
 def main():
   # set up the schedule sources
   if isEmpty(param_scheduleSources):
@@ -275,23 +345,75 @@ def main():
   for memberInfo in param_members:
     initMember(memberInfo)
     
+  # any feeds indexed before members and signal types were known need re-resolving
+  scheduleIndexes.clear()
+    
   # TODO: ideally unpersist this data but not a big deal if done outside of booking windows
   
-  # initialise last trees
+  # initialise the trees
   # create a tree for each signal type
   for signalType in param_signalTypes:
     signalName = signalType['name']
-    lastTrees[signalName] = createNewTree()
+    stateTrees[signalName] = createNewTree()
+    lastItemKeys[signalName] = list()
+    
+  # (the member hierarchy is the same for all signal types)
+  for name, member in stateTrees[param_signalTypes[0]['name']].items():
+    descendantsByMember[name] = collectDescendants(member, name)
 
   # give at least 20s for opportunity to suppress initial propagation
-  delay = quantisePollNow(minDelay=20)
+  if onTransitions():
+    delay = 20
+    timer_poller.setDelay(delay)
+    
+    console.info('Scheduler started! (evaluating on transitions, first one in %.1f seconds)' % delay)
+    
+  else:
+    delay = quantisePollNow(minDelay=20)
   
-  console.info('Scheduler started! (polling on half-minute boundaries first one in %.1f seconds)' % delay)
+    console.info('Scheduler started! (polling on half-minute boundaries first one in %.1f seconds)' % delay)
 
   console.info("NOTE: 'Suppress Next Propagation' can be used to avoid any initial actions being called just after (re)starts.")
   
   # check the active future ones every 5 mins (after 30s at first)
-  Timer(lambda: lookup_local_action('ProcessActiveFuture').call(), 2.5*60, 30)
+  # (when evaluating on transitions, that's done with each evaluation instead)
+  if not onTransitions():
+    Timer(lambda: lookup_local_action('ProcessActiveFuture').call(), 2.5*60, 30)
+  
+def onTransitions():
+  return param_evaluationMode == 'On transitions'
+
+# longest time between evaluations when on transitions (in secs)
+MAX_TRANSITION_DELAY = 60 * 60
+
+# schedules the next poll for the next start or end of any item (or momentary event)
+def armForNextTransition():
+  nowMillis = date_now().getMillis()
+  
+  nextMillis = None
+  for sourceInfo in param_scheduleSources:
+    transition = getScheduleIndex(sourceInfo).nextTransition(nowMillis)
+    if transition != None and (nextMillis == None or transition < nextMillis):
+      nextMillis = transition
+      
+  if nextMillis == None:
+    delay = MAX_TRANSITION_DELAY
+  else:
+    # (a timer firing marginally early is simply re-armed for the same transition)
+    delay = min(MAX_TRANSITION_DELAY, max(0.05, (nextMillis - nowMillis) / 1000.0))
+    
+  timer_poller.setDelay(delay)
+  
+  if local_event_Debug.getArg() > 0:
+    console.log('Next evaluation in %.1f seconds' % delay)
+  
+  return delay
+
+def scheduleNextPoll():
+  if onTransitions():
+    return armForNextTransition()
+  else:
+    return quantisePollNow()
   
 # schedules the next poll on sharp 30s wall-clock edges
 def quantisePollNow(minDelay=0):
@@ -310,10 +432,15 @@ def handlePollTimer():
     console.log('handlePollTimer called')
 
   # when this timer fires, we should be on sharp 30s intervals 
-  # of the wall clock
+  # of the wall clock (or on a transition)
   
   lookup_local_action('ProcessActiveNow').call()
-  quantisePollNow()
+  
+  if onTransitions():
+    # the agenda changes on transitions too
+    lookup_local_action('ProcessActiveFuture').call()
+  
+  scheduleNextPoll()
   
 timer_poller = Timer(handlePollTimer, 99999, 99999) # NOTE: 'delay' is continually set on-the-fly
                                                     #       and 'interval' control is not used
@@ -363,7 +490,13 @@ def initScheduleSource(sourceInfo):
 def handleScheduleSourceFeed(sourceInfo, items):
   lookup_local_event('Source %s Items' % sourceInfo['name']).emit(items)
   
+  # index once per feed update
+  scheduleIndexes[sourceInfo['name']] = ScheduleIndex(sourceInfo, items)
+  
   lookup_local_action('ProcessActiveNow').call()
+  
+  if onTransitions():
+    lookup_local_action('ProcessActiveFuture').call()
 
 # the last time a poll was done (used to assist with momentary events i.e. startTime == endTime (zero-length).
 _lastInstant = None # (date time obj based)
@@ -383,7 +516,7 @@ def local_action_ProcessActiveNow(arg=None):
 
   applyStateList(items)
   
-  quantisePollNow()
+  scheduleNextPoll()
   
 # this action is called by the user to force states instead of only respecting changes in state
 def local_action_ForceActiveNow(arg=None):
@@ -402,21 +535,14 @@ def local_action_ForceActiveNow(arg=None):
 
 # this action is used to update the agenda and forwarn of inconsistent event data
 def local_action_ProcessActiveFuture(arg=None):
-  instantsSet = set()
-  instantsList = list()
+  instantsByMillis = {}
 
   for sourceInfo in param_scheduleSources:
-    items = lookup_local_event('Source %s Items' % sourceInfo['name']).getArg()
-
-    for item in safely(items):
-      start = item['start']
-
-      if start not in instantsSet:
-        instantsList.append(date_parse(start))
-        instantsSet.add(start)
+    for entry in getScheduleIndex(sourceInfo).entries:
+      instantsByMillis.setdefault(entry['startMillis'], entry['startDate'])
 
   # sort by date
-  instantsList.sort()
+  instantsList = [instantsByMillis[millis] for millis in sorted(instantsByMillis)]
 
   result = list()
   
@@ -443,88 +569,144 @@ def local_action_ProcessActiveFuture(arg=None):
   
   emitAgenda(result)
   
+# agenda lines by item key (see 'agendaKey'), kept from one rendering to the next
+agendaLines = {}
+
+# rendered agenda sections by day, along with the lines and classifications they were rendered from
+agendaSections = {}
+
 def emitAgenda(fullList):
   "Where 'fullList' contains {'instant': '...', 'items' : [ ... ]}"
-  lines = list()
+  global agendaLines, agendaSections
   
-  now = date_now()
+  nowMillis = date_now().getMillis()
+  
+  lines = {}
   
-  currentDay = ''
+  # e.g. [ ('Mon 3-Jun', [ (key, 'past'), (key, 'active'), ... ]), ... ]
+  days = list()
   
   for instantItem in fullList:
-    instant = date_parse(instantItem['instant'])
-    items = instantItem['items']
-    
-    for item in items:
-      # only include instants where they're the start time
-      start = date_parse(item['start'])
-      if start != instant:
-        continue
+    for item in instantItem['items']:
+      key = agendaKey(instantItem['instant'], item)
       
-      day = instant.toString('E d-MMM')
-      
-      momentary = item.get('momentary')
-      
-      # group by day
-      if day != currentDay:
-        if len(lines) > 0:
-          lines.append('')
-          
-        lines.append('**%s**\r\n' % day)
-        
-        currentDay = day
-            
-      end = date_parse(item['end'])
+      line = lines.get(key)
+      if line == None:
+        line = agendaLines.get(key)
+      if line == None:
+        line = prepareAgendaLine(instantItem['instant'], item)
+      lines[key] = line
       
-      inThePast = now.isAfter(end)
+      # only include instants where they're the start time
+      if line is SKIPPED_AGENDA_LINE:
+        continue
       
-      isActive = now.isAfter(start) and now.isBefore(end)
-            
-      if not momentary:
-        # include the end part (with day part if it's a different day)
-        endPart = 'until **%s**' % (end.toString('h:mm a') if instant.toString('yyyyMMdd') == end.toString('yyyyMMdd') else end.toString('E d-MMM h:mm a'))
+      if nowMillis > line['endMillis']:
+        classification = 'past'
+      elif nowMillis > line['startMillis'] and nowMillis < line['endMillis']:
+        classification = 'active'
       else:
-        endPart = ''
+        classification = 'future'
         
-      # strip out brackets, e.g. "... { ... }" TODO: use regex
-      title = item['title'] or ''
-      bracketPos = title.rfind('{')
-      if bracketPos >= 0:
-        bracketEnd = title.rfind('}')
-        if bracketEnd > bracketPos:
-          title = title[:bracketPos]
-      title = title.strip()
-      
-      titlePart = '' if not title else '("%s")' % title
+      # group by day
+      if len(days) == 0 or days[-1][0] != line['day']:
+        days.append((line['day'], list()))
         
-      # example:
-      # At 3:30 PM, Power On in ASDF "longer title" 
-      # INVALID: At 3:30 PM Power On in ASDF "longer title" 
+      days[-1][1].append((key, classification))
       
-      line = u'%s%s **%s** %s %s in %s %s %s' % ('<span style="color:red">**INVALID**</span> ' if item.get('warning') else '',
-                                       'From' if not momentary else 'At',
-                                       instant.toString('h:mm a'),
-                                       item['signal'],
-                                       item.get('state') if 'state' in item else '<undefined_state>',
-                                       item['member'],
-                                       titlePart,
-                                       endPart)
-      if inThePast:
-        # wrap in strike out
-        line = ' * <s style="color:#444444;">%s</s>' % line
-      elif isActive:
-        # wrap in purple #ff00ff, actually green
-        line = ' * <span style="color:#00ff00">%s</span>' % line
-      else:
-        # future, lighter #444444, actually leave as is
-        line = ' * %s' % line
+  sections = {}
+  
+  for day, signature in days:
+    section = agendaSections.get(day)
+    
+    # only render the day again if any of its items or their classification have changed
+    if section == None or section[0] != signature:
+      section = (signature, renderAgendaSection(day, signature, lines))
       
-      lines.append(line)
+    sections[day] = section
+    
+  agendaLines = lines
+  agendaSections = sections
   
   if len(fullList) == 0:
-    lines.append('No upcoming events')
+    agenda = 'No upcoming events'
+  else:
+    agenda = '\r\n\r\n'.join([sections[day][1] for day, signature in days])
   
-  local_event_Agenda.emit('\r\n'.join(lines))
+  local_event_Agenda.emitIfDifferent(agenda)
+  
+def agendaKey(instant, item):
+  return (instant, item['start'], item['end'], item['title'], item['signal'], item.get('state', '<undefined_state>'), item['member'], 
+          item.get('warning'), item.get('momentary'))
+
+# for items that are at an instant other than their start time
+SKIPPED_AGENDA_LINE = {}
+
+def prepareAgendaLine(instantText, item):
+  instant = date_parse(instantText)
+  
+  start = date_parse(item['start'])
+  if start != instant:
+    return SKIPPED_AGENDA_LINE
+  
+  momentary = item.get('momentary')
+  
+  end = date_parse(item['end'])
+  
+  if not momentary:
+    # include the end part (with day part if it's a different day)
+    endPart = 'until **%s**' % (end.toString('h:mm a') if instant.toString('yyyyMMdd') == end.toString('yyyyMMdd') else end.toString('E d-MMM h:mm a'))
+  else:
+    endPart = ''
+    
+  # strip out brackets, e.g. "... { ... }" TODO: use regex
+  title = item['title'] or ''
+  bracketPos = title.rfind('{')
+  if bracketPos >= 0:
+    bracketEnd = title.rfind('}')
+    if bracketEnd > bracketPos:
+      title = title[:bracketPos]
+  title = title.strip()
+  
+  titlePart = '' if not title else '("%s")' % title
+    
+  # example:
+  # At 3:30 PM, Power On in ASDF "longer title" 
+  # INVALID: At 3:30 PM Power On in ASDF "longer title" 
+  
+  text = u'%s%s **%s** %s %s in %s %s %s' % ('<span style="color:red">**INVALID**</span> ' if item.get('warning') else '',
+                                   'From' if not momentary else 'At',
+                                   instant.toString('h:mm a'),
+                                   item['signal'],
+                                   item.get('state') if 'state' in item else '<undefined_state>',
+                                   item['member'],
+                                   titlePart,
+                                   endPart)
+  
+  return { 'day': instant.toString('E d-MMM'),
+           'startMillis': start.getMillis(),
+           'endMillis': end.getMillis(),
+           'text': text }
+
+def renderAgendaSection(day, signature, lines):
+  result = ['**%s**\r\n' % day]
+  
+  for key, classification in signature:
+    line = lines[key]['text']
+    
+    if classification == 'past':
+      # wrap in strike out
+      line = ' * <s style="color:#444444;">%s</s>' % line
+    elif classification == 'active':
+      # wrap in purple #ff00ff, actually green
+      line = ' * <span style="color:#00ff00">%s</span>' % line
+    else:
+      # future, lighter #444444, actually leave as is
+      line = ' * %s' % line
+      
+    result.append(line)
+    
+  return '\r\n'.join(result)
 
 def processAllActiveItems(instant, warnings, fromInstant=None):
   instantMillis = instant.getMillis()
@@ -537,75 +719,198 @@ def processAllActiveItems(instant, warnings, fromInstant=None):
     
   # consolidates all available calendar sources
   for sourceInfo in param_scheduleSources:
-    items = lookup_local_event('Source %s Items' % sourceInfo['name']).getArg()
-
-    for item in safely(items):
-      start = item['start']
-      end = item['end']
-
-      startMillis = date_parse(start).getMillis()
-      endMillis = date_parse(end).getMillis()
-      
-      momentary = False
+    for entry in getScheduleIndex(sourceInfo).activeAt(instantMillis, fromInstantMillis):
+      activeItem = dict(entry['resolved'])
       
-      if fromInstantMillis != None and startMillis == endMillis: # check if it's a momentary event
-        # check if active
-        if not (startMillis > fromInstantMillis and startMillis <= instantMillis):
-          # is not within poll period i.e. start is not between current instant and end of last instant
-          continue
-          
+      if entry['momentary']:
         # is an active momentary event
-        console.info('Is Active Momentary! %s' % start)
+        console.info('Is Active Momentary! %s' % entry['item']['start'])
         
-        momentary = True
+        activeItem['momentary'] = True
         
-      elif instantMillis < startMillis or instantMillis >= endMillis:
-        continue
+      warning = entry['warning']
+      if warning != None:
+        warnings.append({'start': instant,
+                         'calendar': sourceInfo['name'], 
+                         'title': entry['item']['title'],
+                         'message': warning})
+
+      activeItems.append(activeItem)
+  
+  return activeItems
+
+# <!--- schedule index
+
+# indexes by source name, rebuilt on every feed update
+scheduleIndexes = {}
+
+def getScheduleIndex(sourceInfo):
+  index = scheduleIndexes.get(sourceInfo['name'])
+  if index == None:
+    # e.g. first use after a restart, index what was last received
+    index = ScheduleIndex(sourceInfo, lookup_local_event('Source %s Items' % sourceInfo['name']).getArg())
+    scheduleIndexes[sourceInfo['name']] = index
+    
+  return index
 
-      activeItem = {}
+class ScheduleIndex:
+  '''The items of one source with their dates parsed and member, signal and state resolved up-front.
+     Active items (half-open 'start' to 'end') are found through an interval tree, momentary ones
+     (start equals end) through a sorted list of their starts.'''
+
+  def __init__(self, sourceInfo, items):
+    self.entries = list()
+    
+    intervals = list()
+    momentaries = list()
+    
+    for item in safely(items):
+      startDate = date_parse(item['start'])
+      endDate = date_parse(item['end'])
+      
+      entry = { 'seq': len(self.entries), # to keep results in feed order
+                'item': item,
+                'startDate': startDate,
+                'startMillis': startDate.getMillis(),
+                'endMillis': endDate.getMillis() }
+      
+      entry['momentary'] = entry['startMillis'] == entry['endMillis']
       
-      warning = None
+      entry['resolved'], entry['warning'] = resolveItem(sourceInfo, item)
       
-      for key in item:
-        activeItem[key] = item[key]
+      self.entries.append(entry)
+      
+      if entry['momentary']:
+        momentaries.append((entry['startMillis'], entry['seq']))
+      elif entry['startMillis'] < entry['endMillis']:
+        intervals.append(entry)
         
-      if momentary:
-        activeItem['momentary'] = True
+    momentaries.sort()
+    self.momentaryStarts = [start for start, seq in momentaries]
+    self.momentarySeqs = [seq for start, seq in momentaries]
+    
+    # every instant something starts or ends
+    transitions = set()
+    for entry in self.entries:
+      transitions.add(entry['startMillis'])
+      transitions.add(entry['endMillis'])
+    self.transitions = sorted(transitions)
+    
+    self.tree = IntervalNode(intervals)
+    
+  def activeAt(self, instantMillis, fromInstantMillis=None):
+    '''Entries active at the instant and, if 'fromInstantMillis' is given, momentary ones that fall
+       after it up to and including the instant.'''
+    seqs = list()
+    self.tree.query(instantMillis, seqs)
+    
+    if fromInstantMillis != None:
+      lo = bisect_right(self.momentaryStarts, fromInstantMillis)
+      hi = bisect_right(self.momentaryStarts, instantMillis)
+      seqs.extend(self.momentarySeqs[lo:hi])
+      
+    seqs.sort()
+    
+    return [self.entries[seq] for seq in seqs]
+  
+  def nextTransition(self, afterMillis):
+    '''The first instant (millis) after the given one when something starts or ends, if any.'''
+    i = bisect_right(self.transitions, afterMillis)
+    
+    return self.transitions[i] if i < len(self.transitions) else None
 
-      # resolve member
-      if isBlank(item['member']):
-        activeItem['member'] = sourceInfo['defaultMember']
+class IntervalNode:
+  '''A (static) centred interval tree node over entries with 'startMillis' < 'endMillis'.'''
+  
+  def __init__(self, entries):
+    self.left = None
+    self.right = None
+    
+    if len(entries) == 0:
+      self.center = None
+      return
+    
+    # the median start is always one of the overlapping ones so each level makes progress
+    self.center = sorted([entry['startMillis'] for entry in entries])[len(entries) // 2]
+    
+    lefts, rights, overlapping = list(), list(), list()
+    for entry in entries:
+      if entry['endMillis'] <= self.center:
+        lefts.append(entry)
+      elif entry['startMillis'] > self.center:
+        rights.append(entry)
+      else:
+        overlapping.append(entry)
+        
+    self.byStart = sorted([(entry['startMillis'], entry['seq']) for entry in overlapping])
+    self.byEnd = sorted([(entry['endMillis'], entry['seq']) for entry in overlapping], reverse=True)
+    
+    if len(lefts) > 0:
+      self.left = IntervalNode(lefts)
+      
+    if len(rights) > 0:
+      self.right = IntervalNode(rights)
+    
+  def query(self, millis, seqs):
+    '''Collects the seqs of entries where 'startMillis' <= millis < 'endMillis'.'''
+    node = self
+    
+    while node != None and node.center != None:
+      if millis < node.center:
+        # all overlapping ones end after the centre, check their starts
+        for start, seq in node.byStart:
+          if start > millis:
+            break
+          seqs.append(seq)
+          
+        node = node.left
+        
+      else:
+        # all overlapping ones start on or before the centre, check their ends
+        for end, seq in node.byEnd:
+          if end <= millis:
+            break
+          seqs.append(seq)
+          
+        node = node.right
 
-      # validate member
-      if members.get(activeItem['member']) == None:
-        warning = 'Unknown member: %s' % activeItem['member']
+def resolveItem(sourceInfo, item):
+  '''Returns the item with member, signal and state resolved against the source defaults, and any warning.'''
+  activeItem = dict(item)
+  
+  warning = None
 
-      # resolve signal type
-      signal = item['signal']
-      if isBlank(signal):
-        signal = sourceInfo['defaultSignal']
-      activeItem['signal'] = signal
+  # resolve member
+  if isBlank(item['member']):
+    activeItem['member'] = sourceInfo['defaultMember']
 
-      # validate signal type
-      if signal not in signalTypes:
-        warning = 'Ignoring unmanaged signal type: %s' % signal
+  # validate member
+  if members.get(activeItem['member']) == None:
+    warning = 'Unknown member: %s' % activeItem['member']
 
-      # resolve signal state
-      elif item['state'] == None:
-        # safe to look up signal type to get active state
-        activeItem['state'] = signalTypes[activeItem['signal']]['activeState']
-        
-      if warning != None:
-        activeItem['warning'] = warning
-        warnings.append({'start': instant,
-                         'calendar': sourceInfo['name'], 
-                         'title': item['title'],
-                         'message': warning})
+  # resolve signal type
+  signal = item['signal']
+  if isBlank(signal):
+    signal = sourceInfo['defaultSignal']
+  activeItem['signal'] = signal
 
-      activeItems.append(activeItem)
-  
-  return activeItems
+  # validate signal type
+  if signal not in signalTypes:
+    warning = 'Ignoring unmanaged signal type: %s' % signal
+
+  # resolve signal state
+  elif item['state'] == None:
+    # safe to look up signal type to get active state
+    activeItem['state'] = signalTypes[activeItem['signal']]['activeState']
+    
+  if warning != None:
+    activeItem['warning'] = warning
+    
+  return activeItem, warning
+
+from bisect import bisect_right
 
+# schedule index ---!>
 
 # <!--- status
 
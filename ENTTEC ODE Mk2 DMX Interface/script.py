@@ -5,6 +5,10 @@
 
 * loads channels buffer on first use; unused channels will be left unchanged.
 * smoothing is done over 1200 ms @ 20 Hz unless overridden
+* frames are only streamed while channels are changing, otherwise re-sent once a second (keep-alive)
+* fades can follow a linear, S-curve or logarithmic dimmer law curve; **Crossfade** fades many fixtures together (e.g. cues)
+* multiple universes, each with their own destination and rate, over Art-Net or sACN (E1.31, multicast by default); only the
+  first universe is synced from the device buffer, others start at zero
 
 This nodes allows for single and multi-channel color+ channel modes.
 
@@ -21,6 +25,9 @@ Useful links:
 CHANGELOG:
 
 - added support for stream rate adjustments
+- ArtDMX packets are pre-packed in a byte array (header filled in once) with changed channels tracked
+- fade engine keeps active fades in parallel arrays, drops completed ones and supports easing curves
+- multi-universe Art-Net and sACN (E1.31) output
 - included custom script which support V2 firmware for the Ethergate series (which has a different endpoint and HTTP scheme)
 
 TODO:
@@ -36,25 +43,54 @@ param_singleChannels = Parameter({ 'title': 'Single Channels', 'schema': { 'type
   'name': { 'type': 'string', 'hint': 'e.g. Light 1', 'order': next_seq() },
   'label': { 'title': 'label / group', 'type': 'string', 'hint': 'e.g. Front', 'order': next_seq() },
   'num': { 'title': 'channel num.', 'type': 'integer', 'hint': '(1 means first)' },
+  'universe': { 'type': 'integer', 'hint': '(default: first universe)' },
 }}}})
 
 param_rgbChannels = Parameter({ 'title': 'RGB+ Channels', 'schema': { 'type': 'array', 'items': { 'type': 'object', 'properties': {
   'name': { 'type': 'string', 'hint': 'e.g. Light 1', 'order': next_seq() },
   'label': { 'title': 'label / group', 'type': 'string', 'hint': 'e.g. Front', 'order': next_seq() },
   'num': { 'title': 'first channel num.', 'type': 'integer', 'hint': '(1 means first)' },
-  'channels': { 'type': 'string', 'hint': '(e.g. "rgbwaiD")', 'desc': 'Refer to light manaul for applicable multi-channel modes, e.g. "w" - white, "a" - amber", "i" - infrared, "D" - dimmer, etc' }
+  'channels': { 'type': 'string', 'hint': '(e.g. "rgbwaiD")', 'desc': 'Refer to light manaul for applicable multi-channel modes, e.g. "w" - white, "a" - amber", "i" - infrared, "D" - dimmer, etc' },
+  'universe': { 'type': 'integer', 'hint': '(default: first universe)' }
 }}}})
 
 DEFAULT_STREAM_RATE = 20 # (Hz) e.g. 20/sec (0.05)
 
 param_streamRate = Parameter({'title': 'Stream rate (Hz)', 'schema': {'type': 'integer', 'hint': '%s' % DEFAULT_STREAM_RATE, 'default': DEFAULT_STREAM_RATE, 'min': 1, 'max': 44}})
 
-_rawChannels = None # must be either None or a full array of channel values
+CURVES = ['Linear', 'S-curve', 'Dimmer law (logarithmic)']
 
-_singleChannelTargets_byChannel = { } # [ 11: ( targetValue, startTime, endTime ) ]
+param_fadeCurve = Parameter({'title': 'Fade curve', 'desc': 'Default curve, can be overridden by the timed actions', 
+                             'schema': {'type': 'string', 'enum': CURVES, 'hint': CURVES[0]}})
+
+OUTPUT_MODES = ['Art-Net', 'sACN (E1.31)']
+
+param_outputMode = Parameter({'title': 'Output mode', 'schema': {'type': 'string', 'enum': OUTPUT_MODES, 'hint': OUTPUT_MODES[0]}})
+
+param_universes = Parameter({'title': 'Universes', 'desc': 'Optional - if empty, a single universe (0 with Art-Net, 1 with sACN) is used. The first universe is synced from the device buffer, others start at zero.',
+                             'schema': {'type': 'array', 'items': {'type': 'object', 'properties': {
+  'universe': {'type': 'integer', 'hint': '(Art-Net 0 - 32767, sACN 1 - 63999)', 'order': 1},
+  'ipAddress': {'title': 'IP address', 'type': 'string', 'hint': '(default: IP address above, multicast with sACN)', 'order': 2},
+  'rate': {'title': 'rate (Hz)', 'type': 'integer', 'hint': '(default: stream rate)', 'order': 3}}}}})
+
+DEFAULT_SACN_PRIORITY = 100
+
+param_sacnPriority = Parameter({'title': 'sACN priority', 'schema': {'type': 'integer', 'hint': '%s' % DEFAULT_SACN_PRIORITY, 'min': 0, 'max': 200}})
+
+_rawChannels = None # must be either None or a full array of channel values (all universes, UNIVERSE_SIZE each)
+
+_universes = list() # e.g. [ { 'universe': 0, 'dest': '10.0.0.1:6454', 'interval': 50 }, ... ], in channel order
+
+_frames = None # the frames (see DmxFrame), one per universe, created once channels are synced
 
 UDP_PORT = 6454 # is 0x1936
 
+SACN_PORT = 5568
+
+UNIVERSE_SIZE = 512
+
+_tickInterval = 1000 / DEFAULT_STREAM_RATE # (millis) of the streamer
+
 def main():
   if is_blank(param_ipAddress):
     return console.warn('No IP address specified')
@@ -62,6 +98,8 @@ def main():
   global _ipAddress
   _ipAddress = param_ipAddress
   
+  initUniverses()
+  
   # single channel faders
   for info in param_singleChannels or EMPTY:
     initSingleChannel(info)
@@ -73,36 +111,79 @@ def main():
   console.info('Raw channel values will be synced before faders will be operational...')
   timer_syncOnce.start()
 
-  # update stream rate
-  if param_streamRate:
-    timer_streamer.setInterval(1.0 / param_streamRate)
+  # stream at the fastest universe rate
+  global _tickInterval
+  _tickInterval = min([ u['interval'] for u in _universes ])
+  timer_streamer.setInterval(_tickInterval / 1000.0)
+    
+  if param_fadeCurve in CURVES:
+    global _defaultCurve
+    _defaultCurve = CURVES.index(param_fadeCurve)
+  
+def initUniverses():
+  sacn = param_outputMode == OUTPUT_MODES[1]
+  defaultInterval = 1000 / (param_streamRate or DEFAULT_STREAM_RATE)
+  
+  for info in param_universes or [ { 'universe': 1 if sacn else 0 } ]:
+    universe = info.get('universe') or 0
+    
+    if sacn:
+      if is_blank(info.get('ipAddress')):
+        dest = '239.255.%s.%s:%s' % ((universe >> 8) & 0xff, universe & 0xff, SACN_PORT) # multicast
+      else:
+        dest = '%s:%s' % (info['ipAddress'], SACN_PORT)
+    else:
+      dest = '%s:%s' % (info.get('ipAddress') or _ipAddress, UDP_PORT)
+      
+    _universes.append({ 'universe': universe, 'dest': dest,
+                        'interval': 1000 / info['rate'] if info.get('rate') > 0 else defaultInterval })
+    
+    console.info('universe %s => %s' % (universe, dest))
+    
+def toChannel(info):
+  '''The channel num. (1-based) across all universes of a fixture or None if its universe is not configured'''
+  universe = info.get('universe')
+  if universe == None:
+    return info['num']
+  
+  for slot, u in enumerate(_universes):
+    if u['universe'] == universe:
+      return slot * UNIVERSE_SIZE + info['num']
+    
+  console.warn('%s: universe %s is not configured' % (info['name'], universe))
   
 # -->
 
 LIGHTING_HINT = '(e.g. "hsbw(180, 0, 10, 100)", "#rrggbb", ...)' # for use in the schema
 
 FADESMOOTH_RES = 1200 # millis
+
+_faders_byName = { } # e.g. { 'Light 1': do_fade(target, period, curve) }, for crossfades
+
+CURVE_SCHEMA = { 'type': 'string', 'enum': CURVES, 'hint': '(default)', 'order': 3 }
     
 def initSingleChannel(info):
   name = info['name']
   label = info['label'] or 'Default group'
   
-  num = info['num']
+  num = toChannel(info)
+  if num == None:
+    return
   
   ctx = 'singleChannelFader#%s' % name
   
   e = Event(name, { 'title': name, 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'number', 'format': 'range', 'min': 0, 'max': 100 }})
   
-  def do_fade(target, period):
+  def do_fade(target, period, curve=None, now=None):
     if _rawChannels == None: return # not ready
     if target == None: return console.warn( '%s: no arg supplied' % ctx)
+    if isinstance(target, basestring): target = float(target) # (from crossfades)
     if target < 0.0: return console.warn('%s: arg less than 0.0 percent' % ctx)
     if target > 100.0: return console.warn('%s: arg greater than 100.0 percent' % ctx)
     
     rawValue = int(target * 255 / 100)
     
-    now = system_clock() # millis
-    _singleChannelTargets_byChannel[num] = ( _rawChannels[num-1], rawValue, now, now+period )    
+    startFade(num, rawValue, now or system_clock(), period, curve)
     
     console.info('%s: setting to %s percent over %s ms' % (ctx, target, period))
     
@@ -110,23 +191,29 @@ def initSingleChannel(info):
     
     # streamer will then take care of sending
   
+  _faders_byName[name] = do_fade
+  
   # with default period
   Action(name, lambda arg: do_fade(arg, FADESMOOTH_RES), 
          { 'title': name, 'group': '"%s"' % label, 'order': next_seq(), 
            'schema': { 'type': 'number', 'hint': '(0.0%% - 100.0%%)', 'format': 'range', 'min': 0, 'max': 100 }})
 
   # with period parameter
-  Action('%s Timed' % name, lambda arg: do_fade(arg['target'], arg['period']), 
+  Action('%s Timed' % name, lambda arg: do_fade(arg['target'], arg['period'], arg.get('curve')), 
          { 'title': '(timed)', 'group': '"%s"' % label, 'order': next_seq(), 
            'schema': { 'type': 'object', 'properties': {
              'target': { 'type': 'number', 'hint': '(0.0%% - 100.0%%)', 'format': 'range', 'min': 0, 'max': 100, 'order': 1 },
-             'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 }}}})
+             'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 },
+             'curve': CURVE_SCHEMA }}})
     
 def init_rgbChannels(info):
   name = info['name']
   label = info['label'] or 'Default group'
   
-  num = info['num']
+  num = toChannel(info)
+  if num == None:
+    return
+  
   channels = info['channels'] # e.g. 'rgbwaiD' "w" - white, "a" - amber", "i" - infrared, "D" - dimmer, etc
 
   ctx = 'rgbChannels#%s' % name
@@ -141,7 +228,7 @@ def init_rgbChannels(info):
   
   eDimmer = Event('%s Dimmer' % name, { 'title': '(dimmer)', 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'number' }})
 
-  def do_fade(target, dimmer, period):
+  def do_fade(target, dimmer, period, curve=None, now=None):
     if _rawChannels == None: return # not ready yet
     
     # e.g. target="hsbw(180, 0, 10, 100)" OR "#rrggbb", ...
@@ -167,31 +254,29 @@ def init_rgbChannels(info):
         # e.g. when static: r = round(channelValues['r'] / 100.0 * 255 * dimmer / 100.0)
         logParts.append('%s:%s' % (c, raw)) # e.g. "r:255"
     
-    now = system_clock() # millis
-    endTime = now + period
+    now = now or system_clock() # millis
     
     for c in channels:
       if c not in raw_byLetter:
         continue
 
-      xChan = channels_byLetter[c]
-      startValue = _rawChannels[xChan-1]
-      targetValue = raw_byLetter[c]
-      
-      _singleChannelTargets_byChannel[xChan] = ( startValue, targetValue, now, endTime )
+      startFade(channels_byLetter[c], raw_byLetter[c], now, period, curve)
     
     log(1, '%s: set to %s dimmer:%s over %s ms' % (ctx, ' '.join(logParts), dimmer, period))
     
     e.emit(target) # ...and streamer will then take care of sending...
   
+  _faders_byName[name] = lambda target, period, curve=None, now=None: do_fade(target, eDimmer.getArg(), period, curve, now)
+  
   Action(name, lambda arg: do_fade(arg, None, FADESMOOTH_RES), { 'title': name, 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'string', 'hint': LIGHTING_HINT }})
 
-  Action('%s Timed' % name, lambda arg: do_fade(arg['target'], eDimmer.getArg(), arg['period']), 
+  Action('%s Timed' % name, lambda arg: do_fade(arg['target'], eDimmer.getArg(), arg['period'], arg.get('curve')), 
          { 'title': '(timed)', 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'object', 'properties': {
              'target': { 'type': 'string', 'hint': LIGHTING_HINT, 'order': 1 },
-             'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 }}}})
+             'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 },
+             'curve': CURVE_SCHEMA }}})
   
-  def handle_dimmer(level, period):
+  def handle_dimmer(level, period, curve=None):
     if _rawChannels == None: return # not ready
     if level == None: return console.warn( '%s: no arg supplied' % ctx)
     if level < 0.0: return console.warn('%s: arg less than 0.0 percent' % ctx)
@@ -202,60 +287,162 @@ def init_rgbChannels(info):
     if not hasDimmer:
       # fade using pseudo dimmer
       target = e.getArg() # use existing colour (channel) target
-      do_fade(target, level, period)
+      do_fade(target, level, period, curve)
       
     else:
       # use actual dimmer channel
       rawValue = int(level * 255 / 100)
-      now = system_clock() # millis
-      dChan = channels_byLetter['D']
-      _singleChannelTargets_byChannel[dChan] = ( _rawChannels[dChan-1], rawValue, now, now+period )
+      startFade(channels_byLetter['D'], rawValue, system_clock(), period, curve)
 
   Action('%s Dimmer' % name, lambda arg: handle_dimmer(arg, FADESMOOTH_RES), 
          { 'title': '(dimmer)', 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'number', 'hint': '(0.0%% - 100.0%%)', 'format': 'range', 'min': 0, 'max': 100, 'order': 1 }})
 
-  Action('%s Dimmer Timed' % name, lambda arg: handle_dimmer(arg['level'], arg['period']), { 'title': '(dimmer timed)', 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'object', 'properties': {
+  Action('%s Dimmer Timed' % name, lambda arg: handle_dimmer(arg['level'], arg['period'], arg.get('curve')), { 'title': '(dimmer timed)', 'group': '"%s"' % label, 'order': next_seq(), 'schema': { 'type': 'object', 'properties': {
            'level': { 'type': 'number', 'hint': '(0.0%% - 100.0%%)', 'format': 'range', 'min': 0, 'max': 100, 'order': 1 },
-           'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 }}}})
+           'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 },
+           'curve': CURVE_SCHEMA }}})
+
+  
+@local_action({ 'title': 'Crossfade', 'order': next_seq(), 'schema': { 'type': 'object', 'properties': {
+                 'targets': { 'type': 'array', 'order': 1, 'items': { 'type': 'object', 'properties': {
+                   'name': { 'type': 'string', 'hint': 'e.g. Light 1', 'order': 1 },
+                   'target': { 'type': 'string', 'hint': '(percent or %s)' % LIGHTING_HINT, 'order': 2 }}}},
+                 'period': { 'type': 'integer', 'hint': '(in ms)', 'order': 2 },
+                 'curve': CURVE_SCHEMA }}})
+def Crossfade(arg):
+  '''Fades many fixtures together (e.g. a cue), all starting at the same instant'''
+  if _rawChannels == None: return # not ready
+  
+  period = arg.get('period')
+  if period == None:
+    period = FADESMOOTH_RES
+  
+  now = system_clock()
+  
+  for item in arg.get('targets') or EMPTY:
+    fader = _faders_byName.get(item.get('name'))
+    if fader == None:
+      console.warn('Crossfade: no fixture named "%s"' % item.get('name'))
+      continue
+      
+    fader(item.get('target'), period, arg.get('curve'), now)
+    
+  log(1, 'Crossfade: %s fixture(s) over %s ms' % (len(arg.get('targets') or EMPTY), period))
+
+# <!-- fade engine
 
+import math
+from array import array
+
+# active fades are kept in compact parallel arrays (index by slot), completed fades are swapped out
+_fadeChans = array('i')   # channel num. (1-based)
+_fadeStarts = array('l')  # start time (millis)
+_fadePeriods = array('i') # (millis)
+_fadeFroms = array('i')   # start value in curve units (raw or dimmer law)
+_fadeTos = array('i')     # end value in curve units
+_fadeTargets = array('i') # final raw value
+_fadeCurves = array('i')  # index into CURVES
+
+_fadeSlot_byChannel = { }
+
+_defaultCurve = 0 # see CURVES
+
+CURVE_STEPS = 1000 # resolution of the easing tables
+
+CURVE_DIMMER_LAW = 2 # (index in CURVES)
+
+DIMMER_LAW_STEPS = 4095 # resolution of the perceptual (dimmer law) scale
+DIMMER_LAW_K = 40.0     # steepness of the logarithmic law
+
+# easing tables, progress (0 - CURVE_STEPS) => eased progress (0 - CURVE_STEPS) by curve
+EASINGS = [ [ i for i in range(CURVE_STEPS+1) ],
+            [ int(round((1 - math.cos(math.pi * i / CURVE_STEPS)) / 2 * CURVE_STEPS)) for i in range(CURVE_STEPS+1) ],
+            [ i for i in range(CURVE_STEPS+1) ] ] # (dimmer law fades are linear on the perceptual scale)
+
+# raw value (0 - 255) <=> perceptual scale (0 - DIMMER_LAW_STEPS)
+TO_DIMMER_LAW = [ int(round(math.log(1 + DIMMER_LAW_K * v / 255) / math.log(1 + DIMMER_LAW_K) * DIMMER_LAW_STEPS)) for v in range(256) ]
+FROM_DIMMER_LAW = [ int(round(((1 + DIMMER_LAW_K) ** (float(p) / DIMMER_LAW_STEPS) - 1) / DIMMER_LAW_K * 255)) for p in range(DIMMER_LAW_STEPS+1) ]
+
+def startFade(chan, target, now, period, curve=None):
+  '''Starts (or replaces) the fade of a channel from its current value'''
+  if curve in CURVES:
+    curve = CURVES.index(curve)
+  else:
+    curve = _defaultCurve
+    
+  start = _rawChannels[chan-1]
   
+  if curve == CURVE_DIMMER_LAW:
+    start, end = TO_DIMMER_LAW[start], TO_DIMMER_LAW[target]
+  else:
+    end = target
+    
+  slot = _fadeSlot_byChannel.get(chan)
+  if slot == None:
+    _fadeSlot_byChannel[chan] = len(_fadeChans)
+    _fadeChans.append(chan); _fadeStarts.append(now); _fadePeriods.append(max(period, 0))
+    _fadeFroms.append(start); _fadeTos.append(end); _fadeTargets.append(target); _fadeCurves.append(curve)
+    
+  else:
+    _fadeStarts[slot] = now; _fadePeriods[slot] = max(period, 0)
+    _fadeFroms[slot] = start; _fadeTos[slot] = end; _fadeTargets[slot] = target; _fadeCurves[slot] = curve
+    
+def dropFade(slot):
+  '''Removes a fade by moving the last one into its slot'''
+  del _fadeSlot_byChannel[_fadeChans[slot]]
+  
+  last = len(_fadeChans) - 1
+  if slot != last:
+    for a in (_fadeChans, _fadeStarts, _fadePeriods, _fadeFroms, _fadeTos, _fadeTargets, _fadeCurves):
+      a[slot] = a[last]
+    _fadeSlot_byChannel[_fadeChans[slot]] = slot
+    
+  for a in (_fadeChans, _fadeStarts, _fadePeriods, _fadeFroms, _fadeTos, _fadeTargets, _fadeCurves):
+    a.pop()
+    
+def advanceFades(now):
+  '''Computes all active fades for this tick in one pass, writing into the raw channels and the frame'''
+  # (local names for the tight loop)
+  chans, starts, periods, froms, tos, curves = _fadeChans, _fadeStarts, _fadePeriods, _fadeFroms, _fadeTos, _fadeCurves
+  rawChannels, frames, easings, fromDimmerLaw = _rawChannels, _frames, EASINGS, FROM_DIMMER_LAW
+  
+  slot = 0
+  while slot < len(chans):
+    chan = chans[slot]
+    elapsed = now - starts[slot]
+    period = periods[slot]
+    
+    if elapsed >= period:
+      value = _fadeTargets[slot]
+      dropFade(slot) # (last fade now in this slot)
+      log(2, 'autoramping: channel %s done at %s' % (chan, value))
+      
+    else:
+      curve = curves[slot]
+      step = elapsed * CURVE_STEPS // period if elapsed > 0 else 0
+      value = froms[slot] + (tos[slot] - froms[slot]) * easings[curve][step] // CURVE_STEPS
+      if curve == CURVE_DIMMER_LAW:
+        value = fromDimmerLaw[value]
+      slot += 1
+      
+    rawChannels[chan-1] = value
+    frames[(chan-1) // UNIVERSE_SIZE].set(chan, value)
+
 def stream():
   if _rawChannels == None:
     # have not synced buffer
     return
- 
-  # _singleChannelTargets_byChannel[num] = ( rawValue, now, now+FADESMOOTH_RES )    
-  # _rawChannels[num-1] = rawValue
   
   now = system_clock() # millis  
   
-  # deal with targets
-  doneWith = list()
+  if len(_fadeChans) > 0:
+    advanceFades(now)
   
-  for chan in _singleChannelTargets_byChannel:
-    current = _rawChannels[chan-1] # e.g. going from 200 to 255
-    startValue, target, startTime, endTime = _singleChannelTargets_byChannel[chan]
-    
-    # range
-    diffValue = target - startValue
-    
-    # percentage time into operation
-    #                         progress / total time
-    totalTime = (endTime - startTime)
-    if totalTime == 0: percTime = 1.0
-    else:              percTime = (now - startTime) * 1.0 / totalTime
-    
-    if percTime >= 1.0:
-      newValue = target
-    else:
-      newValue = int(startValue + diffValue * percTime)
-    
-    if current != target:
-      log(2, 'autoramping: diffValue:%s newValue:%s perc:%s' % (diffValue, newValue, percTime))
-    
-    _rawChannels[chan-1] = newValue
-  
-  sendDmx(0, 0, _rawChannels)
+  # all universes due on this tick are sent together
+  for frame in [ f for f in _frames if f.isDue(now) ]:
+    sendDmx(frame, now)
+
+# fade engine --!>
 
 timer_streamer = Timer(stream, intervalInSeconds=(1.0 / DEFAULT_STREAM_RATE), firstDelayInSeconds=5)
 
@@ -284,16 +471,27 @@ def syncChannels():
     for v in values:
       channels.append(int(v))
   
-  global _rawChannels
+  global _rawChannels, _frames
+  
+  channels = channels[:UNIVERSE_SIZE] # (device buffer is the first universe)
   
   if _rawChannels == None:
     # this is first time so ensure data consistency
-    rawChannels = [ v for v in channels ]
+    rawChannels = [ 0 ] * (len(_universes) * UNIVERSE_SIZE)
+    rawChannels[:len(channels)] = channels
+    
+    frames = [ newFrame(slot, u) for slot, u in enumerate(_universes) ]
+    for frame in frames:
+      frame.load(rawChannels)
+    
+    _frames = frames
     _rawChannels = rawChannels
     
   else:
     for i, v in enumerate(channels):
       _rawChannels[i] = v
+      
+    _frames[0].load(_rawChannels)
     
   console.info('syncChannels: channel buffer has been synced; got %s values (%s rows)' % (len(channels), len(lines)))
   
@@ -307,29 +505,131 @@ def syncOnce():
   
 timer_syncOnce = Timer(syncOnce, 30, 5, stopped=True) # every 30 secs, first after 5
    
-_seq = 0
-
-P_ArtDMX = '0050' # hex
-
-def sendDmx(subnet, universe, channels):
-  global _seq
-  
-  p = list()
-  p.append('Art-Net'.encode('hex') + '00')
-  p.append(P_ArtDMX)
-  p.append(toU16bits(14).encode('hex'))
-  p.append(toU8bits(_seq).encode('hex'))
-  p.append('00') # "physical" not sure what this is
-  p.append(toU16bits(universe).encode('hex'))
-  
-  count = len(channels)
-  p.append(toU16bits(count).encode('hex'))
+KEEPALIVE_INTERVAL = 1000 # (millis) unchanged frames are re-sent at this rate
+
+class DmxFrame:
+  '''A DMX packet pre-packed in a byte array for one universe; channel values are written in-place and the range
+     of changed channels is tracked so unchanged frames need only be sent at the keep-alive rate'''
+  
+  def __init__(self, slot, size, dataOffset, seqOffset, dest, interval):
+    self.packet = bytearray(size)
+    self.first = slot * UNIVERSE_SIZE + 1 # first channel num. (across all universes)
+    self.count = size - dataOffset
+    self.offset = dataOffset - self.first # i.e. packet index of a channel num.
+    self.seqOffset = seqOffset
+    self.dest = dest
+    self.interval = interval
+    self.seq = 0
+    self.dirtyFrom = None # first and last changed channel since last sent
+    self.dirtyTo = None
+    self.lastSent = None
+    
+  def set(self, chan, value):
+    '''Sets a channel value (channel num. across all universes), marking it changed if it's different'''
+    i = self.offset + chan
+    value = value & 0xff
+    
+    if self.packet[i] == value:
+      return
+    
+    self.packet[i] = value
+    
+    if self.dirtyFrom == None:
+      self.dirtyFrom = self.dirtyTo = chan
+    elif chan < self.dirtyFrom:
+      self.dirtyFrom = chan
+    elif chan > self.dirtyTo:
+      self.dirtyTo = chan
+      
+  def load(self, rawChannels):
+    '''Loads this universe's channel values from the full list of raw channels'''
+    first = self.first
+    for i, v in enumerate(rawChannels[first-1:first-1+self.count]):
+      self.set(first + i, v)
+      
+  def isDue(self, now):
+    if self.lastSent == None:
+      return True
+    
+    elapsed = now - self.lastSent
+    
+    # (half a tick of slack to allow for timer jitter)
+    return elapsed >= KEEPALIVE_INTERVAL or (self.dirtyFrom != None and elapsed + _tickInterval / 2 >= self.interval)
   
-  for b in channels:
-    p.append(toU8bits(b).encode('hex'))
+  def take(self, now):
+    '''Stamps the next sequence number, clears the changed range and returns the packet'''
+    if self.dirtyFrom != None:
+      log(3, 'frame: changed channels %s-%s' % (self.dirtyFrom, self.dirtyTo))
+    
+    # sequence 0 means "disabled" so cycle through 1 - 255
+    self.seq = self.seq % 255 + 1
+    self.packet[self.seqOffset] = self.seq
+    self.dirtyFrom = self.dirtyTo = None
+    self.lastSent = now
+    return str(self.packet)
+
+ARTDMX_HEADER = 'Art-Net\x00' + '\x00\x50' + '\x00\x0e' # ID, OpCode ArtDMX (0x5000, little endian), protocol version 14
+ARTDMX_DATA = 18 # offset of first channel value
+
+class ArtDmxFrame(DmxFrame):
+  def __init__(self, slot, universe, dest, interval):
+    DmxFrame.__init__(self, slot, ARTDMX_DATA + UNIVERSE_SIZE, ARTDMX_DATA, 12, dest, interval)
+    
+    packet = self.packet
+    packet[0:12] = ARTDMX_HEADER
+    # [12] sequence, [13] physical (left 0)
+    packet[14] = universe & 0xff              # SubUni
+    packet[15] = (universe >> 8) & 0x7f       # Net
+    packet[16] = (UNIVERSE_SIZE >> 8) & 0xff  # length (big endian)
+    packet[17] = UNIVERSE_SIZE & 0xff
+
+SACN_DATA = 126 # offset of first channel value
+
+class SacnFrame(DmxFrame):
+  '''E1.31 data packet (root, framing and DMP layers)'''
+  def __init__(self, slot, universe, dest, interval, priority, cid, sourceName):
+    size = SACN_DATA + UNIVERSE_SIZE
+    DmxFrame.__init__(self, slot, size, SACN_DATA, 111, dest, interval)
+    
+    packet = self.packet
+    # root layer
+    packet[0:16] = '\x00\x10' + '\x00\x00' + 'ASC-E1.17\x00\x00\x00' # preamble size, postamble size, ACN packet identifier
+    putU16(packet, 16, 0x7000 | (size - 16))                             # flags & length
+    packet[18:22] = '\x00\x00\x00\x04'                                   # VECTOR_ROOT_E131_DATA
+    packet[22:38] = cid
+    # framing layer
+    putU16(packet, 38, 0x7000 | (size - 38))
+    packet[40:44] = '\x00\x00\x00\x02'                                   # VECTOR_E131_DATA_PACKET
+    packet[44:44+len(sourceName)] = sourceName                           # (64 bytes, null padded)
+    packet[108] = priority
+    # [109-110] sync address, [111] sequence, [112] options (all 0)
+    putU16(packet, 113, universe)
+    # DMP layer
+    putU16(packet, 115, 0x7000 | (size - 115))
+    packet[117] = 0x02                                                   # VECTOR_DMP_SET_PROPERTY
+    packet[118] = 0xa1                                                   # address & data type
+    putU16(packet, 119, 0)                                               # first property address
+    putU16(packet, 121, 1)                                               # address increment
+    putU16(packet, 123, UNIVERSE_SIZE + 1)                               # property value count (incl. start code)
+    # [125] start code (0)
+    
+def putU16(packet, i, value):
+  packet[i] = (value >> 8) & 0xff
+  packet[i+1] = value & 0xff
+
+def newFrame(slot, info):
+  if param_outputMode == OUTPUT_MODES[1]:
+    # source name and (stable) component identifier taken from the node
+    sourceName = _node.getRoot().getName().encode('utf-8')[:63]
+    cid = uuid.uuid5(uuid.NAMESPACE_URL, 'nodel:%s' % sourceName).bytes
+    priority = param_sacnPriority if param_sacnPriority != None else DEFAULT_SACN_PRIORITY
+    return SacnFrame(slot, info['universe'], info['dest'], info['interval'], priority, cid, sourceName)
   
-  _seq = (_seq + 1) % 256
-  udp.sendTo('%s:%s' % (_ipAddress, UDP_PORT), ''.join(p).decode('hex'))
+  else:
+    return ArtDmxFrame(slot, info['universe'], info['dest'], info['interval'])
+
+def sendDmx(frame, now):
+  udp.sendTo(frame.dest, frame.take(now))
 
 def udp_received(src, data):
   hexData = data.encode('hex')
@@ -345,6 +645,7 @@ udp = UDP(received=udp_received,
 # protocol --!>
 
 import colorsys
+import uuid
 
 def into_channels_with_rgb(s):
   """Takes:
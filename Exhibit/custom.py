@@ -4,10 +4,50 @@ from nodetoolkit import *
 
 # <!--- members and status support  
 
+param_aggregationWindow = Parameter({'title': 'Aggregation window (secs)', 'order': next_seq(), 'schema': {'type': 'number', 'hint': '0 (immediate) e.g. 0.5'},
+                                     'desc': 'Member Power and Muting changes arriving within this window are combined into one update of the resultant signals.'})
+
 membersBySignal = {}
+
+memberSignalsBySignal = {}
+
+aggregatorsBySignal = {}
+
+def initSignalAggregation(signalName, localDesiredSignal, localResultantSignal):
+  memberSignals = memberSignalsBySignal.setdefault(signalName, list())
+  
+  pending = [False]
+  
+  def aggregateMemberSignals():
+    pending[0] = False
+    
+    shouldBeState = localDesiredSignal.getArg()
+    partially = False
+    
+    for memberSignal in memberSignals:
+      if memberSignal.getArg() != shouldBeState:
+        partially = True
+        break
+        
+    localResultantSignal.emitIfDifferent('Partially %s' % shouldBeState if partially else shouldBeState)
+    
+  def scheduleAggregation():
+    window = param_aggregationWindow or 0
+    
+    if window <= 0:
+      aggregateMemberSignals()
+      
+    elif not pending[0]:
+      # batch up any other member updates arriving within the window
+      pending[0] = True
+      call(aggregateMemberSignals, window)
+      
+  localDesiredSignal.addEmitHandler(lambda arg: scheduleAggregation())
+  
+  aggregatorsBySignal[signalName] = scheduleAggregation
     
 def initSignalSupport(name, mode, signalName, states, disappears = False, isGroup = False):
-  members = getMembersInfoOrRegister(signalName, name)
+  getMembersInfoOrRegister(signalName, name)
   
   # establish local signals if haven't done so already
   localDesiredSignal = lookup_local_event('Desired %s' % signalName)
@@ -16,6 +56,10 @@ def initSignalSupport(name, mode, signalName, states, disappears = False, isGrou
     localDesiredSignal, localResultantSignal = initSignal(signalName, mode, states)
   else:
     localResultantSignal = lookup_local_event(signalName)
+    
+    if signalName not in aggregatorsBySignal:
+      # (the host script defines the signals itself)
+      initSignalAggregation(signalName, localDesiredSignal, localResultantSignal)
       
   # establish a remote signal to receive status
   # signal status states include 'Partially ...' forms
@@ -23,18 +67,9 @@ def initSignalSupport(name, mode, signalName, states, disappears = False, isGrou
   
   localMemberSignal = Event('Member %s %s' % (name, signalName), {'title': '"%s" %s' % (name, signalName), 'group': 'Members\' %s' % signalName, 'order': 9999+next_seq(), 'schema': {'type': 'string', 'enum': resultantStates}})
   
-  def aggregateMemberSignals():
-    shouldBeState = localDesiredSignal.getArg()
-    partially = False
-    
-    for memberName in members:
-      if lookup_local_event('Member %s %s' % (memberName, signalName)).getArg() != shouldBeState:
-        partially = True
-        
-    localResultantSignal.emit('Partially %s' % shouldBeState if partially else shouldBeState)
-    
-  localMemberSignal.addEmitHandler(lambda arg: aggregateMemberSignals())
-  localDesiredSignal.addEmitHandler(lambda arg: aggregateMemberSignals())
+  memberSignalsBySignal.setdefault(signalName, list()).append(localMemberSignal)
+  
+  localMemberSignal.addEmitHandler(lambda arg: aggregatorsBySignal[signalName]())
   
   def handleRemoteEvent(arg):
     if arg == True or arg == 1:
@@ -57,6 +92,8 @@ def initSignal(signalName, mode, states):
   
   localResultantSignal = Event('%s' % signalName, {'group': '%s' % signalName, 'order': next_seq(), 'schema': {'type': 'string', 'enum': resultantStates}})
                     
+  initSignalAggregation(signalName, localDesiredSignal, localResultantSignal)
+  
   return localDesiredSignal, localResultantSignal
 
 def getMembersInfoOrRegister(signalName, memberName):
@@ -58,35 +58,31 @@ param_Flows = Parameter({'title': 'Flows', 'order': '3', 'schema': {'type': 'arr
             }}}
             }}}})
 
+# Dispatch tables, compiled in main() so activations don't need to search the parameters
+cueItemsByName = {}     # e.g. { 'Cue 1': [ (remote action, argument, delay), ... ] }
+flowActionsByTrigger = {} # e.g. { 'GPIO 1': [ flow action, ... ] }
+outcomesToResolve = []  # every compiled Outcome; their Cue or Flow actions are resolved once all exist
+
 # Create all the remote actions and events for each step of each sequence
 def main():
 
-  # Function to create local and remote Events for Triggers
-  def CreateTriggerEvents(FlowName, EventName, flowtriggerdict):
+  # Function to create local and remote Events for Triggers and Conditions
+  def CreateEvent(EventName):
+    
+    # If the event already exists, it's already being dispatched
+    if lookup_local_event(EventName) != None:
+      return
+    
+    localEvent = create_local_event(EventName, {'title': EventName, 'group': 'Events', 'schema': {'type': 'string'}})
 
     # Function to emit the remote events to a local event, activate any Flows that have Triggers set for that Event
     def remoteEventHandler(arg = None):
-      lookup_local_event(EventName).emit(str(arg))
-
-      # Check the dictionary for multiple Flows with the same Event source
-      for x in flowtriggerdict:
-        if flowtriggerdict[x] == EventName:
-          lookup_local_action(x).call(str(arg))
-
-    # If the event doesn't exist yet, make it
-    if EventName != None:
-      if lookup_local_event(EventName) == None:
-        remoteEvent = create_remote_event(EventName, remoteEventHandler)
-        create_local_event(EventName, {'title': EventName, 'group': 'Events', 'schema': {'type': 'string'}})
-
-  # Function to create local and remote Events for Conditions
-  def CreateConditionEvents(EventName):
-    def remoteEventHandler(arg = None):
-      lookup_local_event(EventName).emit(str(arg))
+      localEvent.emit(str(arg))
 
-    if lookup_local_event(EventName) == None:
-      remoteEvent = create_remote_event(EventName, remoteEventHandler)
-      create_local_event(EventName, {'title': EventName, 'group': 'Events', 'schema': {'type': 'string'}})
+      for FlowAction in flowActionsByTrigger.get(EventName, []):
+        FlowAction.call(str(arg))
+        
+    remoteEvent = create_remote_event(EventName, remoteEventHandler)
   
   # Setting up the remote actions - Cues
   if param_Cues != None:
@@ -94,71 +90,79 @@ def main():
       CueName = EachCue['Title']
       
       makelocalAction(CueName)
+      Items = cueItemsByName.setdefault(CueName, [])
       for EachItem in EachCue['Actions']:
         ItemLabel = EachItem['title']
-        if lookup_remote_action(ItemLabel) == None:
-          create_remote_action(ItemLabel)
+        RemoteAction = lookup_remote_action(ItemLabel)
+        if RemoteAction == None:
+          RemoteAction = create_remote_action(ItemLabel)
+          
+        Items.append((RemoteAction, 
+                      str(EachItem['argument']) if EachItem['argument'] != None else None, 
+                      EachItem['delay'] if EachItem['delay'] != None else 0))
+
+  # Function for compiling each Flow's Outcomes by Trigger Argument, i.e. 
+  # (Outcomes for each argument, Outcomes for any other argument), all in their original order
+  def CompileOutcomes(EachFlow):
+    Outcomes = []
+    for EachOutcome in EachFlow['Outcomes']:
+      # pre-resolve the Condition events
+      Conditions = [ (lookup_local_event(EachCondition['RemoteEvent']), EachCondition['Argument']) for EachCondition in EachOutcome['Conditions'] or [] ]
+      
+      Outcome = {'Cue': EachOutcome['Cue'], 'TriggerArgument': EachOutcome['TriggerArgument'], 'Conditions': Conditions, 'Action': None}
+      Outcomes.append(Outcome)
+      outcomesToResolve.append(Outcome)
+      
+    OutcomesByArgument = {}
+    for Outcome in Outcomes:
+      TriggerArgument = Outcome['TriggerArgument']
+      if TriggerArgument != None and TriggerArgument not in OutcomesByArgument:
+        OutcomesByArgument[TriggerArgument] = [ x for x in Outcomes if x['TriggerArgument'] in (None, TriggerArgument) ]
+        
+    return (OutcomesByArgument, [ x for x in Outcomes if x['TriggerArgument'] == None ])
 
   # Function for creating each Flow Action
-  def CreateFlow(FlowName, TriggerArgumentList):
-    # Setting all the information we need
-    # Find the correct flow
-    for EachFlow in param_Flows:
-      if FlowName == EachFlow['Title']:
-
-        # Get the Remote Event Trigger
-        if EachFlow['Trigger'] != None:
-          TriggerEvent = EachFlow['Trigger']
+  def CreateFlow(FlowName, TriggerArgumentList, EachFlow):
+    (OutcomesByArgument, AnyArgumentOutcomes) = CompileOutcomes(EachFlow)
 
     def FlowHandler(arg):
       print('Flow \"%s\" - Activated with Argument \"%s\"' % (FlowName, arg))
       
-      # Find the correct Flow
-      for EachFlow in param_Flows: 
-        if FlowName == EachFlow['Title']:
-          ArgumentMatch = []
-
-          # Check the Conditions
-          for EachOutcome in EachFlow['Outcomes']:
+      Outcomes = OutcomesByArgument.get(arg, AnyArgumentOutcomes)
+      
+      for Outcome in Outcomes:
+        # Check the Conditions
+        ConditionsMet = True
+        for (ConditionEvent, ConditionArgument) in Outcome['Conditions']:
+          if ConditionEvent.getArg() != ConditionArgument:
+            ConditionsMet = False
+            break
             
-            # First, check the Trigger Argument
-            TriggerArgument = EachOutcome['TriggerArgument']
-            if TriggerArgument == None or arg == TriggerArgument:
-              ArgumentMatch.append('True')
-              
-              # Now if that's a match, check the Conditions
-              ConditionCheck = []
-              if EachOutcome['Conditions'] != None:
-                for EachCondition in EachOutcome['Conditions']:
-                  if lookup_local_event(EachCondition['RemoteEvent']).getArg() == EachCondition['Argument']:
-                    ConditionCheck.append('True')
-                  else:
-                    ConditionCheck.append('False')
-              if 'False' in ConditionCheck:    
-                print('Flow \"%s\" - Conditions not met for Outcome \"%s\". Not running...' % (FlowName, EachOutcome['Cue']))
-              
-              # If the conditions pass
-              else:
-                EachCue = (EachOutcome['Cue'])
-                
-                # Check that the Outcome actually exists
-                if EachCue == None:
-                  console.error('Flow \"%s\" - No Cue defined for Outcome \"%s\"' % (FlowName, EachOutcome['Cue']))
-                else:
-                  if lookup_local_action(EachCue):
-                    lookup_local_action(EachCue).call()
-                  else:
-                    # If the Outcome isn't in the list of Cues or Flows
-                    console.error('Flow \"%s\" - Local Action \"%s\" does not exist.' % (FlowName, EachCue))
-          if ArgumentMatch == []:
-            print('Flow \"%s\" - No Outcome mapped for Argument \"%s\", stopping...' % (FlowName, arg))
+        if not ConditionsMet:    
+          print('Flow \"%s\" - Conditions not met for Outcome \"%s\". Not running...' % (FlowName, Outcome['Cue']))
+        
+        # If the conditions pass
+        else:
+          EachCue = Outcome['Cue']
+          
+          # Check that the Outcome actually exists
+          if EachCue == None:
+            console.error('Flow \"%s\" - No Cue defined for Outcome \"%s\"' % (FlowName, Outcome['Cue']))
+          elif Outcome['Action'] != None:
+            Outcome['Action'].call()
+          else:
+            # If the Outcome isn't in the list of Cues or Flows
+            console.error('Flow \"%s\" - Local Action \"%s\" does not exist.' % (FlowName, EachCue))
+            
+      if len(Outcomes) == 0:
+        print('Flow \"%s\" - No Outcome mapped for Argument \"%s\", stopping...' % (FlowName, arg))
 
                   
     # Create Local Action
     if TriggerArgumentList == [None]:
-      Action(FlowName, FlowHandler, {'title': FlowName, 'group': 'Flows'})
+      return Action(FlowName, FlowHandler, {'title': FlowName, 'group': 'Flows'})
     else:
-      Action(FlowName, FlowHandler, {'title': FlowName, 'group': 'Flows', 'schema': {'type': 'string', 'enum': TriggerArgumentList}})
+      return Action(FlowName, FlowHandler, {'title': FlowName, 'group': 'Flows', 'schema': {'type': 'string', 'enum': TriggerArgumentList}})
 
 
   #################### Flows Step 1 ##########################
@@ -166,37 +170,34 @@ def main():
   # Check if there are any flows
   if param_Flows != None:
 
-    # Create a list of flows - this will be used in the FlowHandler
-    FlowList = []
-    TriggerList = []
-    flowtriggerdict = {}
     for EachFlow in param_Flows:
       FlowName = EachFlow['Title']
-      FlowList.append(FlowName)
       
       # Get information which we need to create Remote Events
       EventName = EachFlow['Trigger']
-      TriggerList.append(EventName)
-
-      # Making a dictionary here in case multiple Flows use the same event
-      flowtriggerdict[FlowName] = EventName
-
-      # Function for creating the events
-      CreateTriggerEvents(FlowName, EventName, flowtriggerdict)
+      if EventName != None:
+        CreateEvent(EventName)
 
       # Get data per Outcome
       Data = EachFlow['Outcomes']
       TriggerArgumentList = []
       for EachItem in Data:
         TriggerArgumentList.append(EachItem['TriggerArgument'])      
-        c = EachItem['Conditions']
-        if c!= None:
-          ConditionList = []
-          for EachCondition in EachItem['Conditions']:
-            ConditionEvent = EachCondition['RemoteEvent']
-            CreateConditionEvents(ConditionEvent)
-
-      CreateFlow(FlowName, TriggerArgumentList)
+        for EachCondition in EachItem['Conditions'] or []:
+          CreateEvent(EachCondition['RemoteEvent'])
+
+      FlowAction = CreateFlow(FlowName, TriggerArgumentList, EachFlow)
+      
+      # Multiple Flows can use the same event
+      if EventName != None:
+        flowActionsByTrigger.setdefault(EventName, []).append(FlowAction)
+        
+  #################### Flows Step 2 ##########################
+  
+  # Now all the Cues and Flows exist, resolve each Outcome's action
+  for Outcome in outcomesToResolve:
+    if Outcome['Cue'] != None:
+      Outcome['Action'] = lookup_local_action(Outcome['Cue'])
     
 
 # Create local actions
@@ -207,30 +208,15 @@ def makelocalAction(CueName):
         
 # Cue each action in turn
 def start(CueName):
-  for EachCue in param_Cues:
-    if CueName == EachCue['Title']:
-      for EachItem in EachCue['Actions']:
-        kickOffItem(EachItem)
+  for Item in cueItemsByName.get(CueName, []):
+    kickOffItem(Item)
 
 def GoCue(CueName):
-  for EachCue in param_Cues:
-    if CueName == EachCue['Title']:
-      start(CueName)
-      console.info('Sending \"%s\"...' % CueName)
+  if CueName in cueItemsByName:
+    start(CueName)
+    console.info('Sending \"%s\"...' % CueName)
 
 # Start each action item within the cue
 def kickOffItem(item):
-  label = item['title']
-
-  # Check if there's a delay set
-  if item['delay'] != None:
-    time = item['delay']
-  else:
-    time = 0
-  if item['argument'] != None:
-    arg = str(item['argument'])
-  else:
-    arg = None
-
-  ra = lookup_remote_action(label)
-  call(lambda: lookup_remote_action(label).call(arg), time)
+  (ra, arg, time) = item
+  call(lambda: ra.call(arg), time)
@@ -27,6 +27,9 @@ param_members = Parameter({'title': 'Members', 'schema': {'type': 'array', 'item
    }}
 }}}})
 
+param_aggregationWindow = Parameter({'title': 'Aggregation window (secs)', 'order': next_seq(), 'schema': {'type': 'number', 'hint': '0 (immediate) e.g. 0.5'},
+                                     'desc': 'Member Power, Muting and Status changes arriving within this window are combined into one update of the resultant signals.'})
+
 def initMember(memberInfo):
   name = mustNotBeBlank('name', memberInfo['name'])
                            
@@ -44,9 +47,46 @@ def initMember(memberInfo):
     initStatusSupport(name, disappears)
 
 membersBySignal = {}
+
+memberSignalsBySignal = {}
+
+aggregatorsBySignal = {}
+
+def initSignalAggregation(signalName, localDesiredSignal, localResultantSignal):
+  memberSignals = memberSignalsBySignal.setdefault(signalName, list())
+  
+  pending = [False]
+  
+  def aggregateMemberSignals():
+    pending[0] = False
+    
+    shouldBeState = localDesiredSignal.getArg()
+    partially = False
+    
+    for memberSignal in memberSignals:
+      if memberSignal.getArg() != shouldBeState:
+        partially = True
+        break
+        
+    localResultantSignal.emitIfDifferent('Partially %s' % shouldBeState if partially else shouldBeState)
+    
+  def scheduleAggregation():
+    window = param_aggregationWindow or 0
+    
+    if window <= 0:
+      aggregateMemberSignals()
+      
+    elif not pending[0]:
+      # batch up any other member updates arriving within the window
+      pending[0] = True
+      call(aggregateMemberSignals, window)
+      
+  localDesiredSignal.addEmitHandler(lambda arg: scheduleAggregation())
+  
+  aggregatorsBySignal[signalName] = scheduleAggregation
     
 def initSignalSupport(name, mode, signalName, states, disappears, isGroup):
-  members = getMembersInfoOrRegister(signalName, name)
+  getMembersInfoOrRegister(signalName, name)
   
   # establish local signals if haven't done so already
   localDesiredSignal = lookup_local_event('Desired %s' % signalName)
@@ -56,17 +96,23 @@ def initSignalSupport(name, mode, signalName, states, disappears, isGroup):
   else:
     localResultantSignal = lookup_local_event(signalName)
     
-  # establish a remote action
+    if signalName not in aggregatorsBySignal:
+      # (the host script defines the signals itself)
+      initSignalAggregation(signalName, localDesiredSignal, localResultantSignal)
+    
+  # establish a remote action (resolved once here for propagation)
   if mode == 'Action & Signal':
     if not isGroup:
       # for non-groups, just use simple remote actions
-      create_remote_action('Member %s %s' % (name, signalName), {'title': '"%s" %s' % (name, signalName), 'group': 'Members\' "%s"' % signalName, 'schema': {'type': 'string', 'enum': states}},
-                           suggestedNode=name, suggestedAction=signalName)
+      remoteAction = create_remote_action('Member %s %s' % (name, signalName), {'title': '"%s" %s' % (name, signalName), 'group': 'Members\' "%s"' % signalName, 'schema': {'type': 'string', 'enum': states}},
+                                          suggestedNode=name, suggestedAction=signalName)
     
     else:
       # for group member, add remote action to handle the 'propogation' flags  
-      create_remote_action('Member %s %s Extended' % (name, signalName), {'title': '"%s" %s (extended)' % (name, signalName), 'group': 'Members (%s)' % signalName, 'schema': {'type': 'string', 'enum': states}},
-                           suggestedNode=name, suggestedAction=signalName)    
+      remoteAction = create_remote_action('Member %s %s Extended' % (name, signalName), {'title': '"%s" %s (extended)' % (name, signalName), 'group': 'Members (%s)' % signalName, 'schema': {'type': 'string', 'enum': states}},
+                                          suggestedNode=name, suggestedAction=signalName)
+      
+    memberActionsBySignal.setdefault(signalName, list()).append((name, remoteAction, isGroup))
   
   # establish a remote signal to receive status
   # signal status states include 'Partially ...' forms
@@ -74,18 +120,9 @@ def initSignalSupport(name, mode, signalName, states, disappears, isGroup):
   
   localMemberSignal = Event('Member %s %s' % (name, signalName), {'title': '"%s" %s' % (name, signalName), 'group': 'Members\' "%s"' % signalName, 'order': 9999+next_seq(), 'schema': {'type': 'string', 'enum': resultantStates}})
   
-  def aggregateMemberSignals():
-    shouldBeState = localDesiredSignal.getArg()
-    partially = False
-    
-    for memberName in members:
-      if lookup_local_event('Member %s %s' % (memberName, signalName)).getArg() != shouldBeState:
-        partially = True
-        
-    localResultantSignal.emit('Partially %s' % shouldBeState if partially else shouldBeState)
-    
-  localMemberSignal.addEmitHandler(lambda arg: aggregateMemberSignals())
-  localDesiredSignal.addEmitHandler(lambda arg: aggregateMemberSignals())
+  memberSignalsBySignal.setdefault(signalName, list()).append(localMemberSignal)
+  
+  localMemberSignal.addEmitHandler(lambda arg: aggregatorsBySignal[signalName]())
   
   def handleRemoteEvent(arg):
     if arg == True or arg == 1:
@@ -122,14 +159,7 @@ def initSignal(signalName, mode, states):
       if noPropagate:
         return
       
-      for memberName in membersBySignal[signalName]:
-        remoteAction = lookup_remote_action('Member %s %s' % (memberName, signalName))
-        if remoteAction != None:
-          remoteAction.call(state)
-
-        remoteActionExtended = lookup_remote_action('Member %s %s Extended' % (memberName, signalName))
-        if remoteActionExtended != None:
-          remoteActionExtended.call(complexArg)
+      propagate(signalName, state, complexArg)
           
   # create action
   def handleSimpleOrComplexArg(arg):
@@ -145,6 +175,8 @@ def initSignal(signalName, mode, states):
            'state': {'type': 'string', 'enum': states, 'order': 3},
            'noPropagate': {'type': 'boolean', 'order': 2}}}})
   
+  initSignalAggregation(signalName, localDesiredSignal, localResultantSignal)
+  
   return localDesiredSignal, localResultantSignal
 
 def getMembersInfoOrRegister(signalName, memberName):
@@ -157,21 +189,409 @@ def getMembersInfoOrRegister(signalName, memberName):
 
   return members
 
+# <!--- propagation
+
+DEFAULT_PROPAGATION_CONCURRENCY = 8
+DEFAULT_PROPAGATION_TIMEOUT = 10 # secs
+
+param_propagationConcurrency = Parameter({'title': 'Propagation concurrency', 'order': next_seq(), 'schema': {'type': 'integer', 'hint': str(DEFAULT_PROPAGATION_CONCURRENCY)},
+                                          'desc': 'The most members an action is passed on to at the same time.'})
+
+param_propagationTimeout = Parameter({'title': 'Propagation timeout (secs)', 'order': next_seq(), 'schema': {'type': 'number', 'hint': str(DEFAULT_PROPAGATION_TIMEOUT)},
+                                      'desc': 'How long a member has to take the action before it is given up on (and reported as a straggler).'})
+
+local_event_LastPropagation = LocalEvent({'title': 'Last propagation', 'group': 'Propagation', 'order': next_seq(), 'schema': {'type': 'object', 'properties': {
+                                            'signal': {'type': 'string', 'order': 1},
+                                            'state': {'type': 'string', 'order': 2},
+                                            'members': {'type': 'integer', 'order': 3},
+                                            'elapsed': {'title': 'Elapsed (ms)', 'type': 'integer', 'order': 4},
+                                            'slowest': {'title': 'Slowest member', 'type': 'string', 'order': 5},
+                                            'latencies': {'title': 'Latencies (histogram)', 'type': 'object', 'order': 6, 'properties': {
+                                              '<10ms': {'type': 'integer', 'order': 1},
+                                              '<50ms': {'type': 'integer', 'order': 2},
+                                              '<250ms': {'type': 'integer', 'order': 3},
+                                              '<1s': {'type': 'integer', 'order': 4},
+                                              '>=1s': {'type': 'integer', 'order': 5}}},
+                                            'failures': {'type': 'array', 'order': 7, 'items': {'type': 'string'}},
+                                            'stragglers': {'type': 'array', 'order': 8, 'items': {'type': 'string'}}}}})
+
+# upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS = [(10, '<10ms'), (50, '<50ms'), (250, '<250ms'), (1000, '<1s')]
+
+# the member remote actions by signal name, resolved as members are configured
+# e.g. {'Power': [('PC', <RemoteAction>, False), ('Level 1', <RemoteAction>, True)]}
+memberActionsBySignal = {}
+
+from threading import Thread, Lock
+from Queue import Queue
+import atexit
+
+class Propagation:
+  '''Tracks one action being passed on to all members (from any number of worker threads).'''
+  
+  def __init__(self, signalName, state, memberNames):
+    self.signalName = signalName
+    self.state = state
+    self.memberCount = len(memberNames)
+    self.outstanding = set(memberNames)
+    self.latencies = dict([(label, 0) for upper, label in LATENCY_BUCKETS] + [('>=1s', 0)])
+    self.failures = list()
+    self.slowest = (None, -1)
+    self.started = system_clock()
+    self.finished = False
+    self.lock = Lock()
+    
+  def memberDone(self, memberName, latency, error):
+    self.lock.acquire()
+    try:
+      if self.finished or memberName not in self.outstanding:
+        # arrived after the timeout, already reported (as a straggler or timed out)
+        return
+      
+      self.outstanding.discard(memberName)
+      
+      if error != None:
+        self.failures.append('%s: %s' % (memberName, error))
+        
+      if latency != None: # (no latency when the member was skipped)
+        for upper, label in LATENCY_BUCKETS:
+          if latency < upper:
+            break
+        else:
+          label = '>=1s'
+        self.latencies[label] += 1
+        
+        if latency > self.slowest[1]:
+          self.slowest = (memberName, latency)
+        
+      allDone = len(self.outstanding) == 0
+    finally:
+      self.lock.release()
+      
+    if allDone:
+      call(self.finish)
+      
+  def finish(self):
+    self.lock.acquire()
+    try:
+      if self.finished:
+        return
+      
+      self.finished = True
+      stragglers = sorted(self.outstanding)
+    finally:
+      self.lock.release()
+      
+    if len(stragglers) > 0:
+      console.warn('%s %s: %s member(s) did not take the action in time - %s' % (self.signalName, self.state, len(stragglers), ', '.join(stragglers)))
+      
+    local_event_LastPropagation.emit({'signal': self.signalName, 'state': self.state, 'members': self.memberCount,
+                                      'elapsed': system_clock() - self.started,
+                                      'slowest': self.slowest[0],
+                                      'latencies': self.latencies,
+                                      'failures': self.failures,
+                                      'stragglers': stragglers})
+      
+# One long-lived pool of workers per node takes the member calls off a single queue so overlapping
+# propagations (e.g. nested groups) never use more than the concurrency limit between them.
+#
+# Each member (of each signal) has a slot so it only ever has one call in progress; a propagation
+# arriving while a member is busy waits in the slot, replacing any older one already waiting there,
+# so the member always ends up with the latest state, in order.
+
+propagationJobs = Queue()
+
+propagationLock = Lock()
+
+# (busy, waitingJob) by (signalName, memberName)
+memberSlots = {}
+
+# the workers, each e.g. {'thread': <Thread>, 'current': (job, started) or None, 'retired': False}
+propagationWorkers = list()
+
+def propagate(signalName, state, complexArg):
+  targets = memberActionsBySignal.get(signalName) or []
+  if len(targets) == 0:
+    return
+  
+  propagation = Propagation(signalName, state, [memberName for memberName, remoteAction, isGroup in targets])
+  
+  for memberName, remoteAction, isGroup in targets:
+    # groups take the complex arg so 'noPropagate' etc. pass through
+    submitMemberCall((propagation, memberName, remoteAction, complexArg if isGroup else state))
+    
+  # report whatever has not completed by the timeout
+  call(propagation.finish, param_propagationTimeout or DEFAULT_PROPAGATION_TIMEOUT)
+  
+def submitMemberCall(job):
+  propagation, memberName = job[0], job[1]
+  key = (propagation.signalName, memberName)
+  
+  propagationLock.acquire()
+  try:
+    ensurePropagationWorkers()
+    
+    busy, replaced = memberSlots.get(key) or (False, None)
+    
+    if busy:
+      # wait for the member, in place of any older propagation already waiting
+      memberSlots[key] = (True, job)
+    else:
+      memberSlots[key] = (True, None)
+      propagationJobs.put(job)
+      
+  finally:
+    propagationLock.release()
+    
+  if replaced != None:
+    replaced[0].memberDone(memberName, None, 'superseded by "%s"' % propagation.state)
+    
+def ensurePropagationWorkers():
+  # (within lock)
+  for i in range(len(propagationWorkers), max(1, param_propagationConcurrency or DEFAULT_PROPAGATION_CONCURRENCY)):
+    worker = {'current': None, 'retired': False}
+    worker['thread'] = Thread(target=propagationWorker, args=(worker,), name='Propagation %s' % next_seq())
+    worker['thread'].daemon = True
+    propagationWorkers.append(worker)
+    worker['thread'].start()
+    
+def propagationWorker(worker):
+  while True:
+    job = propagationJobs.get()
+    if job == None:
+      return
+    
+    propagation, memberName, remoteAction, arg = job
+    key = (propagation.signalName, memberName)
+    
+    propagationLock.acquire()
+    try:
+      busy, waiting = memberSlots[key]
+      if waiting != None:
+        # a newer propagation is already waiting for this member so skip straight to that one
+        memberSlots[key] = (True, None)
+        superseded, job = job, waiting
+        propagation, memberName, remoteAction, arg = job
+      else:
+        superseded = None
+        
+      started = system_clock()
+      worker['current'] = (job, started)
+    finally:
+      propagationLock.release()
+      
+    if superseded != None:
+      superseded[0].memberDone(memberName, None, 'superseded by "%s"' % propagation.state)
+      
+    error = None
+    try:
+      remoteAction.call(arg)
+    except Exception, exc:
+      error = str(exc)
+      
+    propagation.memberDone(memberName, system_clock() - started, error)
+    
+    propagationLock.acquire()
+    try:
+      worker['current'] = None
+      
+      # free up the member, or go on with whatever has been waiting for it
+      busy, waiting = memberSlots[key]
+      if waiting != None:
+        memberSlots[key] = (True, None)
+        propagationJobs.put(waiting)
+      else:
+        memberSlots[key] = (False, None)
+        
+      if worker['retired']:
+        # (was replaced while this call was hung)
+        return
+      
+    finally:
+      propagationLock.release()
+      
+def checkPropagationWorkers():
+  # a hung member call gives up its worker; the member itself stays busy until the call actually
+  # returns so at most one hung call per member can be holding a thread
+  timeout = (param_propagationTimeout or DEFAULT_PROPAGATION_TIMEOUT) * 1000
+  now = system_clock()
+  
+  timedOut = list()
+  
+  propagationLock.acquire()
+  try:
+    for worker in list(propagationWorkers):
+      current = worker['current']
+      if current != None and now - current[1] > timeout:
+        worker['retired'] = True
+        propagationWorkers.remove(worker)
+        timedOut.append(current)
+        
+    if len(timedOut) > 0:
+      ensurePropagationWorkers()
+      
+  finally:
+    propagationLock.release()
+    
+  for (propagation, memberName, remoteAction, arg), started in timedOut:
+    console.warn('%s %s: "%s" has not returned after %s ms, giving up on it' % (propagation.signalName, propagation.state, memberName, now - started))
+    propagation.memberDone(memberName, now - started, 'timed out')
+    
+timer_propagationWatchdog = Timer(checkPropagationWorkers, 1)
+
+@atexit.register
+def cleanup():
+  for worker in propagationWorkers:
+    propagationJobs.put(None)
+
+# propagation ---!>
+
 STATUS_SCHEMA = { 'type': 'object', 'properties': {
                     'level': { 'type': 'integer', 'order': 1 },
                     'message': {'type': 'string', 'order': 2 }
                 } }
 
 EMPTY_SET = {}
+
+from bisect import insort, bisect_left
+
+class StatusAggregator:
+  '''Maintains the aggregate status incrementally; a member change only touches that member's entry
+     (level counts and message fragment), the message itself is only rendered when emitting.'''
+  
+  def __init__(self, signal):
+    self.signal = signal
+    self.names = []          # member names by index (configured order)
+    self.levels = []         # contributing level by index (None when suppressed)
+    self.levelCounts = {}    # number of contributing members by level
+    self.maxLevel = 0
+    self.fragments = {}      # message fragment by index (only members with a level above 0)
+    self.fragmentIndices = [] # the keys of 'fragments' kept in order
+    self.message = 'OK'      # cached aggregate message
+    self.dirty = False       # (message needs rendering)
+    self.pending = False     # (emit is scheduled)
+    self.suppressing = set() # indices of members whose status is being suppressed
+    
+  def register(self, name):
+    self.names.append(name)
+    self.levels.append(None)
+    return len(self.names) - 1
+  
+  def update(self, index, memberStatus, suppressed):
+    memberStatus = memberStatus or EMPTY_SET
+    
+    memberLevel = memberStatus.get('level')
+    
+    if suppressed and (memberLevel == None or memberLevel > 0):
+      # would otherwise raise the level so leave out entirely
+      self.suppressing.add(index)
+      self.setLevel(index, None)
+      self.setFragment(index, None)
+      return
+    
+    self.suppressing.discard(index)
+    
+    if memberLevel == None: # as opposed to the value '0'
+      memberLevel = 99
+      
+    self.setLevel(index, memberLevel)
+    
+    fragment = None
+    if memberLevel > 0:
+      memberName = self.names[index]
+      memberMessage = memberStatus.get('message') or 'Has never been seen'
+      if isBlank(memberMessage):
+        fragment = memberName
+      else:
+        fragment = '%s: [%s]' % (memberName, memberMessage)
+        
+    self.setFragment(index, fragment)
+    
+  def setLevel(self, index, level):
+    oldLevel = self.levels[index]
+    if oldLevel == level:
+      return
+    
+    self.levels[index] = level
+    
+    if oldLevel != None:
+      count = self.levelCounts[oldLevel] - 1
+      if count == 0:
+        del self.levelCounts[oldLevel]
+      else:
+        self.levelCounts[oldLevel] = count
+        
+    if level != None:
+      self.levelCounts[level] = self.levelCounts.get(level, 0) + 1
+      
+    if level != None and level > self.maxLevel:
+      self.maxLevel = level
+      
+    elif oldLevel == self.maxLevel and oldLevel not in self.levelCounts:
+      # the highest level has gone, only a handful of distinct levels are ever in use
+      self.maxLevel = max(self.levelCounts) if len(self.levelCounts) > 0 else 0
+      
+  def setFragment(self, index, fragment):
+    if self.fragments.get(index) == fragment:
+      return
+    
+    if fragment == None:
+      del self.fragments[index]
+      del self.fragmentIndices[bisect_left(self.fragmentIndices, index)]
+    else:
+      if index not in self.fragments:
+        insort(self.fragmentIndices, index)
+      self.fragments[index] = fragment
+      
+    self.dirty = True
+    
+  def scheduleEmit(self):
+    window = param_aggregationWindow or 0
+    
+    if window <= 0:
+      self.emit()
+      
+    elif not self.pending:
+      # batch up any other member updates arriving within the window
+      self.pending = True
+      call(self.emit, window)
+      
+  def emit(self):
+    self.pending = False
+    
+    if self.dirty:
+      self.dirty = False
+      
+      if len(self.fragmentIndices) == 0:
+        self.message = 'OK'
+      else:
+        self.message = ', '.join([self.fragments[i] for i in self.fragmentIndices])
+        
+    aggregateMessage = self.message
+    
+    if len(self.suppressing) > 0:
+      aggregateMessage = '%s (*)' % aggregateMessage
+      
+    self.signal.emit({'level': self.maxLevel, 'message': aggregateMessage})
+    
+statusAggregator = None
   
 def initStatusSupport(name, disappears):
-  # look up the members structure (assume
-  members = getMembersInfoOrRegister('Status', name)
+  global statusAggregator
+  
+  # register the member
+  getMembersInfoOrRegister('Status', name)
   
   # check if this node has a status yet
-  selfStatusSignal = lookup_local_event('Status')
-  if selfStatusSignal == None:
-    selfStatusSignal = Event('Status', {'group': 'Status', 'order': next_seq(), 'schema': STATUS_SCHEMA})
+  if statusAggregator == None:
+    selfStatusSignal = lookup_local_event('Status')
+    if selfStatusSignal == None:
+      selfStatusSignal = Event('Status', {'group': 'Status', 'order': next_seq(), 'schema': STATUS_SCHEMA})
+      
+    statusAggregator = StatusAggregator(selfStatusSignal)
+    
+  aggregator = statusAggregator
+  index = aggregator.register(name)
     
   # status for the member
   memberStatusSignal = Event('Member %s Status' % name, {'title': '"%s" Status' % name, 'group': 'Members\' Status', 'order': 9999+next_seq(), 'schema': STATUS_SCHEMA})
@@ -182,49 +602,11 @@ def initStatusSupport(name, disappears):
   Action('Member %s Status Suppressed' % name, lambda arg: memberStatusSuppressedSignal.emit(arg), {'title': 'Suppress "%s" Status' % name, 'group': 'Status Suppression', 'order': 9999+next_seq(), 'schema': {'type': 'boolean'}})
   
   def aggregateMemberStatus():
-    aggregateLevel = 0
-    aggregateMessage = 'OK'
-    
-    # for composing the aggegate message at the end
-    msgs = []
+    aggregator.update(index, memberStatusSignal.getArg(), memberStatusSuppressedSignal.getArg())
+    aggregator.scheduleEmit()
     
-    activeSuppression = False
-    
-    for memberName in members:
-      suppressed = lookup_local_event('Member %s Status Suppressed' % memberName).getArg()
-      
-      memberStatus = lookup_local_event('Member %s Status' % memberName).getArg() or EMPTY_SET
-      
-      memberLevel = memberStatus.get('level')
-      if memberLevel == None: # as opposed to the value '0'
-        if suppressed:
-          activeSuppression = True
-          continue
-          
-        memberLevel = 99
-
-      if memberLevel > aggregateLevel:
-        # raise the level (if not suppressed)
-        if suppressed:
-          activeSuppression = True
-          continue
-        
-        aggregateLevel = memberLevel
-      
-      memberMessage = memberStatus.get('message') or 'Has never been seen'
-      if memberLevel > 0:
-        if isBlank(memberMessage):
-          msgs.append(memberName)
-        else:
-          msgs.append('%s: [%s]' % (memberName, memberMessage))
-          
-    if len(msgs) > 0:
-      aggregateMessage = ', '.join(msgs)
-      
-    if activeSuppression:
-      aggregateMessage = '%s (*)' % aggregateMessage
-      
-    selfStatusSignal.emit({'level': aggregateLevel, 'message': aggregateMessage})
+  # seed with last known (persisted) values without emitting
+  aggregator.update(index, memberStatusSignal.getArg(), memberStatusSuppressedSignal.getArg())
       
   memberStatusSignal.addEmitHandler(lambda arg: aggregateMemberStatus())
   memberStatusSuppressedSignal.addEmitHandler(lambda arg: aggregateMemberStatus())
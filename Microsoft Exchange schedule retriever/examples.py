@@ -182,4 +182,105 @@ REQ_EXAMPLE_GETBYFOLDERID_XML = '''<?xml version="1.0" encoding="utf-8"?>
 </s:Envelope>
 '''
 
+REQ_EXAMPLE_SYNC_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Header>
+        <h:RequestServerVersion Version="Exchange2010_SP2" xmlns:h="http://schemas.microsoft.com/exchange/services/2006/types"/>
+    </s:Header>
+    <s:Body>
+        <SyncFolderItems xmlns="http://schemas.microsoft.com/exchange/services/2006/messages">
+            <ItemShape>
+                <BaseShape xmlns="http://schemas.microsoft.com/exchange/services/2006/types">Default</BaseShape>
+                <AdditionalProperties xmlns="http://schemas.microsoft.com/exchange/services/2006/types">
+                    <FieldURI FieldURI="item:Subject"/>
+                    <FieldURI FieldURI="item:Sensitivity"/>
+                    <FieldURI FieldURI="calendar:Start"/>
+                    <FieldURI FieldURI="calendar:End"/>
+                    <FieldURI FieldURI="calendar:Location"/>
+                    <FieldURI FieldURI="calendar:Organizer"/>
+                    <FieldURI FieldURI="calendar:CalendarItemType"/>
+                </AdditionalProperties>
+            </ItemShape>
+            <SyncFolderId>
+                <DistinguishedFolderId Id="calendar" xmlns="http://schemas.microsoft.com/exchange/services/2006/types"/>
+            </SyncFolderId>
+            <SyncState>H4sIAAAAAAAEAO29B2AcSZYlJi9tynt/SvVK1+B0oQiAYBMk2JBAEOzBiM3mkuwdaUcjKasqgcplVmVdZhZAzO2dvPfee++999577733ujudTif33/8/XGZkAWz2zkrayZ4hgKrIHz9+fB8/Ih7/xi+T</SyncState>
+            <MaxChangesReturned>512</MaxChangesReturned>
+        </SyncFolderItems>
+    </s:Body>
+</s:Envelope>
+'''
+
+RESP_EXAMPLE_SYNC_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Header>
+        <h:ServerVersionInfo MajorVersion="15" MinorVersion="1" MajorBuildNumber="888" MinorBuildNumber="27" Version="V2017_01_07" xmlns:h="http://schemas.microsoft.com/exchange/services/2006/types" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"/>
+    </s:Header>
+    <s:Body>
+        <m:SyncFolderItemsResponse xmlns:m="http://schemas.microsoft.com/exchange/services/2006/messages" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:t="http://schemas.microsoft.com/exchange/services/2006/types">
+            <m:ResponseMessages>
+                <m:SyncFolderItemsResponseMessage ResponseClass="Success">
+                    <m:ResponseCode>NoError</m:ResponseCode>
+                    <m:SyncState>H4sIAAAAAAAEAO29B2AcSZYlJi9tynt/SvVK1+B0oQiAYBMk2JBAEOzBiM3mkuwdaUcjKasqgcplVmVdZhZAzO2dvPfee++999577733ujudTif33/8/XGZkAWz2zkrayZ4hgKrIHz9+fB8/Ih7/xi+U</m:SyncState>
+                    <m:IncludesLastItemInRange>true</m:IncludesLastItemInRange>
+                    <m:Changes>
+                        <t:Create>
+                            <t:CalendarItem>
+                                <t:ItemId Id="AAMkAGVkOTNmM2I5LTkzM2EtNGE2NC05N2JjLTFhOTU2ZmJkOTIzOQBGAAAAAAB6Kun2T1UaS7SeML/WWukdBwCKlTYVK0L1S4NbyOQ4sSbQAAAAAAEOAACKlTYVK0L1S4NbyOQ4sSbQAALZVCjRAAA=" ChangeKey="DwAAABYAAACKlTYVK0L1S4NbyOQ4sSbQAALZVEOt"/>
+                                <t:Subject>Gallery closed {Power: Off}</t:Subject>
+                                <t:Sensitivity>Normal</t:Sensitivity>
+                                <t:Start>2017-02-10T07:00:00Z</t:Start>
+                                <t:End>2017-02-10T09:00:00Z</t:End>
+                                <t:Location>Gallery 1</t:Location>
+                                <t:CalendarItemType>Single</t:CalendarItemType>
+                                <t:Organizer>
+                                    <t:Mailbox>
+                                        <t:Name>Exhibitions</t:Name>
+                                    </t:Mailbox>
+                                </t:Organizer>
+                            </t:CalendarItem>
+                        </t:Create>
+                        <t:Update>
+                            <t:CalendarItem>
+                                <t:ItemId Id="AAMkAGVkOTNmM2I5LTkzM2EtNGE2NC05N2JjLTFhOTU2ZmJkOTIzOQBGAAAAAAB6Kun2T1UaS7SeML/WWukdBwCKlTYVK0L1S4NbyOQ4sSbQAAAAAAEOAACKlTYVK0L1S4NbyOQ4sSbQAALZVCjSAAA=" ChangeKey="DwAAABYAAACKlTYVK0L1S4NbyOQ4sSbQAALZVEOu"/>
+                                <t:Subject>Late opening</t:Subject>
+                                <t:Sensitivity>Normal</t:Sensitivity>
+                                <t:Start>2017-02-11T08:00:00Z</t:Start>
+                                <t:End>2017-02-11T11:00:00Z</t:End>
+                                <t:Location>Gallery 2</t:Location>
+                                <t:CalendarItemType>Single</t:CalendarItemType>
+                            </t:CalendarItem>
+                        </t:Update>
+                        <t:Delete>
+                            <t:ItemId Id="AAMkAGVkOTNmM2I5LTkzM2EtNGE2NC05N2JjLTFhOTU2ZmJkOTIzOQBGAAAAAAB6Kun2T1UaS7SeML/WWukdBwCKlTYVK0L1S4NbyOQ4sSbQAAAAAAEOAACKlTYVK0L1S4NbyOQ4sSbQAALZVCjPAAA=" ChangeKey="DwAAABYAAACKlTYVK0L1S4NbyOQ4sSbQAALZVEOa"/>
+                        </t:Delete>
+                    </m:Changes>
+                </m:SyncFolderItemsResponseMessage>
+            </m:ResponseMessages>
+        </m:SyncFolderItemsResponse>
+    </s:Body>
+</s:Envelope>
+'''
+
+RESP_EXAMPLE_SYNC_ERROR_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Header>
+        <h:ServerVersionInfo MajorVersion="15" MinorVersion="1" MajorBuildNumber="888" MinorBuildNumber="27" Version="V2017_01_07" xmlns:h="http://schemas.microsoft.com/exchange/services/2006/types" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"/>
+    </s:Header>
+    <s:Body>
+        <m:SyncFolderItemsResponse xmlns:m="http://schemas.microsoft.com/exchange/services/2006/messages" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:t="http://schemas.microsoft.com/exchange/services/2006/types">
+            <m:ResponseMessages>
+                <m:SyncFolderItemsResponseMessage ResponseClass="Error">
+                    <m:MessageText>Synchronization state data is corrupt or otherwise invalid.</m:MessageText>
+                    <m:ResponseCode>ErrorInvalidSyncStateData</m:ResponseCode>
+                    <m:DescriptiveLinkKey>0</m:DescriptiveLinkKey>
+                    <m:SyncState/>
+                    <m:IncludesLastItemInRange>true</m:IncludesLastItemInRange>
+                </m:SyncFolderItemsResponseMessage>
+            </m:ResponseMessages>
+        </m:SyncFolderItemsResponse>
+    </s:Body>
+</s:Envelope>
+'''
+
 # examples --->
\ No newline at end of file
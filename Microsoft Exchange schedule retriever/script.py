@@ -14,6 +14,11 @@ param_calendars = Parameter({'title': 'Calendars', 'schema': {'type': 'array', '
         'folderName': {'title': 'Folder name (if not default calendar)', 'type': 'string', 'desc': 'If default calendar is not being used, the exact name of the folder holding the group of calendars.', 'order': 2}
   }}}})
 
+RETRIEVAL_MODES = ['Date-range query', 'Delta sync']
+
+param_retrievalMode = Parameter({'title': 'Retrieval mode', 'schema': {'type': 'string', 'enum': RETRIEVAL_MODES, 'hint': RETRIEVAL_MODES[0]},
+                                 'desc': '"Delta sync" uses SyncFolderItems to only transfer items that have changed since the last poll (recurring series are still expanded by the server when they change).'})
+
 local_event_RawItems = LocalEvent({'title': 'Raw Items', 'group': 'Raw', 'schema': {'type': 'array', 'items': {
         'type': 'object', 'properties': {
           'subject': {'type': 'string', 'order': 1},
@@ -144,7 +149,10 @@ def local_action_PollItems(arg=None):
   try:
     now = date_now()
 
-    rawBookings = query_ews(now, now.plusDays(7))
+    if param_retrievalMode == 'Delta sync':
+      rawBookings = sync_ews(now, now.plusDays(7))
+    else:
+      rawBookings = query_ews(now, now.plusDays(7))
   
     trace('Raw:')
     for raw in rawBookings:
@@ -203,25 +211,30 @@ def local_action_PollItems(arg=None):
     
     console.warn('Failed to poll items; exception was [%s]' % eValue)
   
-def query_ews(start, end):
-  '''Date-range query of calendar items. Returns false if calendar resolution has not been completed yet.'''
+def getFolderElement(calendar):
+  '''The folder element for a calendar (named or default).'''
+  folderName = calendar['folderName']
+  if not isEmpty(folderName):
+    # lookup the folder by display name
+    folderElement = resolvedFolderElements.get(folderName)
 
-  # prepare named folder elements if in use
-  folderElements = list()
-  for calendar in param_calendars or '':
-    folderName = calendar['folderName']
-    if not isEmpty(folderName):
-      # lookup the folder by display name
-      folderElement = resolvedFolderElements.get(folderName)
+    if folderElement == None:
+      raise Exception('At least one named-calendar has not been located yet; (folder name is "%s")' % folderName)
+
+    return folderElement
 
-      if folderElement == None:
-        raise Exception('At least one named-calendar has not been located yet; (folder name is "%s")' % folderName)
+  else:
+    # use distinguished folder
+    return distinguishedFolderIdElement
 
-      folderElements.append(folderElement)
+def query_ews(start, end, calendarIndexes=None):
+  '''Date-range query of calendar items (all calendars unless specific indexes are given). Raises an exception if calendar resolution has not been completed yet.'''
 
-    else:
-      # use distinguished folder
-      folderElements.append(distinguishedFolderIdElement)
+  if calendarIndexes == None:
+    calendarIndexes = range(len(param_calendars or ''))
+
+  # prepare named folder elements if in use
+  folderElements = [getFolderElement(param_calendars[index]) for index in calendarIndexes]
 
   request = prepareQueryRequest(start, end, resolvedFolders=folderElements)
   xmlRequest = ET.tostring(request)
@@ -239,84 +252,146 @@ def query_ews(start, end):
   warnings = list()
   
   items = parse_query_response(response, warnings)
+  
+  # map the response positions back to the calendars
+  for item in items:
+    item['calendar'] = calendarIndexes[item['calendar']]
+    
   return items
   
-def parse_query_response(responseXML, warnHandler):
-  '''Parses a response, given the full envelope (as XML string)'''
-  # no way to specify string encoding using this version of Python APIs
-  # so need to pre-encode UTF8. Inner parser only deals with plain ASCII.
-  root = ET.fromstring(responseXML.encode('utf-8'))
+# <--- delta sync
 
-  # ensure header exists
-  header = getElement(root, 'env:Header')
+# the longest a server-expanded view of a calendar with recurring series is used for (in secs)
+RECURRING_EXPANSION_REFRESH = 15 * 60
 
-  # ensure body exists
-  body = getElement(root, 'env:Body')
+# the delta sync state of each calendar by index, e.g.
+# { 'syncState': 'H4sIAAA...',
+#   'items': { ITEM_ID: {'changeKey': '...', 'type': 'Single', 'raw': { ... } }, ... },
+#   'expanded': [ ... ],   # last server-expanded view (only when holding recurring series)
+#   'expandedAt': 0 }      # (system clock)
+syncStates = {}
 
-  # get major response part
-  if len(body) <= 0:
-    raise ParseException('Expected a major response with the Body')
-  
-  majorResponseTag = body[0].tag
+def sync_ews(start, end):
+  '''Delta sync of each calendar folder, returning the raw items overlapping the date-range.'''
+  rawBookings = list()
   
-  calendarItems = list()
-
-  # (tag can be {m:FindItemResponse}, etc.)
-  if majorResponseTag == expandPath('message:FindItemResponse'):
-    findItemResponse = body[0]
-
-    for responseMessage in findItemResponse:
-      for responseIndex, findItemResponseMessage in enumerate(responseMessage):
-        if getAttrib(findItemResponseMessage, "ResponseClass") != "Success":
-          raise DataException("FindItemResponseMessage response class was not 'Success' (was %s)" % ET.tostring(findItemResponseMessage))
+  for index, calendar in enumerate(param_calendars or ''):
+    state = syncStates.get(index)
+    if state == None:
+      state = { 'syncState': None, 'items': {}, 'expanded': None, 'expandedAt': 0 }
+      syncStates[index] = state
+      
+    changed = syncCalendar(index, getFolderElement(calendar), state)
+    
+    hasRecurring = False
+    for cached in state['items'].values():
+      if cached['type'] == 'RecurringMaster':
+        hasRecurring = True
+        break
+    
+    if hasRecurring:
+      # occurrences of recurring series can only be expanded by the server so fall back to a
+      # date-range query of this calendar, but only when it has changed or the view is getting old
+      if changed or state['expanded'] == None or (system_clock() - state['expandedAt']) / 1000.0 > RECURRING_EXPANSION_REFRESH:
+        state['expanded'] = query_ews(start, end, calendarIndexes=[index])
+        state['expandedAt'] = system_clock()
+        
+      rawBookings.extend(state['expanded'])
+      
+    else:
+      state['expanded'] = None
+      
+      startMillis, endMillis = start.getMillis(), end.getMillis()
+      
+      inRange = [cached['raw'] for cached in state['items'].values() 
+                 if cached['raw']['start'].getMillis() < endMillis and cached['raw']['end'].getMillis() > startMillis]
+      
+      # (in the same order a date-range query would have them)
+      inRange.sort(key=lambda raw: (raw['start'].getMillis(), raw['end'].getMillis(), raw['subject']))
+      
+      rawBookings.extend(inRange)
+    
+  return rawBookings
 
-        responseCode = getElementText(findItemResponseMessage, 'message:ResponseCode')
-        if responseCode != 'NoError':
-          raise DataException("Response code was not 'NoError'")
+def syncCalendar(index, folderElement, state):
+  '''Applies all changes since the last sync to the item cache, returns True if there were any.'''
+  changed = False
+  
+  while True:
+    request = prepareSyncRequest(folderElement, state['syncState'])
+    xmlRequest = ET.tostring(request)
+    
+    trace('Syncing... request:%s' % xmlRequest)
+    
+    response = get_url(connector['ewsEndPoint'],
+                         username=connector['username'],
+                         password=connector['password'],
+                         contentType='text/xml',
+                         post=xmlRequest)
+    
+    trace('Got sync response. data:%s' % response)
+    
+    try:
+      syncState, includesLast, changes = parse_sync_response(response, index)
+      
+    except SyncStateException, exc:
+      if state['syncState'] == None:
+        raise
+      
+      # start again from scratch
+      console.warn('Sync state of calendar %s was rejected (%s); will resync all items' % (index, exc))
+      state['syncState'] = None
+      state['items'] = {}
+      changed = True
+      continue
+    
+    items = state['items']
+    
+    for changeType, itemID, changeKey, itemType, raw in changes:
+      if changeType == 'Delete':
+        if items.pop(itemID, None) != None:
+          changed = True
           
-        rootFolder = getElement(findItemResponseMessage, 'message:RootFolder')
-
-        # warning...
-        includesLastItemInRange = rootFolder.get('IncludesLastItemInRange')
-        if includesLastItemInRange == False and warnings:
-          warnings.append('IncludesLastItemInRange=false but this parser does not support paged responses')
+      else:
+        cached = items.get(itemID)
+        if cached != None and cached['changeKey'] == changeKey:
+          # (e.g. after a resync)
+          continue
         
-        rootFolderItems = getElement(rootFolder, 'type:Items')
-
-        for item in rootFolderItems:
-          itemTag = item.tag
-
-          # interpret calendar items only
-          if itemTag == expandPath('type:CalendarItem'):
-            itemIDElement = getElement(item, 'type:ItemId')
-            itemID = {'id': getAttrib(itemIDElement, 'Id'),
-                      'changeKey': getAttrib(itemIDElement, 'ChangeKey')}
-            subject = tryGetElementText(item, 'type:Subject', default='')
-            sensitivity = tryGetElementText(item, 'type:Sensitivity', default='') # TODO: interpret 'Sensitivity'
-            start = getElementText(item, 'type:Start')
-            end = getElementText(item, 'type:End')
-            location = tryGetElementText(item, 'type:Location', default='')
-            
-            organiserElement = tryGetElement(item, 'type:Organizer')
-            if organiserElement != None:
-              organiserMailboxElement = getElement(organiserElement, 'type:Mailbox')
-              organiserName = tryGetElementText(organiserMailboxElement, 'type:Name', default='')
-              
-            else:
-              organiserName = ''
-
-            calendarItems.append({ # 'id': itemID,
-                                   'calendar': responseIndex,
-                                   'subject': subject,
-                                   'sensitivity': sensitivity,
-                                   'start': date_instant(date_parse(start).getMillis()), # trick to convert into local timezone for display convenience (instead of GMT)
-                                   'end': date_instant(date_parse(end).getMillis()), # trick to convert into local timezone for display convenience (instead of GMT)
-                                   'location': location,
-                                   'organiser': organiserName })
-  else:
-    raise DataException('Unexpected major response element - got %s' % majorResponseTag)
-            
-  return calendarItems
+        items[itemID] = { 'changeKey': changeKey, 'type': itemType, 'raw': raw }
+        changed = True
+        
+    state['syncState'] = syncState
+    
+    if includesLast:
+      return changed
+    
+# delta sync --->
+  
+def parse_query_response(responseXML, warnHandler):
+  '''Parses a response, given the full envelope (as XML string), in a single streaming pass'''
+  return parseResponse(responseXML, QueryResponseTarget())
+
+def parse_sync_response(responseXML, calendarIndex):
+  '''Parses a SyncFolderItems response in a single streaming pass, returns (syncState, includesLastItemInRange, changes)
+     where each change is (changeType, itemID, changeKey, calendarItemType, raw item), the last three are None for deletions.'''
+  return parseResponse(responseXML, SyncResponseTarget(calendarIndex))
+
+def calendarItemFromFields(fields, calendarIndex):
+  '''Interprets the fields of a CalendarItem (by expanded tag)'''
+  start = fields.get(TAG_START)
+  end = fields.get(TAG_END)
+  
+  if start == None or end == None:
+    raise DataException('Missing element type:Start or type:End')
+
+  return { 'calendar': calendarIndex,
+           'subject': fields.get(TAG_SUBJECT) or '',
+           'sensitivity': fields.get(TAG_SENSITIVITY) or '', # TODO: interpret 'Sensitivity'
+           'start': date_instant(date_parse(start).getMillis()), # trick to convert into local timezone for display convenience (instead of GMT)
+           'end': date_instant(date_parse(end).getMillis()), # trick to convert into local timezone for display convenience (instead of GMT)
+           'location': fields.get(TAG_LOCATION) or '',
+           'organiser': fields.get('organiser') or '' }
 
 def local_action_PollFolders(arg=None):
   try:
@@ -360,63 +435,8 @@ def find_folders():
   return items
 
 def parse_find_folders_response(responseXML, warnHandler):
-  '''Parses a response, given the full envelope (as XML string)'''
-  # see previous comment RE UTF-8 encoding
-  root = ET.fromstring(responseXML.encode('utf-8'))
-
-  # ensure header exists
-  header = getElement(root, 'env:Header')
-
-  # ensure body exists
-  body = getElement(root, 'env:Body')
-
-  # get major response part
-  if len(body) <= 0:
-    raise ParseException('Expected a major response with the Body')
-  
-  majorResponseTag = body[0].tag
-  
-  calendarFolders = list()
-
-  # (tag can be {m:FindItemResponse}, etc.)
-  if majorResponseTag == expandPath('message:FindFolderResponse'):
-    findItemResponse = body[0]
-
-    for responseMessage in findItemResponse:
-      for findItemResponseMessage in responseMessage:
-        if getAttrib(findItemResponseMessage, "ResponseClass") != "Success":
-          raise DataException("FindFolderResponseMessage response class was not 'Success' (was %s)" % ET.tostring(findItemResponseMessage))
-
-        responseCode = getElementText(findItemResponseMessage, 'message:ResponseCode')
-        if responseCode != 'NoError':
-          raise DataException("Response code was not 'NoError'")
-
-        rootFolder = getElement(findItemResponseMessage, 'message:RootFolder')
-
-        # warning...
-        includesLastItemInRange = rootFolder.get('IncludesLastItemInRange')
-        if includesLastItemInRange == False and warnings:
-          warnings.append('IncludesLastItemInRange=false but this parser does not support paged responses')
-        
-        rootFolderFolders = getElement(rootFolder, 'type:Folders')
-
-        for folder in rootFolderFolders:
-          folderTag = folder.tag
-
-          # interpret calendar folders only
-          if folderTag == expandPath('type:CalendarFolder'):
-            folderIDElement = getElement(folder, 'type:FolderId')
-            folderID = {'id': getAttrib(folderIDElement, 'Id'),
-                        'changeKey': getAttrib(folderIDElement, 'ChangeKey')}
-            displayName = getElementText(folder, 'type:DisplayName')
-
-            calendarFolders.append({ 'folderIDElement': folderIDElement,
-                                     'displayName': displayName })
-
-  else:
-    raise DataException('Unexpected major response element - got %s' % majorResponseTag)
-            
-  return calendarFolders
+  '''Parses a response, given the full envelope (as XML string), in a single streaming pass'''
+  return parseResponse(responseXML, FindFoldersResponseTarget())
 
 # <SOAP/XML operations ---
 
@@ -495,6 +515,48 @@ def prepareQueryRequest(start, end, resolvedFolders=None):
 
   return request
 
+REQ_SYNC_TEMPLATE_XML = '''<?xml version="1.0" encoding="utf-8"?>
+  <s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+     <s:Header>
+        <h:RequestServerVersion Version="Exchange2010_SP2" xmlns:h="http://schemas.microsoft.com/exchange/services/2006/types"/>
+     </s:Header>
+     <s:Body>
+        <SyncFolderItems xmlns="http://schemas.microsoft.com/exchange/services/2006/messages">
+           <ItemShape>
+              <BaseShape xmlns="http://schemas.microsoft.com/exchange/services/2006/types">Default</BaseShape>
+              <AdditionalProperties xmlns="http://schemas.microsoft.com/exchange/services/2006/types">
+                 <FieldURI FieldURI="item:Subject"/>
+                 <FieldURI FieldURI="item:Sensitivity"/>
+                 <FieldURI FieldURI="calendar:Start"/>
+                 <FieldURI FieldURI="calendar:End"/>
+                 <FieldURI FieldURI="calendar:Location"/>
+                 <FieldURI FieldURI="calendar:Organizer"/>
+                 <FieldURI FieldURI="calendar:CalendarItemType"/>
+              </AdditionalProperties>
+           </ItemShape>
+           <SyncFolderId><!-- folder option ends up here --></SyncFolderId>
+           <MaxChangesReturned>512</MaxChangesReturned>
+        </SyncFolderItems>
+     </s:Body>
+  </s:Envelope>
+'''
+
+def prepareSyncRequest(folderElement, syncState=None):
+  '''(folder is an XML object, no sync state means a full sync)'''
+  request = ET.fromstring(REQ_SYNC_TEMPLATE_XML)
+  
+  syncFolderItems = searchElement(request, 'message:SyncFolderItems')
+  
+  searchElement(syncFolderItems, 'message:SyncFolderId').append(folderElement)
+  
+  if syncState != None:
+    # (SyncState must come straight after SyncFolderId)
+    syncStateElement = ET.Element(expandPath('message:SyncState'))
+    syncStateElement.text = syncState
+    syncFolderItems.insert(2, syncStateElement)
+    
+  return request
+
 REQ_GETFOLDERS_TEMPLATE_XML = '''<?xml version="1.0" encoding="utf-8"?>
   <s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
       <s:Header>
@@ -536,6 +598,13 @@ class DataException(Exception):
   '''A specialized exception related to data parsing this XML'''
   pass
 
+class SyncStateException(DataException):
+  '''The server no longer accepts the sync state, a full resync is required'''
+  pass
+
+# response codes meaning the sync state needs to be discarded
+SYNC_STATE_ERRORS = ['ErrorInvalidSyncStateData', 'ErrorSyncFolderNotFound']
+
 def getElement(root, path):
   '''Strictly gets an element'''
   result = root.find(expandPath(path))
@@ -613,6 +682,264 @@ def expandPath(path):
   
   return '{%s}%s' % (NS[parts[0]], parts[1])
 
+# expanded tags, for comparing against without expanding paths each time
+TAG_HEADER = expandPath('env:Header')
+TAG_BODY = expandPath('env:Body')
+TAG_RESPONSE_CODE = expandPath('message:ResponseCode')
+TAG_SYNC_STATE = expandPath('message:SyncState')
+TAG_INCLUDES_LAST = expandPath('message:IncludesLastItemInRange')
+TAG_CALENDAR_ITEM = expandPath('type:CalendarItem')
+TAG_CALENDAR_FOLDER = expandPath('type:CalendarFolder')
+TAG_ITEM_ID = expandPath('type:ItemId')
+TAG_FOLDER_ID = expandPath('type:FolderId')
+TAG_DISPLAY_NAME = expandPath('type:DisplayName')
+TAG_SUBJECT = expandPath('type:Subject')
+TAG_SENSITIVITY = expandPath('type:Sensitivity')
+TAG_START = expandPath('type:Start')
+TAG_END = expandPath('type:End')
+TAG_LOCATION = expandPath('type:Location')
+TAG_ORGANIZER = expandPath('type:Organizer')
+TAG_NAME = expandPath('type:Name')
+TAG_CALENDAR_ITEM_TYPE = expandPath('type:CalendarItemType')
+
+# responses are encoded and fed to the parser this many characters at a time
+PARSE_CHUNK = 16384
+
+def parseResponse(responseXML, target):
+  '''Feeds a response through a parser target (see ResponseTarget), returning its result'''
+  parser = ET.XMLParser(target=target)
+  
+  # no way to specify string encoding using this version of Python APIs
+  # so need to pre-encode UTF8. Inner parser only deals with plain ASCII.
+  for i in xrange(0, len(responseXML), PARSE_CHUNK):
+    parser.feed(responseXML[i:i+PARSE_CHUNK].encode('utf-8'))
+    
+  return parser.close()
+
+class ResponseTarget:
+  '''A parser target that checks the SOAP envelope and passes everything within the major response
+     element (depth 3 onwards) to 'started' and 'ended' without ever building a tree.'''
+  
+  def __init__(self, majorPath):
+    self.majorTag = expandPath(majorPath)
+    self.depth = 0
+    self.inBody = False
+    self.hasHeader = False
+    self.hasMajor = False
+    self.text = []
+    
+  def start(self, tag, attrib):
+    self.depth += 1
+    self.text = []
+    
+    depth = self.depth
+    
+    if depth == 2:
+      if tag == TAG_HEADER:
+        self.hasHeader = True
+      elif tag == TAG_BODY:
+        self.inBody = True
+        
+    elif depth == 3 and self.inBody:
+      if tag != self.majorTag:
+        raise DataException('Unexpected major response element - got %s' % tag)
+      
+      self.hasMajor = True
+      
+    if self.inBody and depth >= 3:
+      self.started(tag, attrib, depth)
+      
+  def data(self, data):
+    self.text.append(data)
+    
+  def end(self, tag):
+    depth = self.depth
+    
+    if self.inBody and depth >= 3:
+      self.ended(tag, ''.join(self.text), depth)
+      
+    elif depth == 2:
+      self.inBody = False
+      
+    self.text = []
+    self.depth -= 1
+    
+  def close(self):
+    if not self.hasHeader:
+      raise DataException('Missing element env:Header')
+    
+    if not self.hasMajor:
+      raise DataException('Expected a major response with the Body')
+    
+    return self.result()
+  
+  def checkResponseMessage(self, tag, attrib):
+    if attrib.get('ResponseClass') != 'Success':
+      raise DataException("%s response class was not 'Success' (was %s)" % (tag[tag.find('}')+1:], attrib.get('ResponseClass')))
+  
+  def checkResponseCode(self, text):
+    if text != 'NoError':
+      raise DataException("Response code was not 'NoError' (was %s)" % text)
+
+class CalendarItemsTarget(ResponseTarget):
+  '''Collects the fields of each CalendarItem (at depth 8) by expanded tag, including its ItemId attributes
+     and the organiser's name, passing them to 'itemEnded'.'''
+  
+  def __init__(self, majorPath):
+    ResponseTarget.__init__(self, majorPath)
+    self.fields = None
+    self.field = None
+    
+  def started(self, tag, attrib, depth):
+    if depth == 8 and tag == TAG_CALENDAR_ITEM:
+      self.fields = {}
+      
+    elif depth == 9 and self.fields != None:
+      self.field = tag
+      
+      if tag == TAG_ITEM_ID:
+        self.fields['id'] = attrib.get('Id')
+        self.fields['changeKey'] = attrib.get('ChangeKey')
+      
+  def ended(self, tag, text, depth):
+    if self.fields == None:
+      return
+    
+    if depth == 9:
+      self.fields[tag] = text
+      
+    elif depth == 11 and tag == TAG_NAME and self.field == TAG_ORGANIZER:
+      # i.e. Organizer / Mailbox / Name
+      self.fields['organiser'] = text
+      
+    elif depth == 8:
+      fields = self.fields
+      self.fields = None
+      self.itemEnded(fields)
+
+class QueryResponseTarget(CalendarItemsTarget):
+  '''FindItem response (depths: 5 FindItemResponseMessage, 6 ResponseCode & RootFolder, 7 Items, 8 CalendarItem)'''
+  
+  def __init__(self):
+    CalendarItemsTarget.__init__(self, 'message:FindItemResponse')
+    self.responseIndex = -1
+    self.calendarItems = list()
+    
+  def started(self, tag, attrib, depth):
+    if depth == 5:
+      self.responseIndex += 1
+      self.checkResponseMessage(tag, attrib)
+      
+    else:
+      CalendarItemsTarget.started(self, tag, attrib, depth)
+      
+  def ended(self, tag, text, depth):
+    if depth == 6 and tag == TAG_RESPONSE_CODE:
+      self.checkResponseCode(text)
+      
+    else:
+      CalendarItemsTarget.ended(self, tag, text, depth)
+    
+  def itemEnded(self, fields):
+    self.calendarItems.append(calendarItemFromFields(fields, self.responseIndex))
+    
+  def result(self):
+    return self.calendarItems
+
+class SyncResponseTarget(CalendarItemsTarget):
+  '''SyncFolderItems response (depths: 5 SyncFolderItemsResponseMessage, 6 ResponseCode, SyncState & Changes, 7 Create, Update or Delete, 8 CalendarItem or ItemId)'''
+  
+  def __init__(self, calendarIndex):
+    CalendarItemsTarget.__init__(self, 'message:SyncFolderItemsResponse')
+    self.calendarIndex = calendarIndex
+    self.responseMessage = None
+    self.syncState = None
+    self.includesLast = True
+    self.changeType = None
+    self.changes = list()
+    
+  def started(self, tag, attrib, depth):
+    if depth == 5:
+      # (checked once the message has ended because a rejected sync state comes with an 'Error'
+      #  response class and only the ResponseCode within says so)
+      self.responseMessage = (tag, dict(attrib))
+      
+    elif depth == 7:
+      self.changeType = tag[tag.find('}')+1:]
+      
+    elif depth == 8 and tag == TAG_ITEM_ID and self.changeType == 'Delete':
+      self.changes.append(('Delete', attrib.get('Id'), None, None, None))
+      
+    elif self.changeType in ('Create', 'Update'):
+      # (read flag changes are of no interest)
+      CalendarItemsTarget.started(self, tag, attrib, depth)
+      
+  def ended(self, tag, text, depth):
+    if depth == 6:
+      if tag == TAG_RESPONSE_CODE:
+        if text in SYNC_STATE_ERRORS:
+          raise SyncStateException(text)
+        
+        self.checkResponseCode(text)
+        
+      elif tag == TAG_SYNC_STATE:
+        self.syncState = text
+        
+      elif tag == TAG_INCLUDES_LAST:
+        self.includesLast = text == 'true'
+        
+    elif depth == 5:
+      self.checkResponseMessage(*self.responseMessage)
+      
+    else:
+      CalendarItemsTarget.ended(self, tag, text, depth)
+      
+  def itemEnded(self, fields):
+    self.changes.append((self.changeType, fields.get('id'), fields.get('changeKey'), fields.get(TAG_CALENDAR_ITEM_TYPE) or 'Single',
+                         calendarItemFromFields(fields, self.calendarIndex)))
+    
+  def result(self):
+    if self.syncState == None:
+      raise DataException('Missing element message:SyncState')
+    
+    return self.syncState, self.includesLast, self.changes
+
+class FindFoldersResponseTarget(ResponseTarget):
+  '''FindFolder response (depths: 5 FindFolderResponseMessage, 6 ResponseCode & RootFolder, 7 Folders, 8 CalendarFolder)'''
+  
+  def __init__(self):
+    ResponseTarget.__init__(self, 'message:FindFolderResponse')
+    self.folder = None
+    self.calendarFolders = list()
+    
+  def started(self, tag, attrib, depth):
+    if depth == 5:
+      self.checkResponseMessage(tag, attrib)
+      
+    elif depth == 8 and tag == TAG_CALENDAR_FOLDER:
+      self.folder = {}
+      
+    elif depth == 9 and tag == TAG_FOLDER_ID and self.folder != None:
+      # (the FolderId element is used in requests)
+      self.folder['folderIDElement'] = ET.Element(TAG_FOLDER_ID, dict(attrib))
+      
+  def ended(self, tag, text, depth):
+    if depth == 6 and tag == TAG_RESPONSE_CODE:
+      self.checkResponseCode(text)
+      
+    elif depth == 9 and tag == TAG_DISPLAY_NAME and self.folder != None:
+      self.folder['displayName'] = text
+      
+    elif depth == 8 and self.folder != None:
+      if 'folderIDElement' not in self.folder or 'displayName' not in self.folder:
+        raise DataException('Missing element type:FolderId or type:DisplayName')
+      
+      self.calendarFolders.append(self.folder)
+      self.folder = None
+      
+  def result(self):
+    return self.calendarFolders
+
 # XML parsing convenience functions --->
 
 # <--- simple parsing
@@ -2,3 +2,5 @@ from pjlink.projector import (
     Projector,
     MUTE_VIDEO, MUTE_AUDIO,
 )
+from pjlink.session import Session
+from pjlink.fleet import Fleet, Device
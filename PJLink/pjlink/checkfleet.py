@@ -0,0 +1,124 @@
+'''polls a handful of stand-in projectors (see 'standin') with a Fleet and
+checks what it makes of them, e.g. python -m pjlink.checkfleet -n 20'''
+
+import argparse
+import socket
+import sys
+import time
+from threading import Lock
+
+from pjlink import standin
+from pjlink.fleet import Fleet, Device, distribution
+
+def make_states(count, delay):
+    states = []
+    for i in range(count):
+        state = standin.State(password='secret' if i % 3 == 0 else None, delay=delay)
+
+        # a mix of powered off, warnings, errors and lamp ages
+        state.power = '0' if i % 4 == 1 else '1'
+        state.errors = ''.join(['0', '1' if i % 5 == 2 else '0', '0', '0', '2' if i % 7 == 3 else '0', '0'])
+        state.lamps = '%s 1' % (1000 + 250 * i)
+
+        states.append(state)
+
+    return states
+
+def unused_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def expected_metrics(states, threshold):
+    hours = sorted([int(state.lamps.split()[0]) for state in states])
+
+    errors = {}
+    for key, position in [('fan', 0), ('lamp', 1), ('temperature', 2), ('cover', 3), ('filter', 4), ('other', 5)]:
+        errors[key] = {'warning': len([s for s in states if s.errors[position] == '1']),
+                       'error': len([s for s in states if s.errors[position] == '2'])}
+
+    lamp_hours = distribution(hours)
+    lamp_hours['overThreshold'] = len([h for h in hours if h > threshold])
+
+    return {'projectors': len(states) + 1,
+            'online': len(states),
+            'offline': 1,
+            'poweredOn': len([s for s in states if s.power == '1']),
+            'errors': errors,
+            'lampHours': lamp_hours}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--projectors', type=int, default=10)
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument('-d', '--delay', type=float, default=0.01,
+                        help='seconds each stand-in takes to respond')
+    parser.add_argument('-t', '--threshold', type=int, default=2000,
+                        help='lamp hours threshold')
+    args = parser.parse_args()
+
+    states = make_states(args.projectors, args.delay)
+    servers = [standin.start(state) for state in states]
+
+    devices = [Device('projector %s' % i, ('127.0.0.1', port), password=state.password, timeout=2)
+               for i, (state, (server, port)) in enumerate(zip(states, servers))]
+
+    # and one that isn't there
+    devices.append(Device('missing', ('127.0.0.1', unused_port()), timeout=2))
+
+    polled = []
+    lock = Lock()
+    def on_polled(device):
+        lock.acquire()
+        try:
+            polled.append(device)
+        finally:
+            lock.release()
+
+    fleet = Fleet(devices, on_polled, workers=args.workers, interval=60)
+    now = time.time()
+    fleet.start(now)
+
+    started = time.time()
+    fleet.tick(now + fleet.interval * 2)
+    while len(polled) < len(devices) and time.time() - started < 30:
+        time.sleep(0.05)
+    took = time.time() - started
+
+    metrics = fleet.metrics(args.threshold)
+    expected = expected_metrics(states, args.threshold)
+    fleet.stop()
+
+    for server, port in servers:
+        server.shutdown()
+
+    print 'polled %s of %s projectors in %.2fs using %s workers' % (len(polled), len(devices), took, args.workers)
+    print 'connections:', sum([state.connections for state in states])
+
+    failures = []
+    if len(polled) != len(devices):
+        failures.append('only %s of %s projectors were polled' % (len(polled), len(devices)))
+
+    for device in devices[:-1]:
+        if not device.online:
+            failures.append('%s: %s' % (device.name, device.error))
+
+    if devices[-1].online:
+        failures.append('the missing projector is online')
+
+    for key in sorted(expected):
+        if metrics.get(key) != expected[key]:
+            failures.append('%s: got %s, expected %s' % (key, metrics.get(key), expected[key]))
+
+    for failure in failures:
+        print 'FAIL', failure
+
+    if failures:
+        sys.exit(1)
+
+    print 'OK'
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import random
+import sys
+import time
+from threading import Thread, Lock
+from Queue import Queue
+
+from pjlink import projector
+from pjlink.session import Session
+
+STATUS_QUERIES = ['POWR', 'INPT', 'AVMT', 'ERST', 'LAMP']
+
+ERROR_KEYS = ['fan', 'lamp', 'temperature', 'cover', 'filter', 'other']
+
+class Device(object):
+    '''one projector in a fleet and what was last heard from it'''
+
+    def __init__(self, name, address, password=None, timeout=10):
+        self.name = name
+        self.session = Session(address, lambda: password, timeout=timeout)
+
+        self.status = None          # the last status (see 'parse_status')
+        self.error = None           # the last error (None if the last poll worked)
+        self.last_contact = None    # (time.time())
+        self.next_poll = None
+        self.busy = False
+
+    @property
+    def online(self):
+        return self.error is None and self.status is not None
+
+def parse_status(results):
+    '''turns the results of a 'get_many(STATUS_QUERIES)' into a dict,
+    leaving out whatever the projector couldn't answer (e.g. input while off)'''
+    status = {}
+    power, inp, mute, errors, lamps = results
+
+    if power[0]:
+        status['power'] = projector.parse_power(power[1])
+
+    if inp[0]:
+        source, number = projector.parse_input(inp[1])
+        status['input'] = {'source': source, 'number': number}
+
+    if mute[0]:
+        video, audio = projector.parse_mute(mute[1])
+        status['mute'] = {'video': video, 'audio': audio}
+
+    if errors[0]:
+        status['errors'] = dict([(key, projector.ERROR_STATES_REV.get(value, 'unknown'))
+                                 for key, value in projector.parse_errors(errors[1]).items()])
+
+    if lamps[0]:
+        status['lampHours'] = [hours for hours, on in projector.parse_lamps(lamps[1])]
+
+    return status
+
+class Fleet(object):
+    '''polls many projectors using a bounded number of worker threads,
+    each projector on its own (jittered) schedule'''
+
+    def __init__(self, devices, on_polled, workers=8, interval=300, jitter=0.1):
+        self.devices = list(devices)
+        self.on_polled = on_polled  # called with the device (from a worker thread)
+        self.workers = workers
+        self.interval = interval
+        self.jitter = jitter
+
+        self.pending = Queue()
+        self.lock = Lock()
+        self.threads = []
+
+    def start(self, now=None):
+        now = now if now is not None else time.time()
+
+        # spread the first polls over the first interval
+        for device in self.devices:
+            device.next_poll = now + random.uniform(0, self.interval)
+
+        for i in range(self.workers):
+            t = Thread(target=self._work, name='PJLink fleet %s' % i)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        '''stops the workers and closes any open connections'''
+        for t in self.threads:
+            self.pending.put(None)
+        self.threads = []
+
+        for device in self.devices:
+            device.session.close()
+
+    def tick(self, now=None):
+        '''queues up every device that is due (call this every second or so)'''
+        now = now if now is not None else time.time()
+
+        self.lock.acquire()
+        try:
+            due = [device for device in self.devices if not device.busy and device.next_poll <= now]
+            for device in due:
+                device.busy = True
+        finally:
+            self.lock.release()
+
+        for device in due:
+            self.pending.put(device)
+
+        return len(due)
+
+    def poll(self, device):
+        try:
+            results = device.session.run(lambda p: p.get_many(STATUS_QUERIES))
+            device.status = parse_status(results)
+            device.error = None
+            device.last_contact = time.time()
+
+        except:
+            # (may not be a native Python exception under Jython)
+            e = sys.exc_info()[1]
+            device.error = str(e) or e.__class__.__name__
+
+        if self.interval > device.session.idle_timeout:
+            # no point holding the connection until next time
+            device.session.close()
+
+    def _work(self):
+        while True:
+            device = self.pending.get()
+            if device is None:
+                return
+
+            try:
+                self.poll(device)
+                self.on_polled(device)
+
+            except:
+                # (keep the worker going regardless)
+                print 'PJLink fleet: problem with %s - %s' % (device.name, sys.exc_info()[1])
+
+            finally:
+                self.lock.acquire()
+                try:
+                    device.next_poll = time.time() + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+                    device.busy = False
+                finally:
+                    self.lock.release()
+
+    def metrics(self, lamp_hours_threshold=None):
+        '''aggregates the last status of all the devices'''
+        online = [device for device in self.devices if device.online]
+
+        errors = dict([(key, {'warning': 0, 'error': 0}) for key in ERROR_KEYS])
+        for device in online:
+            for key, level in (device.status.get('errors') or {}).items():
+                if level in ('warning', 'error'):
+                    errors[key][level] += 1
+
+        hours = sorted([max(device.status['lampHours']) for device in online if device.status.get('lampHours')])
+
+        lamp_hours = distribution(hours)
+        if lamp_hours_threshold is not None:
+            lamp_hours['overThreshold'] = len([h for h in hours if h > lamp_hours_threshold])
+
+        return {'projectors': len(self.devices),
+                'online': len(online),
+                'offline': len(self.devices) - len(online),
+                'poweredOn': len([device for device in online if device.status.get('power') == 'on']),
+                'errors': errors,
+                'lampHours': lamp_hours}
+
+def distribution(values):
+    '''min, median, 90th percentile and max of sorted values'''
+    if not values:
+        return {'count': 0}
+
+    at = lambda fraction: values[min(int(fraction * len(values)), len(values) - 1)]
+    return {'count': len(values), 'min': values[0], 'median': at(0.5), 'p90': at(0.9), 'max': values[-1]}
@@ -39,6 +39,42 @@ ERROR_STATES_REV = {
     '2': 'error',
 }
 
+# response parsing (shared by the single getters and 'get_many')
+
+def parse_power(param):
+    return POWER_STATES_REV[param]
+
+def parse_input(param):
+    source, number = param
+    source = SOURCE_TYPES_REV[source]
+    number = int(number)
+    return (source, number)
+
+def parse_mute(param):
+    return MUTE_STATES_REV[param]
+
+def parse_errors(param):
+    errors = 'fan lamp temperature cover filter other'.split()
+    assert len(param) == len(errors)
+    ret = {}
+    for key, value in zip(errors, param):
+      ret[key] = value
+    return ret
+
+def parse_lamps(param):
+    assert len(param) <= 65
+    values = param.split(' ')
+    assert len(values) <= 16 and len(values) % 2 == 0
+
+    lamps = []
+    for time, state in zip(values[::2], values[1::2]):
+        time = int(time)
+        state = bool(int(state))
+        lamps.append((time, state))
+
+    assert len(lamps) <= 8
+    return lamps
+
 class Projector(object):
     def __init__(self, f):
         self.f = f
@@ -93,6 +129,11 @@ class Projector(object):
             raise ProjectorError(response)
         return response
 
+    def get_many(self, bodies, pipelined=False):
+        '''queries several values over the one connection, returning a list
+        of (success, response) in the same order'''
+        return protocol.send_commands(self.f, [(body, '?') for body in bodies], pipelined)
+
     def set(self, body, param):
         success, response = protocol.send_command(self.f, body, param)
         if not success:
@@ -102,8 +143,7 @@ class Projector(object):
     # Power
 
     def get_power(self):
-        param = self.get('POWR')
-        return POWER_STATES_REV[param]
+        return parse_power(self.get('POWR'))
 
     def set_power(self, status, force=False):
         if not force:
@@ -113,11 +153,7 @@ class Projector(object):
     # Input
 
     def get_input(self):
-        param = self.get('INPT')
-        source, number = param
-        source = SOURCE_TYPES_REV[source]
-        number = int(number)
-        return (source, number)
+        return parse_input(self.get('INPT'))
 
     def set_input(self, source, number):
         source = SOURCE_TYPES[source]
@@ -128,8 +164,7 @@ class Projector(object):
     # A/V mute
 
     def get_mute(self):
-        param = self.get('AVMT')
-        return MUTE_STATES_REV[param]
+        return parse_mute(self.get('AVMT'))
 
     def set_mute(self, what, state):
         assert what in (MUTE_VIDEO, MUTE_AUDIO, MUTE_VIDEO | MUTE_AUDIO)
@@ -141,30 +176,12 @@ class Projector(object):
     # Errors
 
     def get_errors(self):
-        param = self.get('ERST')
-        errors = 'fan lamp temperature cover filter other'.split()
-        assert len(param) == len(errors)
-        ret = {}
-        for key, value in zip(errors, param):
-          ret[key] = value
-        return ret
+        return parse_errors(self.get('ERST'))
 
     # Lamps
 
     def get_lamps(self):
-        param = self.get('LAMP')
-        assert len(param) <= 65
-        values = param.split(' ')
-        assert len(values) <= 16 and len(values) % 2 == 0
-
-        lamps = []
-        for time, state in zip(values[::2], values[1::2]):
-            time = int(time)
-            state = bool(int(state))
-            lamps.append((time, state))
-
-        assert len(lamps) <= 8
-        return lamps
+        return parse_lamps(self.get('LAMP'))
 
     # Input list
 
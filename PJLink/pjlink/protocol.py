@@ -1,4 +1,8 @@
 def read_until(f, term):
+    if hasattr(f, 'read_until'):
+        # buffered readers can scan for the terminator themselves
+        return f.read_until(term)
+
     data = []
     c = f.read(1)
     while c != term:
@@ -46,14 +50,28 @@ ERRORS = {
 }
 
 def send_command(f, req_body, req_param):
-    data = to_binary(req_body, req_param)
-    f.write(data)
-    f.flush()
+    return send_commands(f, [(req_body, req_param)])[0]
+
+def send_commands(f, requests, pipelined=False):
+    # class 1 expects each response to be read before the next command is
+    # sent, 'pipelined' writes them all in one go instead (only for
+    # projectors known to cope with that)
+    if pipelined:
+        f.write(''.join([to_binary(body, param) for body, param in requests]))
+        f.flush()
+
+    results = []
+    for req_body, req_param in requests:
+        if not pipelined:
+            f.write(to_binary(req_body, req_param))
+            f.flush()
 
-    resp_body, resp_param = parse_response(f)
-    assert resp_body == req_body
+        resp_body, resp_param = parse_response(f)
+        assert resp_body == req_body
 
-    if resp_param in ERRORS:
-        return False, ERRORS[resp_param]
-    return True, resp_param
+        if resp_param in ERRORS:
+            results.append((False, ERRORS[resp_param]))
+        else:
+            results.append((True, resp_param))
+    return results
 
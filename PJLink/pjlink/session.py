@@ -0,0 +1,140 @@
+import socket
+import time
+from threading import RLock
+
+from pjlink.projector import Projector, ProjectorError
+
+# PJLink projectors drop a connection after 30 seconds without a command
+IDLE_TIMEOUT = 20
+
+class ConnectionClosed(Exception):
+    pass
+
+class BufferedSocket(object):
+    '''the bits of a file object that the protocol uses, reading whatever
+    has arrived in one go and scanning that for terminators'''
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = ''
+
+    def _fill(self):
+        data = self.sock.recv(4096)
+        if not data:
+            raise ConnectionClosed('connection closed by projector')
+        self.buf += data
+
+    def read(self, size):
+        while len(self.buf) < size:
+            self._fill()
+        data, self.buf = self.buf[:size], self.buf[size:]
+        return data
+
+    def read_until(self, term):
+        i = self.buf.find(term)
+        while i < 0:
+            start = len(self.buf)
+            self._fill()
+            i = self.buf.find(term, start)
+        data, self.buf = self.buf[:i], self.buf[i+1:]
+        return data
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.sock.close()
+
+class Session(object):
+    '''one authenticated connection to a projector that is kept open and
+    reused (reconnecting whenever the projector has closed it)'''
+
+    def __init__(self, address, get_password, timeout=10, idle_timeout=IDLE_TIMEOUT):
+        self.address = address
+        self.get_password = get_password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+
+        self.lock = RLock()
+        self.projector = None
+        self.last_used = 0
+
+    def run(self, func):
+        '''calls func(projector) with a connected, authenticated projector,
+        retrying once on a fresh connection if a reused one has gone'''
+        self.lock.acquire()
+        try:
+            if self.projector is not None and time.time() - self.last_used > self.idle_timeout:
+                # the projector will have closed it (or is about to)
+                self.close()
+
+            fresh = self.projector is None
+            if fresh:
+                self._connect()
+
+            try:
+                result = func(self.projector)
+            except (socket.error, ConnectionClosed):
+                self.close()
+                if fresh:
+                    raise
+
+                self._connect()
+                result = func(self.projector)
+
+            self.last_used = time.time()
+            return result
+
+        except ProjectorError:
+            # (the projector answered so the connection is still fine)
+            raise
+
+        except:
+            # e.g. a timeout or garbled response, so don't leave anything
+            # half-read behind
+            self.close()
+            raise
+
+        finally:
+            self.lock.release()
+
+    def close_if_idle(self):
+        self.lock.acquire()
+        try:
+            if self.projector is not None and time.time() - self.last_used > self.idle_timeout:
+                self.close()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            if self.projector is not None:
+                try:
+                    self.projector.f.close()
+                except socket.error:
+                    pass
+                self.projector = None
+        finally:
+            self.lock.release()
+
+    def _connect(self):
+        sock = socket.socket()
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.address)
+            projector = Projector(BufferedSocket(sock))
+            rv = projector.authenticate(self.get_password)
+        except:
+            sock.close()
+            raise
+
+        if rv is False:
+            sock.close()
+            raise ProjectorError('authentication error')
+
+        self.projector = projector
+        self.last_used = time.time()
@@ -0,0 +1,128 @@
+'''a minimal PJLink class 1 projector to test against (see 'checkfleet')'''
+
+import hashlib
+import random
+import socket
+import SocketServer
+import time
+from threading import Thread, Lock
+
+class State(object):
+    '''what the stand-in projector reports (in raw PJLink form)'''
+
+    def __init__(self, password=None, delay=0.0):
+        self.password = password
+        self.delay = delay          # (seconds before each response)
+
+        self.power = '1'
+        self.input = '31'
+        self.mute = '30'
+        self.errors = '000000'
+        self.lamps = '1234 1'
+
+        self.lock = Lock()
+        self.connections = 0
+        self.commands = 0
+
+    def handle(self, body, param):
+        time.sleep(self.delay)
+
+        self.lock.acquire()
+        try:
+            self.commands += 1
+        finally:
+            self.lock.release()
+
+        if body == 'POWR':
+            if param == '?':
+                return self.power
+            self.power = param
+            return 'OK'
+
+        if body in ('INPT', 'AVMT'):
+            if param == '?':
+                if self.power != '1':
+                    # unavailable while off
+                    return 'ERR3'
+                return self.input if body == 'INPT' else self.mute
+            if body == 'INPT':
+                self.input = param
+            else:
+                self.mute = param
+            return 'OK'
+
+        if body == 'ERST':
+            return self.errors
+
+        if body == 'LAMP':
+            return self.lamps
+
+        return 'ERR1'
+
+class Handler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        state = self.server.state
+
+        state.lock.acquire()
+        try:
+            state.connections += 1
+        finally:
+            state.lock.release()
+
+        sock = self.request
+        sock.settimeout(30)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        salt = '%08x' % random.getrandbits(32)
+        if state.password:
+            sock.sendall('PJLINK 1 %s\r' % salt)
+        else:
+            sock.sendall('PJLINK 0\r')
+
+        authenticated = not state.password
+        buf = ''
+        try:
+            while True:
+                data = sock.recv(1024)
+                if not data:
+                    return
+                buf += data
+
+                while '\r' in buf:
+                    line, buf = buf.split('\r', 1)
+
+                    if not authenticated:
+                        if line[:32] != hashlib.md5(salt + state.password).hexdigest():
+                            sock.sendall('PJLINK ERRA\r')
+                            return
+                        authenticated = True
+                        line = line[32:]
+
+                    if '\r' in buf:
+                        # a class 1 controller waits for each response
+                        # before sending the next command
+                        return
+
+                    body, param = line[2:6], line[7:]
+                    sock.sendall('%%1%s=%s\r' % (body, state.handle(body, param)))
+
+        except socket.error:
+            return
+
+        finally:
+            sock.close()
+
+class Server(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def start(state, port=0):
+    '''serves 'state' on localhost, returning the server and its port'''
+    server = Server(('127.0.0.1', port), Handler)
+    server.state = state
+
+    t = Thread(target=server.serve_forever, name='PJLink stand-in %s' % server.server_address[1])
+    t.daemon = True
+    t.start()
+
+    return server, server.server_address[1]
@@ -4,6 +4,7 @@
 import pjlink
 import socket
 import sys
+import atexit
 
 DEFAULT_PORT = 4352
 
@@ -42,7 +43,15 @@ PJLINK_ERRORKEYS = ['fan', 'lamp', 'temperature', 'cover', 'filter', 'other'] #
 
 def main():
   if len((param_ipAddress or '').strip()) == 0:
-    console.warn('No IP address configured; nothing to do')
+    if not param_fleet:
+      console.warn('No IP address configured; nothing to do')
+      
+    else:
+      # fleet only, so nothing for the single projector pollers to do and
+      # the status comes from the fleet instead (see 'fleetStatusCheck')
+      for timer in [timer_powerRetriever, timer_inputRetriever, poller_lampHoursAndErrors, status_timer, timer_sessionCloser]:
+        timer.stop()
+        
     return
   
   console.info('Using network destination [%s:%s]' % (param_ipAddress, param_port or DEFAULT_PORT))
@@ -51,144 +60,147 @@ def main():
 
 def local_action_RawPowerOn(arg=None):
   '''{"desc": "Turns projector on.", "group": "Power"}'''
-  p = get_projector()
-  if(p):
-    try:
-      p.set_power('on')
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+  with_projector(lambda p: p.set_power('on'))
 
 def local_action_RawPowerOff(arg=None):
   '''{"desc": "Turns the projector off.", "group": "Power" }'''
-  p = get_projector()
-  if(p):
-    try:
-      p.set_power('off')
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+  with_projector(lambda p: p.set_power('off'))
 
 def local_action_GetPower(arg=None):
   '''{"desc": "Get power state of projector.", "group": "Power" }'''
-  p = get_projector()
-  if(p):
-    try:
-      pwr = p.get_power()
-      local_event_PowerState.emit(pwr)
-      
-      # for status reporting
-      lastReceive[0] = system_clock()
-      
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+  pwr = with_projector(lambda p: p.get_power())
+  if pwr != None:
+    local_event_PowerState.emit(pwr)
 
 def local_action_RawSetInput(arg):
   '''{"desc": "Set projector input.", "group": "Inputs", "schema": { "type":"object", "required":true, "title": "Input", "properties":{ 
           "number": { "type":"integer", "title": "Number", "required":true }, 
           "source": { "type":"string", "title": "Source", "required":true, "enum": ["RGB", "VIDEO", "DIGITAL", "STORAGE", "NETWORK"] } } } }'''
-  p = get_projector()
-  if(p):
-    try:
-      p.set_input(arg['source'], arg['number'])
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+  with_projector(lambda p: p.set_input(arg['source'], arg['number']))
 
 def local_action_GetInput(arg=None):
   '''{"desc": "Get current input.", "group": "Inputs" }'''
-  p = get_projector()
-  if(p):
-    try:
-      inp = p.get_input()
-      local_event_InputState.emit(inp) # legacy
-      local_event_Input.emit({'source': inp[0], 'number': inp[1]}) # managed
+  inp = with_projector(lambda p: p.get_input())
+  if inp != None:
+    emitInput(inp)
       
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+def emitInput(inp):
+  local_event_InputState.emit(inp) # legacy
+  local_event_Input.emit({'source': inp[0], 'number': inp[1]}) # managed
+
+MUTE_WHAT = { 'video': 1, 'audio': 2, 'all': 3 }
 
 def local_action_Mute(what):
   '''{"schema": { "title": "What", "type": "string", "required": true, "enum" : ["video", "audio", "all"] }, "group": "Mute" }'''
-  p = get_projector()
-  if(p):
-    try:
-      what = { 'video': 1, 'audio': 2, 'all': 3, }[what]
-      p.set_mute(what, True)
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+  with_projector(lambda p: p.set_mute(MUTE_WHAT[what], True))
 
 def local_action_Unmute(what):
   '''{"schema": { "title": "What", "type": "string", "required": true, "enum" : ["video", "audio", "all"] }, "group": "Mute" }'''
-  p = get_projector()
-  if(p):
-    try:
-      what = { 'video': 1, 'audio': 2, 'all': 3, }[what]
-      p.set_mute(what, False)
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
+  with_projector(lambda p: p.set_mute(MUTE_WHAT[what], False))
 
 PJLINK_ERRORBYLEVEL = {0: 'OK', 1: 'Warning', 2: 'Error'}
 
 def local_action_LampsAndErrors(x = None):
   '''{"desc": "Get lamp and errors info", "group": "Information" }'''
-  p = get_projector()
-  if(p):
-    try:
-      # get errors first in case lamps fails
-      errors = p.get_errors()
-      
-      for key in errors:
-        # resolve (overwrite) the error levels into text
-        # (note: 'get_errors' wraps the integer values as strings
-        errors[key] = PJLINK_ERRORBYLEVEL.get(int(errors[key]), 'Unknown')
-      
-      local_event_Errors.emit(errors)
+  # (both queried over the one connection)
+  results = with_projector(lambda p: p.get_many(['ERST', 'LAMP']))
+  if results != None:
+    emitLampsAndErrors(results[0], results[1])
+    
+def emitLampsAndErrors(errorsResult, lampsResult):
+  # errors first in case lamps fails
+  try:
+    errors = pjlink.projector.parse_errors(checkResult(errorsResult))
+    
+    for key in errors:
+      # resolve (overwrite) the error levels into text
+      # (note: 'parse_errors' wraps the integer values as strings
+      errors[key] = PJLINK_ERRORBYLEVEL.get(int(errors[key]), 'Unknown')
+    
+    local_event_Errors.emit(errors)
+    
+    lampHours = list()
+    for i, (time, state) in enumerate(pjlink.projector.parse_lamps(checkResult(lampsResult))):
+        lampHours.append(str(time))
+        
+    local_event_LampHours.emit(', '.join(lampHours))
+    
+  except Exception, e:
+    local_event_LastCommsError.emit(e)
+    
+local_event_Mute = LocalEvent({'group': 'Mute', 'schema': {'type': 'object', 'properties': {
+        'video': {'type': 'boolean', 'order': 1},
+        'audio': {'type': 'boolean', 'order': 2}}}})
+
+STATUS_QUERIES = ['POWR', 'INPT', 'AVMT', 'ERST', 'LAMP']
+
+def local_action_GetStatus(arg=None):
+  '''{"desc": "Get power, input, mute, errors and lamp info all over the one connection", "group": "Information" }'''
+  results = with_projector(lambda p: p.get_many(STATUS_QUERIES))
+  if results == None:
+    return
+  
+  (power, inp, mute, errors, lamps) = results
+  
+  try:
+    local_event_PowerState.emit(pjlink.projector.parse_power(checkResult(power)))
+    
+    # (input and mute are normally unavailable while the projector is off)
+    if inp[0]:
+      emitInput(pjlink.projector.parse_input(inp[1]))
+    
+    if mute[0]:
+      (video, audio) = pjlink.projector.parse_mute(mute[1])
+      local_event_Mute.emit({'video': video, 'audio': audio})
       
-      lampHours = list()
-      for i, (time, state) in enumerate(p.get_lamps()):
-          lampHours.append(str(time))
-          
-      local_event_LampHours.emit(', '.join(lampHours))
-          
-    except Exception, e:
-      local_event_LastCommsError.emit(e)
-    finally:
-      p.f.close()
-
-def get_projector():
+  except Exception, e:
+    local_event_LastCommsError.emit(e)
+    
+  emitLampsAndErrors(errors, lamps)
+  
+def checkResult(result):
+  # a (success, response) result from 'get_many'
+  success, response = result
+  if not success:
+    raise pjlink.projector.ProjectorError(response)
+  return response
+
+# the connection to the projector, kept open and reused between actions
+session = None
+
+@after_main
+def initSession():
+  global session
+  session = pjlink.Session((param_ipAddress, param_port or DEFAULT_PORT), lambda: param_password)
+
+def with_projector(func):
+  # calls 'func' with the (connected and authenticated) projector returning its result,
+  # or None if it failed
+  if session == None or len((param_ipAddress or '').strip()) == 0:
+    return None
+  
   try:
-    sock = socket.socket()
-    sock.settimeout(10) # envorce a conservative timeout to avoid 
-                        # any accidental lingering connections
-    sock.connect((param_ipAddress, param_port or DEFAULT_PORT))
-    f = sock.makefile()
-    proj = pjlink.Projector(f)
-    rv = proj.authenticate(lambda: param_password)
-    if(rv or rv is None):
-      return proj
-    else:
-      local_event_LastCommsError.emit('authentication error')
-      return False
+    result = session.run(func)
+    
+    # for status reporting
+    lastReceive[0] = system_clock()
+    
+    return result
+  
+  except (socket.error, pjlink.session.ConnectionClosed), e:
+    local_event_LastCommsError.emit('connection error - %s' % e)
+    
+  except Exception, e:
+    local_event_LastCommsError.emit(e)
+    
   except:
     # may not be native Python exception, so capture using 'sys'
     eType, eValue, eTraceback = sys.exc_info()
-
-    local_event_LastCommsError.emit('connection error - %s' % eValue)
     
-    return False
-  finally:
-    sock.close()
+    local_event_LastCommsError.emit('connection error - %s' % eValue)
+
+# let the projector have its connection back (it will drop it itself after 30s anyway)
+timer_sessionCloser = Timer(lambda: session and session.close_if_idle(), 10, 10)
 
 # managed power and input select
 
@@ -350,8 +362,8 @@ def init_lamp_hours_support():
   global lampUseHoursThreshold
   lampUseHoursThreshold = (param_warningThresholds or {}).get('lampUseHours') or lampUseHoursThreshold
   
-# poll every 4 hours, 30s first time.
-poller_lampHoursAndErrors = Timer(lambda: lookup_local_action('LampsAndErrors').call(), 4*3600, 30)
+# poll every 4 hours, 30s first time (everything else comes along over the same connection)
+poller_lampHoursAndErrors = Timer(lambda: lookup_local_action('GetStatus').call(), 4*3600, 30)
 
 local_event_Status = LocalEvent({'title': 'Status', 'group': 'Status', 'order': 9990, "schema": { 'title': 'Status', 'type': 'object', 'properties': {
         'level': {'title': 'Level', 'order': next_seq(), 'type': 'integer'},
@@ -414,7 +426,12 @@ def statusCheck():
                     {'level': 1, 'message': 'Lamp usage is %s hours which is %s above the replacement threshold of %s. It may need replacement.' % 
                                  (lampUseHours, lampUseHours-lampUseHoursThreshold, lampUseHoursThreshold)}))
     
-  # aggregate the statuses
+  local_event_Status.emit(aggregateStatuses(statuses))
+  
+  local_event_LastContactDetect.emit(str(now))  
+  
+def aggregateStatuses(statuses):
+  # (category, statusInfo) tuples to one status with the messages of the highest level
   aggregateLevel = 0
   aggregateMessage = 'OK'
   msgs = list()
@@ -432,11 +449,166 @@ def statusCheck():
   if aggregateLevel > 0:
     aggregateMessage = ', '.join(msgs)
     
-  local_event_Status.emit({'level': aggregateLevel, 'message': aggregateMessage})
-  
-  local_event_LastContactDetect.emit(str(now))  
+  return {'level': aggregateLevel, 'message': aggregateMessage}
   
 status_check_interval = 12*60 # check every 12 minutes
 status_timer = Timer(statusCheck, status_check_interval, 30)
 
 # device status --->
+
+
+# <!--- fleet (many projectors polled from this one node)
+
+DEFAULT_FLEET_INTERVAL = 5*60
+DEFAULT_FLEET_WORKERS = 8
+
+param_fleet = Parameter({'title': 'Fleet', 'order': next_seq(), 'desc': 'Projectors to poll from this node (instead of, or as well as, the one above)', 'schema': {'type': 'array', 'items': {
+        'type': 'object', 'properties': {
+          'name': {'type': 'string', 'title': 'Name', 'order': 1},
+          'ipAddress': {'type': 'string', 'title': 'IP address', 'order': 2},
+          'port': {'type': 'integer', 'title': 'Port', 'hint': DEFAULT_PORT, 'order': 3},
+          'password': {'type': 'string', 'title': 'Password', 'order': 4}
+    } } } })
+
+param_fleetPolling = Parameter({'title': 'Fleet polling', 'order': next_seq(), 'schema': {'type': 'object', 'properties': {
+          'interval': {'type': 'integer', 'title': 'Interval (secs)', 'hint': DEFAULT_FLEET_INTERVAL, 'order': 1},
+          'workers': {'type': 'integer', 'title': 'Max. concurrent connections', 'hint': DEFAULT_FLEET_WORKERS, 'order': 2}
+    } } })
+
+local_event_FleetMetrics = LocalEvent({'title': 'Fleet metrics', 'group': 'Fleet', 'order': next_seq(), 'schema': {'type': 'object', 'properties': {
+        'projectors': {'type': 'integer', 'title': 'Projectors', 'order': 1},
+        'online': {'type': 'integer', 'title': 'Online', 'order': 2},
+        'offline': {'type': 'integer', 'title': 'Offline', 'order': 3},
+        'poweredOn': {'type': 'integer', 'title': 'Powered on', 'order': 4},
+        'errors': {'type': 'object', 'title': 'Projectors reporting warnings and errors', 'order': 5},
+        'lampHours': {'type': 'object', 'title': 'Lamp hours (min, median, p90, max, over threshold)', 'order': 6}
+    } } })
+
+FLEET_ERRORLEVELS = {'ok': 'OK', 'warning': 'Warning', 'error': 'Error'}
+
+fleet = None
+
+# the signals of each projector in the fleet by name
+fleetSignals = {}
+
+@after_main
+def initFleet():
+  global fleet
+  
+  if not param_fleet:
+    return
+  
+  devices = list()
+  
+  for info in param_fleet:
+    name = info.get('name') or info['ipAddress']
+    devices.append(pjlink.Device(name, (info['ipAddress'], info.get('port') or DEFAULT_PORT), info.get('password')))
+    bindFleetSignals(name)
+    
+  polling = param_fleetPolling or {}
+  
+  fleet = pjlink.Fleet(devices, onFleetPolled, workers=polling.get('workers') or DEFAULT_FLEET_WORKERS, interval=polling.get('interval') or DEFAULT_FLEET_INTERVAL)
+  fleet.start()
+  
+  console.info('Polling a fleet of %s projectors (%s at a time)' % (len(devices), fleet.workers))
+  
+  timer_fleetTicker.start()
+  timer_fleetMetrics.start()
+  
+def bindFleetSignals(name):
+  group = 'Fleet: %s' % name
+  
+  fleetSignals[name] = {
+    'power': Event('%s Power' % name, {'group': group, 'order': next_seq(), 'schema': {'type': 'string', 'enum': ['off', 'on', 'cooling', 'warm-up']}}),
+    'input': Event('%s Input' % name, {'group': group, 'order': next_seq(), 'schema': {'type': 'object', 'properties': {
+                     'number': {'type': 'integer', 'order': 1},
+                     'source': {'type': 'string', 'order': 2}}}}),
+    'errors': Event('%s Errors' % name, {'group': group, 'order': next_seq(), 'schema': {'type': 'object'}}),
+    'lampHours': Event('%s Lamp Hours' % name, {'group': group, 'order': next_seq(), 'schema': {'type': 'string'}}),
+    'status': Event('%s Status' % name, {'group': group, 'order': next_seq(), 'schema': {'type': 'object', 'properties': {
+                      'level': {'type': 'integer', 'order': 1},
+                      'message': {'type': 'string', 'order': 2}}}})
+  }
+  
+def onFleetPolled(device):
+  # (called from the fleet's worker threads)
+  signals = fleetSignals[device.name]
+  status = device.status or {}
+  
+  if device.online:
+    if 'power' in status:
+      signals['power'].emitIfDifferent(status['power'])
+      
+    if 'input' in status:
+      signals['input'].emitIfDifferent(status['input'])
+      
+    if 'errors' in status:
+      signals['errors'].emitIfDifferent(dict([(key, FLEET_ERRORLEVELS.get(level, 'Unknown')) for key, level in status['errors'].items()]))
+      
+    if 'lampHours' in status:
+      signals['lampHours'].emitIfDifferent(', '.join([str(hours) for hours in status['lampHours']]))
+      
+  signals['status'].emitIfDifferent(fleetDeviceStatus(device))
+  
+def fleetDeviceStatus(device):
+  if not device.online:
+    return {'level': 2, 'message': 'Missing (%s)' % device.error}
+  
+  status = device.status
+  errors = status.get('errors') or {}
+  
+  for level, levelName in [(2, 'error'), (1, 'warning')]:
+    keys = [key.title() for key in PJLINK_ERRORKEYS if errors.get(key) == levelName]
+    if len(keys) > 0:
+      return {'level': level, 'message': 'Non-specific %ss reported: %s' % (levelName, ', '.join(keys))}
+    
+  lampUseHours = max(status.get('lampHours') or [0])
+  if lampUseHours > lampUseHoursThreshold:
+    return {'level': 1, 'message': 'Lamp usage is %s hours, above the replacement threshold of %s' % (lampUseHours, lampUseHoursThreshold)}
+  
+  return {'level': 0, 'message': 'OK'}
+
+def fleetStatusCheck():
+  metrics = fleet.metrics(lampUseHoursThreshold)
+  local_event_FleetMetrics.emitIfDifferent(metrics)
+  
+  if len((param_ipAddress or '').strip()) > 0:
+    # (the single projector's status check looks after the node's status)
+    return
+  
+  # the list of status items as (category, statusInfo) tuples
+  statuses = list()
+  
+  # (not counting any that haven't been polled yet)
+  missing = len([device for device in fleet.devices if device.error != None])
+  if missing > 0:
+    statuses.append(('Missing', {'level': 2, 'message': '%s of %s projectors' % (missing, metrics['projectors'])}))
+    
+  for key in PJLINK_ERRORKEYS:
+    counts = metrics['errors'].get(key) or {}
+    
+    if counts.get('error'):
+      statuses.append((key.title(), {'level': 2, 'message': 'Non-specific errors reported by %s projector(s)' % counts['error']}))
+      
+    elif counts.get('warning'):
+      statuses.append((key.title(), {'level': 1, 'message': 'Non-specific warnings reported by %s projector(s)' % counts['warning']}))
+      
+  overThreshold = metrics['lampHours'].get('overThreshold')
+  if overThreshold:
+    statuses.append(('Lamp usage', {'level': 1, 'message': '%s projector(s) above the replacement threshold of %s hours' % (overThreshold, lampUseHoursThreshold)}))
+    
+  local_event_Status.emitIfDifferent(aggregateStatuses(statuses))
+
+@atexit.register
+def cleanup():
+  # (otherwise each restart would leave the workers and connections behind)
+  if fleet != None:
+    fleet.stop()
+
+  if session != None:
+    session.close()
+
+timer_fleetTicker = Timer(lambda: fleet.tick(), 1, 1, stopped=True)
+timer_fleetMetrics = Timer(fleetStatusCheck, 15, 5, stopped=True)
+
+# fleet --->
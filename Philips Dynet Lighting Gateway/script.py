@@ -180,35 +180,30 @@ Timer(noOp_ping, 4.5*60) # every 4.5 minutes
 def connected():
   console.info('TCP connected')
 
-inputBuffer = list()
+from framing import Framer, fixedLength, sum8
+
+# 8 byte messages starting with a sync byte and ending with the (two's complement) checksum
+inputBuffer = Framer(fixedLength(8, sync='\x1c\x5c', checksum=sum8(negate=True)))
   
 def received(data):
   debug('received: [%s]' % data.encode('hex'))
   
   lastReceive[0] = system_clock()
   
-  for b in data:
-    processByteIn(b)
-  
-def processByteIn(b):
-  if len(inputBuffer) == 0:
-    if b == '\x1c' or b == '\x5c':
-      inputBuffer.append(b)
-      return
-    
-    else:
-      console.warn('NO SYNC BYTE YET')
-      return
+  if not inputBuffer.feed(data):
+    console.warn('input buffer overflowed; dropped it')
+    return
   
-  inputBuffer.append(b)
+  dropped = inputBuffer.dropped
   
-  if len(inputBuffer) >= 8:
-    handleDynaliteMessage(inputBuffer)
+  for frame in inputBuffer.frames():
+    handleDynaliteMessage(frame.tobytes())
     
-    del inputBuffer[:]
+  if inputBuffer.dropped != dropped:
+    console.warn('NO SYNC BYTE YET (or bad checksum); skipped %s bytes' % (inputBuffer.dropped - dropped))
     
 def handleDynaliteMessage(buff):
-  remote_action_NodelTransportForward1.call(''.join(buff).encode('hex'))
+  remote_action_NodelTransportForward1.call(buff.encode('hex'))
   
   sync = '%02x' % ord(buff[0])
   area = ord(buff[1])
@@ -1,14 +1,18 @@
 '''
 **QSC Q-SYS Core**
 
-`rev 7`
+`rev 10`
 
  * simply drag-drop **External Controls.xml** into the node root and restart node
  * supports [Q-SYS Core Redundany](https://q-syshelp.qsc.com/q-sys_8.2/Content/Redundancy/Redundancy_Core.htm) operation via a third instance
    * e.g. create 3 nodes for "DSP 1", "DSP 2" and "DSPs" where the latter has the Core 1 and Core 2 remote events filled in and External Controls present
+ * the parsed controls are cached in **External Controls.cache.json** (rebuilt whenever the design changes); use **Bind only** on large designs to bind the rest on demand
  
 _changelog_
 
+* _rev. 10: parsed design cached by hash and indexed, optional lazy binding of controls_
+* _rev. 9: coalesced control writes (latest value wins), optional ramp times on Float sets_
+* _rev. 8: meters, controls and status in separate change groups (rate tiers), precompiled feedback emitters_
 * _rev. 7.2405: tidyup_
 * _rev. 6: add CoreState for redundant operation_
 * _rev. 4.2302: JP added "level" and "message" for Status backwards support_
@@ -31,6 +35,22 @@ param_qscBinding = Parameter({"order": 3, "title": "QSC binding (if no 'External
 param_includeMetersOnly = Parameter({ 'order': 4, 'schema': { 'type': 'boolean' }})
 param_excludeMeters = Parameter({ 'order': 5, 'schema': { 'type': 'boolean' }})
 
+param_changeGroupRates = Parameter({ 'order': 6, 'title': 'Change group poll rates (secs)', 'schema': { 'type': 'object', 'properties': {
+                                                           'meters': { 'order': 1, 'title': 'Meters', 'type': 'number', 'hint': '0.1' },
+                                                           'controls': { 'order': 2, 'title': 'Controls', 'type': 'number', 'hint': '0.3' },
+                                                           'status': { 'order': 3, 'title': 'Status', 'type': 'number', 'hint': '2' }}}})
+
+param_writes = Parameter({ 'order': 7, 'title': 'Control writes', 'schema': { 'type': 'object', 'properties': {
+                                                           'coalesceWindow': { 'order': 1, 'title': 'Coalescing window (ms, 0 to disable)', 'type': 'integer', 'hint': '50' },
+                                                           'floatRamp': { 'order': 2, 'title': 'Ramp time for Float controls (secs)', 'type': 'number', 'hint': '(none)',
+                                                                          'desc': 'Lets the Core interpolate between coalesced values, e.g. the same as the window' }}}})
+
+param_bindOnly = Parameter({ 'order': 8, 'title': 'Bind only (blank binds all)', 'desc': 'Other controls are bound when first referenced, e.g. "Set control value" or "Bind component"',
+                             'schema': { 'type': 'object', 'properties': {
+                                                           'components': { 'order': 1, 'title': 'Component names (comma separated)', 'type': 'string' },
+                                                           'types': { 'order': 2, 'title': 'Types (comma separated)', 'type': 'string', 'hint': 'e.g. Float, Boolean' },
+                                                           'modes': { 'order': 3, 'title': 'Modes (comma separated)', 'type': 'string', 'hint': 'e.g. RW' }}}})
+
 # <!-- related to redundancy
 
 local_event_CoreState = LocalEvent({ 'desc': 'Relates to redundant operation', 'schema': { 'type': 'string' }})
@@ -61,13 +81,41 @@ def doSetIPAddress(arg):
 # -->
     
 import xml.etree.ElementTree as ET
+import hashlib
 
 QSC_NAMED_CONTROLS = ["Station1_PushToTalk_Input"]
 qscNamedControls = list()
 
+# the parsed control table is kept next to the design, keyed by a hash of the design text
+CONTROLS_CACHE_FILE = 'External Controls.cache.json'
+CONTROLS_CACHE_VERSION = 1
+
+# all controls in the design (bound or not) by control ID
+controlPropertiesByID = {}
+
+# control IDs by component name, type and mode
+controlIDsByComponent = {}
+controlIDsByType = {}
+controlIDsByMode = {}
+
 # how often to poll when rapid is needed
 QSC_RAPID_POLL = 0.3
 
+# meters and status controls are polled in their own change groups
+QSC_METER_POLL = 0.1
+QSC_STATUS_POLL = 2.0
+
+# how long sets to the same control are coalesced for (latest value wins)
+QSC_COALESCE_WINDOW = 0.05
+
+# rate tiers, i.e. (tier, change group ID, default rate)
+CHANGE_GROUP_TIERS = [ ('meters', 'meters', QSC_METER_POLL),
+                       ('controls', 'global', QSC_RAPID_POLL),
+                       ('status', 'status', QSC_STATUS_POLL) ]
+
+# control IDs by tier
+controlIDsByTier = dict([ (tier, list()) for tier, groupID, rate in CHANGE_GROUP_TIERS ])
+
 # General signals ---
 
 local_event_EngineStatus = LocalEvent({'group': 'System information', 'order': 1, 'schema': {
@@ -89,6 +137,9 @@ local_event_EngineStatus = LocalEvent({'group': 'System information', 'order': 1
 
 # stores signals by control ID
 externalControlSignalsByControlID = {}
+
+# change group feedback emitters by control ID, i.e. emitter(string, value) chosen at bind time
+feedbackEmittersByControlID = {}
     
 # Comms section ---
 local_event_Connected = LocalEvent({'group': 'Comms', 'order': 1})
@@ -146,15 +197,32 @@ def main(arg = None):
     
 # Direct control of QSC control
 def local_action_SetControlValue(arg):
-    '''{"group": "QSC direct", "order" : 0, "title" : "Set control value", "schema": { "type": "integer" } }'''
+    '''{"group": "QSC direct", "order" : 0, "title" : "Set control value", "schema": { "type": "object", "properties": {
+          "control": { "order": 1, "title": "Control", "type": "string" },
+          "value": { "order": 2, "title": "Value", "type": "number" },
+          "ramp": { "order": 3, "title": "Ramp (secs)", "type": "number" } } } }'''
     control = arg['control']
     value = arg['value']
     
-    qscControlSet(control, value)
+    # (bind lazily if it's in the design)
+    ensureBound(control)
+    
+    qscControlSet(control, value, ramp=arg.get('ramp'))
+    
+@local_action({ 'group': 'QSC direct', 'order': 2, 'title': 'Bind component', 'desc': 'Binds all controls of a component (if not already)', 'schema': { 'type': 'string' }})
+def BindComponent(arg):
+    controlIDs = controlIDsByComponent.get(arg)
+    if controlIDs is None:
+      return console.warn('Bind component: no component "%s" in the design' % arg)
+    
+    for controlID in controlIDs:
+      ensureBound(controlID)
     
 def local_action_InvalidateGlobalChangeGroup(arg):
-    '''{"group": "QSC direct", "order" : 1, "title" : "Invalidate global change group", "desc": "Resyncs ALL values."}'''
-    tcp.send(json_encode(newJSONrpc('ChangeGroup.Invalidate', params={"Id": "global"})))
+    '''{"group": "QSC direct", "order" : 1, "title" : "Invalidate change groups", "desc": "Resyncs ALL values."}'''
+    for tier, groupID, rate in CHANGE_GROUP_TIERS:
+      if len(controlIDsByTier[tier]) > 0:
+        tcp.send(json_encode(newJSONrpc('ChangeGroup.Invalidate', params={"Id": groupID})))
     
 def refreshState():
     print 'Refreshing feedback.'
@@ -194,8 +262,16 @@ def bindStaticFeedbackFunctions():
 def extractQSCcontrols(rootXML):
     rootXML = rootXML.strip()
     
-    doParse(rootXML)
-
+    signature = hashlib.md5(rootXML.encode('utf-8')).hexdigest()
+    
+    if loadControlsCache(signature):
+      console.info('(design unchanged; using cached control table)')
+      
+    else:
+      doParse(rootXML)
+      saveControlsCache(signature)
+      
+    indexControls()
       
 def doParse(rootXML):
   root = ET.fromstring(rootXML.encode('utf-8'))
@@ -222,17 +298,108 @@ def doParse(rootXML):
   # sort by controlID
   qscNamedControls.sort()
   
+# loads the control table if the cache matches the design, otherwise returns False
+def loadControlsCache(signature):
+    try:
+      f = open(CONTROLS_CACHE_FILE)
+      try:
+        cache = json_decode(f.read().decode('utf8'))
+      finally:
+        f.close()
+    except:
+      return False
+    
+    if cache.get('version') != CONTROLS_CACHE_VERSION or cache.get('hash') != signature:
+      return False
+    
+    # rows are columns in 'fields' order, null where the attribute is missing
+    fields = cache['fields']
+    for row in cache['rows']:
+      properties = dict([ (field, value) for field, value in zip(fields, row) if value is not None ])
+      qscNamedControls.append((properties['Id'], properties))
+      
+    return True
+  
+# stores the control table compactly i.e. field names once then a row per control
+def saveControlsCache(signature):
+    fields = list()
+    for controlID, properties in qscNamedControls:
+      for field in properties:
+        if field not in fields:
+          fields.append(field)
+          
+    rows = [ [ properties.get(field) for field in fields ] for controlID, properties in qscNamedControls ]
+    
+    try:
+      f = open(CONTROLS_CACHE_FILE, 'w')
+      try:
+        f.write(json_encode({ 'version': CONTROLS_CACHE_VERSION, 'hash': signature, 'fields': fields, 'rows': rows }).encode('utf8'))
+      finally:
+        f.close()
+    except Exception, exc:
+      console.warn('Could not write control table cache (will parse again next time); %s' % exc)
+      
+def indexControls():
+    for controlID, properties in qscNamedControls:
+      controlPropertiesByID[controlID] = properties
+      
+      controlIDsByComponent.setdefault(properties.get('ComponentName'), list()).append(controlID)
+      controlIDsByType.setdefault(properties.get('Type'), list()).append(controlID)
+      controlIDsByMode.setdefault(properties.get('Mode'), list()).append(controlID)
+      
+# returns the set of control IDs selected by the 'Bind only' parameter (None for all)
+def selectControlIDs(bindOnly):
+    selected = None
+    
+    for key, index in [ ('components', controlIDsByComponent), ('types', controlIDsByType), ('modes', controlIDsByMode) ]:
+      names = [ name.strip() for name in (bindOnly.get(key) or '').split(',') if name.strip() ]
+      if len(names) == 0:
+        continue
+      
+      controlIDs = set()
+      for name in names:
+        controlIDs.update(index.get(name) or [])
+        
+      selected = controlIDs if selected is None else selected & controlIDs
+      
+    return selected
     
 # binds all the named control based on config
 # (only done once)
 def bindNamedControls():
-    console.info('qscNamedControls=[%s]' % qscNamedControls)
+    selected = selectControlIDs(param_bindOnly or EMPTY)
   
     for controlID, properties in qscNamedControls:
+        if selected is not None and controlID not in selected:
+          continue
+        
         bindNamedControlAction(controlID, properties)
         
         # TODO LOG console.info('Bound signal and event to QSC control %s' % controlID)
         
+    console.info('%s of %s named controls bound' % (len(externalControlSignalsByControlID), len(qscNamedControls)))
+    
+# binds a control on first reference (if it's in the design), returns True if bound
+def ensureBound(controlID):
+    if controlID in externalControlSignalsByControlID:
+      return True
+    
+    properties = controlPropertiesByID.get(controlID)
+    if properties is None:
+      return False
+    
+    tier = bindNamedControlAction(controlID, properties)
+    if tier is None:
+      return False
+    
+    # join its change group (setting one up if it's the first in its tier)
+    for tier_, groupID, defaultRate in CHANGE_GROUP_TIERS:
+      if tier_ == tier:
+        setUpChangeGroup(tier, groupID, defaultRate, [ controlID ], len(controlIDsByTier[tier]) == 1)
+    
+    return True
+        
+# binds a control, returning its rate tier (or None if filtered out)
 def bindNamedControlAction(controlID, properties):
     # e.g.
     # <Control Id="D1SpecialAreaMixer:MicMute" ControlId="input_1_mute" ControlName="Input 1 Mute" 
@@ -258,6 +425,8 @@ def bindNamedControlAction(controlID, properties):
     isString = False
     statelessAction = False
     isBool = False
+    ramp = None
+    coalesce = True # (only settable values, latest value wins)
     
     if controlType == 'Boolean':
       schema = { 'type': 'boolean' }
@@ -273,6 +442,9 @@ def bindNamedControlAction(controlID, properties):
       # only use sliders on Floats
       if minValue != None:
         schema['format'] = 'range'
+        
+      # (only Floats are ramped)
+      ramp = (param_writes or EMPTY).get('floatRamp')
       
     elif controlType == 'Integer':
       schema = { 'type': 'integer' }
@@ -289,14 +461,19 @@ def bindNamedControlAction(controlID, properties):
               'level': { 'type': 'integer', 'order': 2 },
               'message': { 'type': 'string', 'order': 3 }
       } }
+      coalesce = False
     
     elif controlType == 'Trigger':
       schema = { 'type': 'boolean' }
       statelessAction = True
       
+      # every press counts
+      coalesce = False
+      
     else:
       console.warn('Unknown QSC data type detected; using string (type was "%s" for control %s)' % (controlType, controlID))
       schema = { 'type': 'string' }
+      coalesce = False
       
     # specify max and min anyway regardless of slider use
     if minValue != None:
@@ -307,6 +484,16 @@ def bindNamedControlAction(controlID, properties):
     signal = Signal('QSC %s' % controlID, {'group': nodelGroup, 'order': next_seq(), 'title': controlID, 
                                            'schema' : schema})
     externalControlSignalsByControlID[controlID] = signal  
+    feedbackEmittersByControlID[controlID] = newFeedbackEmitter(signal, schema.get('type'))
+    
+    if controlType == 'Status':
+      tier = 'status'
+    elif 'meter' in componentNameLower:
+      tier = 'meters'
+    else:
+      tier = 'controls'
+      
+    controlIDsByTier[tier].append(controlID)
   
     def handler(arg=None):
         # support some other boolean type for convenience
@@ -314,12 +501,29 @@ def bindNamedControlAction(controlID, properties):
           if arg in [ 'On', 'on', 'ON' ]: arg = True
           elif arg in [ 'Off', 'off', 'OFF' ]: arg = False
             
-        qscControlSet(controlID, arg if statelessAction == False else 1, isString)  
+        qscControlSet(controlID, arg if statelessAction == False else 1, isString, ramp, coalesce)  
     
     name = 'QSC %s' % controlID
     action = Action(name, handler, {'group': nodelGroup, 'order': next_seq(),  
                                     'title': controlID, 'schema': schema if not statelessAction else None})
     
+    return tier
+    
+# returns the function that emits change group feedback for a signal, i.e. emitter(string, value)
+def newFeedbackEmitter(signal, signalType):
+    if signalType == 'string':
+      return lambda string, value: signal.emit(string)
+    
+    elif signalType == 'boolean':
+      return lambda string, value: signal.emit(value == 1)
+    
+    # using 'object' to be native QSC type with 'value' and 'string' attributes
+    elif signalType == 'object':
+      return lambda string, value: signal.emit({'string': string, 'value': value, 'level': value, 'message': string }) # TODO: limit to ONLY status
+    
+    else:
+      return lambda string, value: signal.emit(value)
+    
 # first level of feedback handling
 def parseFeedback(obj):
     # print 'got feedback:%s' % obj
@@ -376,7 +580,7 @@ def connected():
     timer.start()
     coreStatusPoll_timer.start()
     
-    request_setUpControlChangeGroupPolling(externalControlSignalsByControlID)
+    request_setUpControlChangeGroupPolling()
   
 def received(data):
     log(2, 'RECV: [%s]' % data)
@@ -390,9 +594,8 @@ def received(data):
     parseFeedback(obj)
 
 def sent(data):
+    # (coalesced writes are several packets in one send so not decoded here)
     log(2, 'SENT: [%s]' % data)
-      
-    obj = json_decode(data)
     
     # LEAVING THIS TO LOGGING INSTEAD: local_event_Sent.emit(obj)
     
@@ -401,6 +604,10 @@ def disconnected():
 
     local_event_Disconnected.emit()
     timer.stop()
+    
+    # don't replay stale writes on reconnect
+    _pendingSets.clear()
+    del _pendingOrder[:]
     coreStatusPoll_timer.stop()
     
 def timeout():
@@ -419,19 +626,27 @@ def request_noOp():
     tcp.send(json_encode(newJSONrpc('NoOp', id='NoOp')))
 
 # Change group controlling -----------
-def request_setUpControlChangeGroupPolling(controls):
-    controlsList = [controlID for controlID in controls]
-  
+def request_setUpControlChangeGroupPolling():
+    # one change group per rate tier
+    for tier, groupID, defaultRate in CHANGE_GROUP_TIERS:
+      controlsList = controlIDsByTier[tier]
+      if len(controlsList) == 0:
+        continue
+      
+      setUpChangeGroup(tier, groupID, defaultRate, controlsList, True)
+    
+    # ... changes start flying in!
+    
+def setUpChangeGroup(tier, groupID, defaultRate, controlsList, autoPoll):
     # instruct the controls that need polling
-    tcp.send(json_encode(newJSONrpc('ChangeGroup.AddControl', params={"Id": "global", "Controls": controlsList})))
+    tcp.send(json_encode(newJSONrpc('ChangeGroup.AddControl', params={"Id": groupID, "Controls": controlsList})))
     
     # TODO: check response
     
     # set up an auto-poll
-    if not disable_autoPoll:
-        tcp.send(json_encode(newJSONrpc('ChangeGroup.AutoPoll', params={"Id": "global", "Rate": QSC_RAPID_POLL})))
-    
-    # ... changes start flying in!
+    if autoPoll and not disable_autoPoll:
+        rates = param_changeGroupRates or EMPTY
+        tcp.send(json_encode(newJSONrpc('ChangeGroup.AutoPoll', params={"Id": groupID, "Rate": rates.get(tier) or defaultRate})))
 
 # e.g. {jsonrpc=2.0, method=ChangeGroup.Poll, 
 #      params={Id=global, Changes=[{Name=Station1_PushToTalk_Input, String=true, Value=1}]}}
@@ -443,40 +658,90 @@ def handleChangeGroupPollFeedback(packet):
     if changes is None:
         return
     
+    emitters = feedbackEmittersByControlID
+    
     for change in changes:
-        name = change['Name']
-        string = change['String']
-        value = change['Value']
-        
-        # look up the signal
-        signal = externalControlSignalsByControlID.get(name)
-        if signal is None:
-            return
+        # look up the emitter
+        emitter = emitters.get(change['Name'])
+        if emitter is None:
+            # (not bound; carry on with the rest of the batch)
+            log(2, 'change for unknown control %s' % change['Name'])
+            continue
           
-        signalType = signal.getArgSchema().get('type')
-        if signalType == 'string':
-          signal.emit(string)
+        emitter(change['String'], change['Value'])
 
-        elif signalType == 'boolean':
-          signal.emit(value == 1)
-        
-        # using 'object' to be native QSC type with 'value' and 'string' attributes
-        elif signalType == 'object':
-          signal.emit({'string': string, 'value': value, 'level': value, 'message': string }) # TODO: limit to ONLY status
-        
-        else:
-          signal.emit(value)
+# Control writes -----------
+
+# the latest pending Control.Set params by control ID (latest value wins) and the order they first arrived in
+_pendingSets = {}
+_pendingOrder = list()
+
+# whether a coalescing window is open i.e. a write went out recently
+_windowOpen = [False]
+
+# returns the coalescing window in seconds (0 if disabled)
+def coalesceWindow():
+    window = (param_writes or EMPTY).get('coalesceWindow')
+    if window is None:
+      return QSC_COALESCE_WINDOW
+    
+    return max(window, 0) / 1000.0
 
 # Sets a control's value
-# (value can be bool of number)
+# (value can be bool of number, ramp in seconds has the Core interpolate, 'coalesce' False for
+#  stateless controls like Triggers where repeated sets are not redundant)
 # e.g. {"jsonrpc":"2.0","id":1234,"method":"Control.Set","params":{"Name": "10Station56ZonePARouterZone1BGMSelect", "Value": 0}}\x00        
-def qscControlSet(controlID, valueOrString, isString=False):
+def qscControlSet(controlID, valueOrString, isString=False, ramp=None, coalesce=True):
     if isString:
       params = {"Name": controlID, "String": valueOrString}
     else:
       params = {"Name": controlID, "Value": valueOrString}
       
-    tcp.send(json_encode(newJSONrpc('Control.Set', params=params)))
+      if ramp:
+        params['Ramp'] = ramp
+        
+    window = coalesceWindow()
+    
+    if window <= 0:
+      tcp.send(json_encode(newJSONrpc('Control.Set', params=params)))
+      
+    elif not coalesce:
+      # send straight away, after anything already pending so writes stay in order
+      if len(_pendingOrder) > 0:
+        flushControlSets()
+        
+      tcp.send(json_encode(newJSONrpc('Control.Set', params=params)))
+      
+    elif not _windowOpen[0]:
+      # quiet until now so send straight away, anything that follows within the window is coalesced
+      tcp.send(json_encode(newJSONrpc('Control.Set', params=params)))
+      _windowOpen[0] = True
+      call(closeCoalescingWindow, delay=window)
+      
+    else:
+      if controlID not in _pendingSets:
+        _pendingOrder.append(controlID)
+        
+      _pendingSets[controlID] = params
+
+# flushes whatever arrived during the window and stays open while writes keep coming
+def closeCoalescingWindow():
+    if len(_pendingOrder) == 0:
+      _windowOpen[0] = False
+      return
+    
+    flushControlSets()
+    
+    call(closeCoalescingWindow, delay=coalesceWindow())
+    
+# sends all pending sets as one delimited burst of Control.Set packets
+def flushControlSets():
+    packets = [ json_encode(newJSONrpc('Control.Set', params=_pendingSets[controlID])) for controlID in _pendingOrder ]
+    
+    _pendingSets.clear()
+    del _pendingOrder[:]
+    
+    tcp.send('\x00'.join(packets))
 
 @local_action({})
 def request_CoreStatus():
@@ -0,0 +1,202 @@
+'''Receive buffering and framing for binary protocols.'''
+
+# Use alongside script.py (copy this file into the recipe folder):
+#
+# (within script.py)
+#
+# from framing import *
+#
+# recvFramer = Framer(lengthPrefixed(3, 1, 5, sync='\xaa'))     # e.g. Samsung MDC
+#
+# def received(data):
+#   if not recvFramer.feed(data):
+#     console.warn('receive buffer overflowed; dropped it')
+#
+#   for frame in recvFramer.frames():
+#     queue.handle(frame.tobytes())
+#
+# Frames are memoryviews into the buffer itself so are only valid until the next 'feed'.
+# Use 'tobytes()' to keep one any longer than that.
+
+
+# <!--- buffer
+
+class Framer(object):
+  '''A fixed bytearray receive buffer with a read and write position. Unread bytes are only
+     moved (once) back to the front when writing reaches the end, so frames are always contiguous.'''
+
+  def __init__(self, extractor, capacity=4096):
+    self._extractor = extractor
+    self._buf = bytearray(capacity)
+    self._start = 0
+    self._end = 0
+
+    self.dropped = 0 # number of bytes skipped while (re)synchronising, for diagnostics
+
+  def __len__(self):
+    return self._end - self._start
+
+  def feed(self, data):
+    '''Appends received data, returns False if it would overflow (the buffer is cleared)'''
+    size = len(data)
+
+    if self._end + size > len(self._buf):
+      self._compact()
+
+      if self._end + size > len(self._buf):
+        self.clear()
+        return False
+
+    end = self._end + size
+    self._buf[self._end:end] = data
+    self._end = end
+    return True
+
+  def frames(self):
+    '''Yields each complete frame as a memoryview (valid until the next 'feed')'''
+    buf = self._buf
+    view = memoryview(buf)
+    extractor = self._extractor
+
+    while True:
+      skip, length = extractor(buf, self._start, self._end)
+
+      if skip:
+        self._start += skip
+        self.dropped += skip
+
+      elif length:
+        start = self._start
+        self._start = start + length
+        yield view[start:start + length]
+
+      else:
+        break
+
+    if self._start == self._end:
+      # empty so rewind for free
+      self._start = self._end = 0
+
+  def clear(self):
+    self._start = self._end = 0
+
+  def _compact(self):
+    size = self._end - self._start
+    self._buf[0:size] = self._buf[self._start:self._end]
+    self._start = 0
+    self._end = size
+
+# --->
+
+
+# <!--- extractors
+
+# An extractor looks at the unread bytes buf[start:end] and returns (skip, length):
+#  - skip > 0:      drop that many bytes (junk or a bad frame) and look again
+#  - length > 0:    a complete frame of that length is at 'start'
+#  - (0, 0):        need more data
+
+def findSync(buf, start, end, sync, syncValues):
+  '''Returns the position of the first sync byte in buf[start:end], or 'end' if there isn't one'''
+  if start < end and buf[start] in syncValues:
+    # (usual case, already in sync)
+    return start
+
+  found = end
+  for c in sync:
+    i = buf.find(c, start, found)
+    if i >= 0:
+      found = i
+  return found
+
+def lengthPrefixed(offset, size, extra, sync=None, checksum=None):
+  '''Frames holding their own length, i.e. frame length = (big-endian length field at 'offset' of 'size' bytes) + 'extra',
+     e.g. Modbus TCP is (4, 2, 6), Samsung MDC is (3, 1, 5)'''
+  headerLen = offset + size
+  syncValues = set(bytearray(sync or ''))
+
+  def extract(buf, start, end):
+    if sync != None:
+      found = findSync(buf, start, end, sync, syncValues)
+      if found != start:
+        return found - start, 0
+
+    if end - start < headerLen:
+      return 0, 0
+
+    pos = start + offset
+    if size == 1:
+      length = buf[pos] + extra
+    elif size == 2:
+      length = (buf[pos] << 8) + buf[pos + 1] + extra
+    else:
+      length = extra
+      for i in range(pos, start + headerLen):
+        length = length + (buf[i] << (8 * (start + headerLen - 1 - i)))
+
+    if end - start < length:
+      return 0, 0
+
+    if checksum != None and not checksum(buf, start, length):
+      return 1, 0
+
+    return 0, length
+
+  return extract
+
+def fixedLength(length, sync=None, checksum=None):
+  '''Frames of a fixed length, optionally starting with one of the 'sync' bytes e.g. DyNet is (8, '\\x1c\\x5c')'''
+  syncValues = set(bytearray(sync or ''))
+
+  def extract(buf, start, end):
+    if sync != None:
+      found = findSync(buf, start, end, sync, syncValues)
+      if found != start:
+        return found - start, 0
+
+    if end - start < length:
+      return 0, 0
+
+    if checksum != None and not checksum(buf, start, length):
+      return 1, 0
+
+    return 0, length
+
+  return extract
+
+def flagged(startFlag, stopFlag, maxLength=1024):
+  '''Frames between start and stop flag bytes (flags included) e.g. STX / ETX'''
+  def extract(buf, start, end):
+    found = buf.find(startFlag, start, end)
+    if found < 0:
+      return end - start, 0
+
+    if found != start:
+      return found - start, 0
+
+    stop = buf.find(stopFlag, start + 1, end)
+    if stop < 0:
+      # drop it if it's gone on for too long
+      return (1, 0) if end - start > maxLength else (0, 0)
+
+    return 0, stop + 1 - start
+
+  return extract
+
+# --->
+
+
+# <!--- checksums
+
+def sum8(first=0, negate=False):
+  '''The last byte of a frame holds the sum (or its two's complement) of the bytes from 'first' up to it,
+     e.g. Samsung MDC is sum8(1), DyNet is sum8(negate=True)'''
+  def check(buf, start, length):
+    total = sum(buf[start + first:start + length - 1])
+    if negate:
+      total = -total
+    return total & 0xff == buf[start + length - 1]
+
+  return check
+
+# --->
@@ -1,10 +1,11 @@
 '''
 **Samsung display** recipe, serial or TCP.
 
-`REV 12.240326`
+`REV 13.261018`
 
 Remember to adjust **Network Standby Control** to **On**.
 
+  * r13: receive framing uses the shared bytearray framer (framing.py, from ingredients)
   * r12: "Treat no signal as fault?" parameter
   * r11: BUGFIX random faults sometimes incorrectly generated on old displays when Powered Off (e.g. Lamp Fault)
   * IP address config via remote binding (see AMX Beacon, SSDP address, or custom address provider recipes)
@@ -125,7 +126,10 @@ def connected():
   # wait a second and poll
   timer_deviceStatus.setDelay(1.0)
   
-recvBuffer = list()
+from framing import Framer, lengthPrefixed
+
+# frames are HDR(aa) CMD ID length [data...] checksum, i.e. length + 5
+recvFramer = Framer(lengthPrefixed(3, 1, 5, sync='\xaa'))
 
 # data can be fragmented so need a special request queue to manage the protocol
   
@@ -139,39 +143,26 @@ def received(data):
   # HDR  CMD  ID   length  ACK         R->Cmd
   # +0   1    2    3       4           5  
   
-  if len(recvBuffer) == 0:
-    if data[0] != chr(0xaa):
-      console.log('bad header; throwing away...')
-      return
-  
-  recvBuffer.extend(data)
+  if not recvFramer.feed(data):
+    console.warn('receive buffer overflowed; throwing away...')
+    return
   
   processBuffer()
       
 def processBuffer():
-  for x in range(300): # avoiding an infinite loop
-    bufferLen = len(recvBuffer)
-    if bufferLen < 5:
-      # not big enough yet
-      return
+  dropped = recvFramer.dropped
   
-    # got at least 4 bytes (fourth holds the length)
-    messageLen = ord(recvBuffer[3])
-  
-    fullLen = 4 + messageLen + 1
-  
-    if len(recvBuffer) >= fullLen:
-      message = ''.join(recvBuffer[:fullLen])
-      del recvBuffer[:fullLen]
-      
-      log(2, 'recv_samsung [%s]' % message.encode('hex'))
-      
-      queue.handle(message)
-      
-      # might be more, so continue...
-      
-    else:
-      return
+  for frame in recvFramer.frames():
+    message = frame.tobytes()
+    
+    log(2, 'recv_samsung [%s]' % message.encode('hex'))
+    
+    queue.handle(message)
+    
+    # might be more, so continue...
+    
+  if recvFramer.dropped != dropped:
+    console.log('bad header; threw away %s bytes' % (recvFramer.dropped - dropped))
   
 def sent(data):
   log(3, 'tcp_sent [%s]' % data.encode('hex'))
@@ -195,7 +186,7 @@ tcp = TCP(connected=connected, received=received, sent=sent, disconnected=discon
 def protocolTimeout():
   console.log('protocol timeout; flushing buffer')
   queue.clearQueue()
-  del recvBuffer[:]
+  recvFramer.clear()
   
 
 queue = request_queue(timeout=protocolTimeout)
@@ -15,6 +15,114 @@ param_Meters = Parameter({ 'schema': { 'type': 'array', 'items': { 'type': 'obje
  
 local_event_DisableMeters = LocalEvent({'group': 'Meters', 'schema': {'type': 'boolean'}})
 
+# <meter pipeline ---
+
+METER_MODES = ['Per channel', 'Packed array']
+
+param_MeterPipeline = Parameter({'title': 'Meter pipeline', 'desc': 'How meter updates (every 333ms) become signals', 'schema': {'type': 'object', 'properties': {
+  'mode':       {'type': 'string', 'order': 1, 'enum': METER_MODES, 'hint': 'Per channel', 'desc': 'A signal per channel or one array signal per meter'},
+  'deadband':   {'type': 'integer', 'order': 2, 'title': 'Deadband (dB)', 'hint': '0 (any change)'},
+  'decimation': {'type': 'integer', 'order': 3, 'desc': 'Only emit every Nth update', 'hint': '1'},
+  'peakHold':   {'type': 'integer', 'order': 4, 'title': 'Peak hold (ms)', 'hint': '0 (off)'},
+  'rmsWindow':  {'type': 'integer', 'order': 5, 'title': 'RMS window (ms)', 'hint': '0 (off)'}}}})
+
+import math
+
+METER_INTERVAL = 333 # (ms, see kickOffMeters)
+
+# level codes to dB e.g. '1b' is -99
+LEVELS_BY_CODE = dict([('%02x' % code, -126 + code) for code in range(256)] + [('%02X' % code, -126 + code) for code in range(256)])
+
+def levelFromCode(code):
+  level = LEVELS_BY_CODE.get(code)
+  if level == None:
+    level = -126 + int(code, 16)
+  return level
+
+def isPackedMeters():
+  return (param_MeterPipeline or {}).get('mode') == 'Packed array'
+
+class MeterBlock:
+  '''The channels of one meter, levels go through RMS, peak-hold, decimation and deadband before being emitted'''
+  
+  def __init__(self, channels, signals=None, packedSignal=None):
+    config = param_MeterPipeline or {}
+    
+    self.channels = channels
+    self.signals = signals              # one per channel or...
+    self.packedSignal = packedSignal    # ...one for all
+    
+    self.deadband = max(config.get('deadband') or 0, 0)
+    self.decimation = max(config.get('decimation') or 1, 1)
+    self.peakHold = max(config.get('peakHold') or 0, 0)
+    
+    # RMS is over a ring of linear powers
+    rmsFrames = (config.get('rmsWindow') or 0) / METER_INTERVAL
+    self.rmsFrames = rmsFrames if rmsFrames > 1 else 0
+    self.powers = [[0.0] * self.rmsFrames for i in range(channels)]
+    self.rmsPos = 0
+    self.rmsCount = 0
+    
+    self.held = [-126] * channels
+    self.heldAt = [0] * channels
+    
+    self.frames = 0
+    
+    # what was last emitted (carries over restarts like emitIfDifferent would)
+    if packedSignal != None:
+      previous = packedSignal.getArg()
+      self.emitted = list(previous) if previous != None and len(previous) == channels else [None] * channels
+    else:
+      self.emitted = [signal.getArg() for signal in signals]
+      
+  def update(self, codes, now):
+    levels = [levelFromCode(code) for code in codes[:self.channels]]
+    count = len(levels)
+    
+    if self.rmsFrames:
+      pos = self.rmsPos
+      for i in range(count):
+        powers = self.powers[i]
+        powers[pos] = 10 ** (levels[i] / 10.0)
+        levels[i] = int(round(10 * math.log10(sum(powers) / (self.rmsCount + 1))))
+      self.rmsPos = (pos + 1) % self.rmsFrames
+      self.rmsCount = min(self.rmsCount + 1, self.rmsFrames - 1)
+      
+    if self.peakHold:
+      held = self.held
+      heldAt = self.heldAt
+      for i in range(count):
+        if levels[i] >= held[i] or now - heldAt[i] >= self.peakHold:
+          held[i] = levels[i]
+          heldAt[i] = now
+        else:
+          levels[i] = held[i]
+    
+    self.frames += 1
+    if self.frames < self.decimation:
+      return
+    self.frames = 0
+    
+    deadband = self.deadband
+    emitted = self.emitted
+    
+    if self.packedSignal != None:
+      # the whole array goes if any channel moves beyond the deadband
+      for i in range(count):
+        if emitted[i] == None or abs(levels[i] - emitted[i]) > deadband:
+          self.emitted = levels
+          self.packedSignal.emit(levels)
+          return
+      
+    else:
+      signals = self.signals
+      for i in range(count):
+        if emitted[i] == None or abs(levels[i] - emitted[i]) > deadband:
+          emitted[i] = levels[i]
+          signals[i].emit(levels[i])
+
+# --- meter pipeline>
+
 param_Presets = Parameter({ 'schema': { 'type': 'array', 'items': { 'type': 'object', 'properties': {
   'index':   { 'type': 'integer', 'order': 1 },
   'label':   { 'type': 'string', 'order': 2 }}}}})
@@ -121,15 +229,31 @@ def main():
   console.info('Will connect to %s' % dest)
   tcp.setDest(dest)
   
+# meter type names and their codes e.g. [mtrstart MTX:Index_2 level 1000]
+METER_TYPE_CODES = { 'Level': 'level', 'Gain Reduction': 'gr', 'Hold': 'hold' }
+
+meterBlocksByAddr = {} # e.g. { ('MTX:Index_2', 'level'): (a MeterBlock) }
+
 def initMeters():
   for meterInfo in param_Meters or []:
     meterAddress = meterInfo['address']
     meterType = meterInfo['type']
+    meterTypeName = 'GR' if meterType == 'Gain Reduction' else meterType
+    
+    if isPackedMeters():
+      e = create_local_event('%s %s Meters' % (meterAddress, meterTypeName), { 'group': 'Meters - %s' % meterAddress, 'order': next_seq(), 
+                                                                               'schema': { 'type': 'array', 'items': { 'type': 'number' }}})
+      meterBlocksByAddr[(meterAddress, METER_TYPE_CODES.get(meterType))] = MeterBlock(4, packedSignal=e)
+      continue
 
     # create 'sub' meters
+    signals = list()
     for i in [1, 2, 3, 4]:
-      name = '%s %s Meter %s' % (meterAddress, 'GR' if meterType == 'Gain Reduction' else meterType, i)
+      name = '%s %s Meter %s' % (meterAddress, meterTypeName, i)
       e = create_local_event(name, { 'group': 'Meters - %s' % meterAddress, 'order': next_seq(), 'schema': { 'type': 'number' }})
+      signals.append(e)
+      
+    meterBlocksByAddr[(meterAddress, METER_TYPE_CODES.get(meterType))] = MeterBlock(4, signals=signals)
     
 def kickOffMeters():
   # do nothing if meters are disabled
@@ -204,12 +328,12 @@ def handleNotifyMtr(options):
   # NOTIFY mtr MTX:Index)4 level 1b 1c 1c 1c
   option3 = options[2] # address
   option4 = options[3] # 'level' or 'gr' or 'hold'
-    
-  for i, levelCode in enumerate(options[4:]):
-    meterE = lookup_local_event('%s %s Meter %s' % (option3, option4, i+1))
-    if meterE == None:
-      break
-    meterE.emit(-126 + int(levelCode, 16))
+  
+  meterBlock = meterBlocksByAddr.get((option3, option4))
+  if meterBlock == None:
+    return
+  
+  meterBlock.update(options[4:], system_clock())
 
 def parseResp(resp, option=-1, converter=None, signal=None):
   # Example responses:
@@ -340,10 +464,9 @@ def MeterStart(arg):
   log(2, "MeterStart [%s]" % arg)
   
   meterTypeName = arg['type']
-  if meterTypeName == 'Level':            meterTypeValue = 'level'
-  elif meterTypeName == 'Gain Reduction': meterTypeValue = 'gr'
-  elif meterTypeName == 'Hold':           meterTypeValue = 'hold'
-  else: return console.warn('Unknown meter type - %s' % meterTypeName)
+  meterTypeValue = METER_TYPE_CODES.get(meterTypeName)
+  if meterTypeValue == None:
+    return console.warn('Unknown meter type - %s' % meterTypeName)
   
   tcp.request('mtrstart %s %s %s' % (arg['address'], meterTypeValue, arg['interval']),
               lambda resp: parseResp(resp))
@@ -371,11 +494,16 @@ def tcp_connected():
 def tcp_received(data):
   log(3, 'tcp_recv [%s]' % data)
   
-  options = splitIntoOptions(data)
-  
   # indicate a parsed packet (for status checking)
   lastReceive[0] = system_clock()
   
+  # meters are most of the traffic and never quoted so don't need the full option splitting
+  if data.startswith('NOTIFY mtr '):
+    handleNotifyMtr(data.split())
+    return
+  
+  options = splitIntoOptions(data)
+  
   option0 = options[0]
   
   if option0 == NOTIFY:
@@ -2,8 +2,9 @@
 
 * Manual link - https://jp.yamaha.com/files/download/other_assets/1/1144121/mtx_mrx_xmv_ex_remote_control_protocol_spec_v310_en.pdf
 
-*rev 3. changelog*
+*rev 4. changelog*
 
+   * meter pipeline (deadband, decimation, peak-hold, RMS, packed arrays)
    * support for IP Address via binding
    * console noise tidyup
    * only polls when connected
@@ -39,17 +40,134 @@ OUTPUT_METER_ADDR = 'MTX:mtr_512/20001/meter'
 inputMeterSignals = list()
 outputMeterSignals = list()
 
+# <meter pipeline ---
+
+METER_MODES = ['Per channel', 'Packed array']
+
+param_MeterPipeline = Parameter({'title': 'Meter pipeline', 'desc': 'How meter updates (every 333ms) become signals', 'schema': {'type': 'object', 'properties': {
+  'mode':       {'type': 'string', 'order': 1, 'enum': METER_MODES, 'hint': 'Per channel', 'desc': 'A signal per channel or one array signal per meter'},
+  'deadband':   {'type': 'integer', 'order': 2, 'title': 'Deadband (dB)', 'hint': '0 (any change)'},
+  'decimation': {'type': 'integer', 'order': 3, 'desc': 'Only emit every Nth update', 'hint': '1'},
+  'peakHold':   {'type': 'integer', 'order': 4, 'title': 'Peak hold (ms)', 'hint': '0 (off)'},
+  'rmsWindow':  {'type': 'integer', 'order': 5, 'title': 'RMS window (ms)', 'hint': '0 (off)'}}}})
+
+import math
+
+METER_INTERVAL = 333 # (ms, see kickOffMeters)
+
+# level codes to dB e.g. '1b' is -99 (see page 58)
+LEVELS_BY_CODE = dict([('%02x' % code, -126 + code) for code in range(256)] + [('%02X' % code, -126 + code) for code in range(256)])
+
+def levelFromCode(code):
+  level = LEVELS_BY_CODE.get(code)
+  if level == None:
+    level = -126 + int(code, 16)
+  return level
+
+def isPackedMeters():
+  return (param_MeterPipeline or {}).get('mode') == 'Packed array'
+
+class MeterBlock:
+  '''The channels of one meter, levels go through RMS, peak-hold, decimation and deadband before being emitted'''
+  
+  def __init__(self, channels, signals=None, packedSignal=None):
+    config = param_MeterPipeline or {}
+    
+    self.channels = channels
+    self.signals = signals              # one per channel or...
+    self.packedSignal = packedSignal    # ...one for all
+    
+    self.deadband = max(config.get('deadband') or 0, 0)
+    self.decimation = max(config.get('decimation') or 1, 1)
+    self.peakHold = max(config.get('peakHold') or 0, 0)
+    
+    # RMS is over a ring of linear powers
+    rmsFrames = (config.get('rmsWindow') or 0) / METER_INTERVAL
+    self.rmsFrames = rmsFrames if rmsFrames > 1 else 0
+    self.powers = [[0.0] * self.rmsFrames for i in range(channels)]
+    self.rmsPos = 0
+    self.rmsCount = 0
+    
+    self.held = [-126] * channels
+    self.heldAt = [0] * channels
+    
+    self.frames = 0
+    
+    # what was last emitted (carries over restarts like emitIfDifferent would)
+    if packedSignal != None:
+      previous = packedSignal.getArg()
+      self.emitted = list(previous) if previous != None and len(previous) == channels else [None] * channels
+    else:
+      self.emitted = [signal.getArg() for signal in signals]
+      
+  def update(self, codes, now):
+    levels = [levelFromCode(code) for code in codes[:self.channels]]
+    count = len(levels)
+    
+    if self.rmsFrames:
+      pos = self.rmsPos
+      for i in range(count):
+        powers = self.powers[i]
+        powers[pos] = 10 ** (levels[i] / 10.0)
+        levels[i] = int(round(10 * math.log10(sum(powers) / (self.rmsCount + 1))))
+      self.rmsPos = (pos + 1) % self.rmsFrames
+      self.rmsCount = min(self.rmsCount + 1, self.rmsFrames - 1)
+      
+    if self.peakHold:
+      held = self.held
+      heldAt = self.heldAt
+      for i in range(count):
+        if levels[i] >= held[i] or now - heldAt[i] >= self.peakHold:
+          held[i] = levels[i]
+          heldAt[i] = now
+        else:
+          levels[i] = held[i]
+    
+    self.frames += 1
+    if self.frames < self.decimation:
+      return
+    self.frames = 0
+    
+    deadband = self.deadband
+    emitted = self.emitted
+    
+    if self.packedSignal != None:
+      # the whole array goes if any channel moves beyond the deadband
+      for i in range(count):
+        if emitted[i] == None or abs(levels[i] - emitted[i]) > deadband:
+          self.emitted = levels
+          self.packedSignal.emit(levels)
+          return
+      
+    else:
+      signals = self.signals
+      for i in range(count):
+        if emitted[i] == None or abs(levels[i] - emitted[i]) > deadband:
+          emitted[i] = levels[i]
+          signals[i].emit(levels[i])
+
+# --- meter pipeline>
+
 # create input and output channel meters
 
 _pollers = list() # holds all the pollers (timers) to enable/disable on connection state
 
-for i in range(16):
-  signal = Event('Input %s Meter' % (i+1), {'title': '#%s' % (i+1), 'group': 'Input Meters', 'order': 8000+next_seq(), 'schema': {'type': 'integer'}})
-  inputMeterSignals.append(signal)
+meterBlocksByAddr = {} # e.g. { 'MTX:mtr_512/20000/meter': (a MeterBlock) }
+
+def initMeterBlock(address, name, channels, signals):
+  if isPackedMeters():
+    packedSignal = Event('%s Meters' % name, {'group': '%s Meters' % name, 'order': 8000+next_seq(), 'schema': {'type': 'array', 'items': {'type': 'integer'}}})
+    meterBlocksByAddr[address] = MeterBlock(channels, packedSignal=packedSignal)
+    return
+  
+  for i in range(channels):
+    signal = Event('%s %s Meter' % (name, i+1), {'title': '#%s' % (i+1), 'group': '%s Meters' % name, 'order': 8000+next_seq(), 'schema': {'type': 'integer'}})
+    signals.append(signal)
   
-for i in range(8):
-  signal = Event('Output %s Meter' % (i+1), {'title': '#%s' % (i+1), 'group': 'Output Meters', 'order': 8000+next_seq(), 'schema': {'type': 'integer'}})
-  outputMeterSignals.append(signal)
+  meterBlocksByAddr[address] = MeterBlock(channels, signals=signals)
+
+initMeterBlock(INPUT_METER_ADDR, 'Input', 16, inputMeterSignals)
+initMeterBlock(OUTPUT_METER_ADDR, 'Output', 8, outputMeterSignals)
   
 # parameters
 INT_SCHEMA = {'type': 'integer'}
@@ -190,19 +308,11 @@ METER = "METER"
 def handleNotifyMtr(options):
   # e.g. meter: 
   # NOTIFY mtr MTX:mtr_512/20000/meter level 1b 1c 1c 1c 1b 1d 1d 1c 00 00 00 00 00 00 00 00
-  option3 = options[2]
+  meterBlock = meterBlocksByAddr.get(options[2])
+  if meterBlock == None:
+    return
   
-  if option3 == INPUT_METER_ADDR:
-    metersSignals = inputMeterSignals
-    
-  elif option3 == OUTPUT_METER_ADDR:
-    metersSignals = outputMeterSignals
-    
-  offset = 0
-  for levelCode in options[4:]:
-    # see page 58
-    metersSignals[offset].emitIfDifferent(-126 + int(levelCode, 16))
-    offset += 1
+  meterBlock.update(options[4:], system_clock())
 
 def parseResp(resp, option=-1, converter=None, signal=None):
   # Example responses:
@@ -361,11 +471,16 @@ def tcp_connected():
 def tcp_received(data):
   log(3, 'tcp_recv [%s]' % data)
   
-  options = splitIntoOptions(data)
-  
   # indicate a parsed packet (for status checking)
   lastReceive[0] = system_clock()
   
+  # meters are most of the traffic and never quoted so don't need the full option splitting
+  if data.startswith('NOTIFY mtr '):
+    handleNotifyMtr(data.split())
+    return
+  
+  options = splitIntoOptions(data)
+  
   option0 = options[0]
   
   if option0 == NOTIFY:
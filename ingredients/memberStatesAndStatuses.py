@@ -49,6 +49,9 @@ param_members = Parameter({'title': 'Members', 'schema': {'type': 'array', 'item
    }
 }}}}})
 
+param_aggregationWindow = Parameter({'title': 'Aggregation window (secs)', 'order': next_seq(), 'schema': {'type': 'number', 'hint': '0 (immediate) e.g. 0.5'},
+                                     'desc': 'Member Power and Muting changes arriving within this window are combined into one update of the resultant signals.'})
+
 def initMember(memberInfo):
   name = mustNotBeBlank('name', memberInfo['name'])
 
@@ -62,9 +65,46 @@ def initMember(memberInfo):
     initSignalSupport(name, memberInfo['muting']['mode'], 'Muting', ['On', 'Off'])
 
 membersBySignal = {}
+
+memberSignalsBySignal = {}
+
+aggregatorsBySignal = {}
+
+def initSignalAggregation(signalName, localDesiredSignal, localResultantSignal):
+  memberSignals = memberSignalsBySignal.setdefault(signalName, list())
+  
+  pending = [False]
+  
+  def aggregateMemberSignals():
+    pending[0] = False
+    
+    shouldBeState = localDesiredSignal.getArg()
+    partially = False
+    
+    for memberSignal in memberSignals:
+      if memberSignal.getArg() != shouldBeState:
+        partially = True
+        break
+        
+    localResultantSignal.emitIfDifferent('Partially %s' % shouldBeState if partially else shouldBeState)
+    
+  def scheduleAggregation():
+    window = param_aggregationWindow or 0
+    
+    if window <= 0:
+      aggregateMemberSignals()
+      
+    elif not pending[0]:
+      # batch up any other member updates arriving within the window
+      pending[0] = True
+      call(aggregateMemberSignals, window)
+      
+  localDesiredSignal.addEmitHandler(lambda arg: scheduleAggregation())
+  
+  aggregatorsBySignal[signalName] = scheduleAggregation
     
 def initSignalSupport(name, mode, signalName, states):
-  members = getMembersInfoOrRegister(signalName, name)
+  getMembersInfoOrRegister(signalName, name)
   
   # establish local signals if haven't done so already
   localDesiredSignal = lookup_local_event('Desired %s' % signalName)
@@ -74,6 +114,10 @@ def initSignalSupport(name, mode, signalName, states):
   else:
     localResultantSignal = lookup_local_event(signalName)
     
+    if signalName not in aggregatorsBySignal:
+      # (the host script defines the signals itself)
+      initSignalAggregation(signalName, localDesiredSignal, localResultantSignal)
+    
   # establish a remote action
   if mode == 'Action & Signal':
     create_remote_action('Member %s %s' % (name, signalName), {'group': 'Members (%s)' % signalName, 'schema': {'type': 'string', 'enum': states}},
@@ -85,18 +129,9 @@ def initSignalSupport(name, mode, signalName, states):
   
   localMemberSignal = Event('Member %s %s' % (name, signalName), {'title': '"%s" %s' % (name, signalName), 'group': '(advanced)', 'order': 9999+next_seq(), 'schema': {'type': 'string', 'enum': resultantStates}})
   
-  def aggregateMemberSignals():
-    shouldBeState = localDesiredSignal.getArg()
-    partially = False
-    
-    for memberName in members:
-      if lookup_local_event('Member %s %s' % (memberName, signalName)).getArg() != shouldBeState:
-        partially = True
-        
-    localResultantSignal.emit('Partially %s' % shouldBeState if partially else shouldBeState)
-    
-  localMemberSignal.addEmitHandler(lambda arg: aggregateMemberSignals())
-  localDesiredSignal.addEmitHandler(lambda arg: aggregateMemberSignals())
+  memberSignalsBySignal.setdefault(signalName, list()).append(localMemberSignal)
+  
+  localMemberSignal.addEmitHandler(lambda arg: aggregatorsBySignal[signalName]())
   
   def handleRemoteEvent(arg):
     if arg == True or arg == 1:
@@ -143,6 +178,8 @@ def initSignal(signalName, mode, states):
            'state': {'type': 'string', 'enum': states, 'order': 3},
            'noPropagate': {'type': 'boolean', 'order': 2}}}})
   
+  initSignalAggregation(signalName, localDesiredSignal, localResultantSignal)
+  
   return localDesiredSignal, localResultantSignal
 
 def getMembersInfoOrRegister(signalName, memberName):